@@ -33,10 +33,14 @@ More better-er stategy
 """
 
 import hlt
+import json
 import logging
+import os
 import time
 from enum import Enum
 import random
+import numpy as np
+import Navigation
 
 class ActionType(Enum):
     DIVIDE = 0
@@ -45,6 +49,20 @@ class ActionType(Enum):
     DEFEND = 3
     CONQUER = 4
     EVADE = 5
+
+class NavigationTier(Enum):
+    # ordered from best (and most expensive) to cheapest
+    FULL_PLANNER = 0
+    NAVIGATE = 1
+    NAVIGATE_NO_SHIPS = 2
+    STRAIGHT = 3
+
+# best tier each basic_navigation ignore_mode may use
+IGNORE_MODE_TIERS = {
+    'none': NavigationTier.FULL_PLANNER,
+    'ships': NavigationTier.NAVIGATE_NO_SHIPS,
+    'all': NavigationTier.STRAIGHT,
+}
     
 def get_weakest_ship(ship_list):
 
@@ -56,12 +74,212 @@ def get_weakest_ship(ship_list):
             lowest_health = ship.health
     return weakest_ship
 
+def solve_assignment(cost):
+    """
+    Min-cost assignment (Hungarian method, shortest augmenting paths) with the inner loop over columns in numpy.
+    Returns the assigned column for each row, or -1 for rows left out when there are more rows than columns.
+    """
+    n_rows, n_cols = cost.shape
+    if n_rows > n_cols:
+        col_for_row = np.full(n_rows, -1, dtype=int)
+        row_for_col = solve_assignment(cost.T)
+        col_for_row[row_for_col] = np.arange(n_cols)
+        return col_for_row
+
+    # 1-indexed potentials; column 0 is the virtual start of each augmenting path
+    u = np.zeros(n_rows + 1)
+    v = np.zeros(n_cols + 1)
+    row_of_col = np.zeros(n_cols + 1, dtype=int)
+    way = np.zeros(n_cols + 1, dtype=int)
+    for i in range(1, n_rows + 1):
+        row_of_col[0] = i
+        j0 = 0
+        minv = np.full(n_cols + 1, np.inf)
+        used = np.zeros(n_cols + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = row_of_col[j0]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            improve = ~used[1:] & (cur < minv[1:])
+            minv[1:][improve] = cur[improve]
+            way[1:][improve] = j0
+            j1 = int(np.argmin(np.where(used[1:], np.inf, minv[1:]))) + 1
+            delta = minv[j1]
+            u[row_of_col[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if row_of_col[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            row_of_col[j0] = row_of_col[j1]
+            j0 = j1
+
+    col_for_row = np.full(n_rows, -1, dtype=int)
+    assigned = np.nonzero(row_of_col[1:])[0]
+    col_for_row[row_of_col[1:][assigned] - 1] = assigned
+    return col_for_row
+
+class PlanetIndex:
+    """
+    Planets sorted once per turn into free, mine with open spots, mine full and enemy, plus a summary of the
+    ships docked at each planet, so ship decisions only pay for a distance lookup.
+    """
+
+    # which classes count for each planet_status (unowned planets are fair game for every status)
+    STATUS_CLASSES = {
+        'free': ('free',),
+        'mine': ('free', 'mine_open'),
+        'enemy': ('free', 'enemy'),
+    }
+
+    def __init__(self, game_map):
+        me = game_map.get_me()
+        self.classes = {'free': [], 'mine_open': [], 'mine_full': [], 'enemy': []}
+        self.open_spots = {}
+        self.weakest_docked = {}
+        self.docked_health = {}
+        for planet in game_map.all_planets():
+            docked_ships = planet.all_docked_ships()
+            if not planet.is_owned():
+                self.classes['free'].append(planet)
+            elif planet.owner == me:
+                self.classes['mine_full' if planet.is_full() else 'mine_open'].append(planet)
+            else:
+                self.classes['enemy'].append(planet)
+            self.open_spots[planet.id] = planet.num_docking_spots - len(docked_ships)
+            if docked_ships:
+                self.weakest_docked[planet.id] = get_weakest_ship(docked_ships)
+                self.docked_health[planet.id] = sum(ship.health for ship in docked_ships)
+
+        self.planets = {}
+        self.positions = {}
+        for status, classes in self.STATUS_CLASSES.items():
+            planets = [planet for name in classes for planet in self.classes[name]]
+            self.planets[status] = planets
+            self.positions[status] = np.array([(planet.x, planet.y) for planet in planets]).reshape(-1, 2)
+
+    def get_planets(self, planet_status):
+        return self.planets[planet_status]
+
+    def closest_planet(self, entity, planet_status):
+        positions = self.positions[planet_status]
+        if not len(positions):
+            return []
+        dist = np.hypot(positions[:, 0] - entity.x, positions[:, 1] - entity.y)
+        return self.planets[planet_status][int(np.argmin(dist))]
+
+class QualityController:
+    """
+    Hands out navigation tiers each turn so the fleet fits in the time budget. Ships are walked in priority order
+    and each gets the best tier whose measured cost still leaves room to move every remaining ship at the
+    cheapest tier, so quality degrades smoothly as the fleet grows instead of the turn timing out.
+    """
+
+    # weight of the newest sample in the moving average of per-ship cost
+    COST_SMOOTHING = 0.2
+    # starting guesses (seconds per ship) until we have measurements
+    DEFAULT_COSTS = {
+        NavigationTier.FULL_PLANNER: 0.05,
+        NavigationTier.NAVIGATE: 0.01,
+        NavigationTier.NAVIGATE_NO_SHIPS: 0.002,
+        NavigationTier.STRAIGHT: 0.0002,
+    }
+    # starting guess (seconds) for rasterizing the full planner's grids, paid once on turns that use it
+    DEFAULT_RASTER_COST = 0.01
+    # fraction of the time left we are willing to plan for; the rest covers actions, logging and sending
+    BUDGET_FRACTION = 0.8
+    # one full planner search may take this many times the tier's cost estimate before it returns its best path
+    SEARCH_ALLOWANCE = 2.0
+    # extra steps the full planner counts for a cell per enemy gun that can reach it next turn
+    THREAT_COST = 1.0
+
+    def __init__(self):
+        self.cost = dict(self.DEFAULT_COSTS)
+        self.raster_cost = self.DEFAULT_RASTER_COST
+        self.tiers = {}
+        self.tier_counts = {}
+        self.path_planner = None
+        self.cost_layer = None
+        self.turn_deadline = None
+
+    def start_turn(self, ordered_ships, turn_count, deadline):
+        self.path_planner = None
+        self.cost_layer = None
+        # no deadline (offline replays) means no time limit, so every ship gets the best tier and searches run to
+        # completion, which keeps the commands independent of the machine's speed
+        self.turn_deadline = deadline
+        budget = np.inf if deadline is None else (deadline - time.time()) * self.BUDGET_FRACTION
+        cheapest = self.cost[NavigationTier.STRAIGHT]
+        ships_left = len(ordered_ships)
+        self.tiers = {}
+        tier_counts = dict((tier, 0) for tier in NavigationTier)
+        for actionShip in ordered_ships:
+            ships_left -= 1
+            reserve = ships_left * cheapest
+            tier = NavigationTier.STRAIGHT
+            for candidate in NavigationTier:
+                # the first full planner ship also pays for the turn's grids
+                extra = self.raster_cost if candidate == NavigationTier.FULL_PLANNER and \
+                    not tier_counts[NavigationTier.FULL_PLANNER] else 0
+                if self.cost[candidate] + extra + reserve <= budget:
+                    tier = candidate
+                    budget -= extra
+                    break
+            budget -= self.cost[tier]
+            self.tiers[actionShip.get_id()] = tier
+            tier_counts[tier] += 1
+
+        if tier_counts != self.tier_counts:
+            logging.info("Turn "+str(turn_count)+": navigation tiers changed to "+
+                         str(dict((tier.name, count) for tier, count in tier_counts.items() if count)))
+            self.tier_counts = tier_counts
+
+    def get_tier(self, actionShip, ignore_mode):
+        assigned = self.tiers.get(actionShip.get_id(), NavigationTier.NAVIGATE)
+        best = IGNORE_MODE_TIERS[ignore_mode]
+        return assigned if assigned.value > best.value else best
+
+    def record(self, tier, elapsed):
+        self.cost[tier] = (1 - self.COST_SMOOTHING) * self.cost[tier] + self.COST_SMOOTHING * elapsed
+
+    def get_search_deadline(self, start_time):
+        if self.turn_deadline is None:
+            return None
+        return start_time + self.SEARCH_ALLOWANCE * self.cost[NavigationTier.FULL_PLANNER]
+
+    def get_path_planner(self, game_map):
+        # only rasterized on turns where some ship actually gets the full planner, and timed on its own so the
+        # first ship's search cost isn't inflated by it; the threat cost layer is built along with the grids
+        if self.path_planner is None:
+            start_time = time.time()
+            self.path_planner = Navigation.PathPlanner(game_map, turn_deadline=self.turn_deadline)
+            self.cost_layer = self.path_planner.get_cost_layer(threat=self.THREAT_COST)
+            self.raster_cost = (1 - self.COST_SMOOTHING) * self.raster_cost + \
+                self.COST_SMOOTHING * (time.time() - start_time)
+        return self.path_planner
+
 class ActionShip:
 
-    def __init__(self, ship, default_action=ActionType.DIVIDE):
+    # DEFEND goes straight at enemies closer than this, ignoring our own ships
+    DEFEND_RADIUS = 20
+    # correction search handed to Ship.navigate
+    MAX_CORRECTIONS = 90
+    ANGULAR_STEP = 1
+    # full-speed escape directions EVADE compares
+    EVADE_HEADINGS = 16
+
+    def __init__(self, ship, default_action=ActionType.DIVIDE, quality=None):
         self.ship = ship
+        # QualityController deciding how much navigation effort this ship gets (None keeps the ignore_mode as is)
+        self.quality = quality
         self.action = default_action
         self.is_action_set = False
+        # planet picked for this turn by SwarmMaster.assign_planets (None if nothing was left for us)
+        self.target_planet = None
+        # set for this turn by SwarmMaster.mark_evaders when the ship would likely die where it is
+        self.evading = False
 
     def get_id(self):
         return self.ship.id
@@ -71,18 +289,26 @@ class ActionShip:
         self.is_action_set = True
         logging.info(str(self.ship.id)+": setting action to "+str(action))
         
-    def do_action(self, game_map):
-            
+    def do_action(self, game_map, planet_index):
+
+        # evading overrides the ship's action for this turn only; with nowhere safer to go it carries on as usual
+        if self.evading:
+            cmd = self.do_evade_action(game_map)
+            if cmd:
+                return cmd
+
         if self.action == ActionType.DIVIDE:
             cmd = self.do_divide_action(game_map)
         elif self.action == ActionType.FORTIFY:
             cmd = self.do_fortify_action(game_map)
         elif self.action == ActionType.ATTACK:
-            cmd = self.do_attack_action(game_map)
+            cmd = self.do_attack_action(game_map, planet_index)
         elif self.action == ActionType.DEFEND:
             cmd = self.do_defend_action(game_map)
         elif self.action == ActionType.CONQUER:
-            cmd = self.do_conquer_action(game_map)
+            cmd = self.do_conquer_action(game_map, planet_index)
+        elif self.action == ActionType.EVADE:
+            cmd = self.do_evade_action(game_map)
         else:
             logging.warning("Invalid ActionType")
             cmd = ''
@@ -91,26 +317,24 @@ class ActionShip:
                 
     def do_divide_action(self, game_map):
         logging.info("Ship "+str(self.get_id()) + " doing action DIVIDE")
-        closest_free_planet = self.find_closest_planet(game_map, planet_status='free')
-        if closest_free_planet:
-            return self.navigate_then_dock(game_map, closest_free_planet)
+        if self.target_planet:
+            return self.navigate_then_dock(game_map, self.target_planet)
         else:
             return ''
            
     def do_fortify_action(self, game_map):
         logging.info("Ship "+str(self.get_id()) + " doing action FORTIFY")
-        closest_owned_planet = self.find_closest_planet(game_map, planet_status='mine')
-        if closest_owned_planet:
-            return self.navigate_then_dock(game_map, closest_owned_planet)
+        if self.target_planet:
+            return self.navigate_then_dock(game_map, self.target_planet)
         else:
             return ''
         pass
            
-    def do_attack_action(self, game_map):
+    def do_attack_action(self, game_map, planet_index):
         logging.info("Ship "+str(self.get_id()) + " doing action ATTACK")
-        closest_enemy_planet = self.find_closest_planet(game_map, planet_status='enemy')
+        closest_enemy_planet = self.find_closest_planet(planet_index, planet_status='enemy')
         if closest_enemy_planet:
-            weakest_ship = get_weakest_ship(closest_enemy_planet.all_docked_ships())
+            weakest_ship = planet_index.weakest_docked.get(closest_enemy_planet.id, [])
         else:
             return ''
         if weakest_ship:
@@ -123,55 +347,127 @@ class ActionShip:
         logging.info("Ship "+str(self.get_id()) + " doing action DEFEND")
         closest_enemy_ship = self.find_closest_enemy_ship(game_map)
         if closest_enemy_ship:
-            if self.ship.calculate_distance_between(closest_enemy_ship) < 20:
+            # charge straight in only where we can shoot back with at least as many ships as they bring
+            if self.ship.calculate_distance_between(closest_enemy_ship) < self.DEFEND_RADIUS and \
+                    game_map.get_influence().support_at(closest_enemy_ship) >= \
+                    game_map.get_influence().threat_at(closest_enemy_ship):
                 return self.basic_navigation(game_map,closest_enemy_ship,ignore_mode='ships')
             else:
                 return self.basic_navigation(game_map,closest_enemy_ship,ignore_mode='none')
         
         
-    def do_conquer_action(self, game_map):
+    def do_conquer_action(self, game_map, planet_index):
         logging.info("Ship "+str(self.get_id()) + " doing action CONQUER")
-        closest_enemy_planet = self.find_closest_planet(game_map, planet_status='enemy')
+        closest_enemy_planet = self.find_closest_planet(planet_index, planet_status='enemy')
         if closest_enemy_planet:
             return self.basic_navigation(game_map,closest_enemy_planet,ignore_mode='planets')
         else:
             return ''
         
       
+    def do_evade_action(self, game_map):
+        logging.info("Ship "+str(self.get_id()) + " doing action EVADE")
+        influence = game_map.get_influence()
+        angles = np.linspace(0, 2 * np.pi, self.EVADE_HEADINGS, endpoint=False)
+        xs = self.ship.x + hlt.constants.MAX_SPEED * np.cos(angles)
+        ys = self.ship.y + hlt.constants.MAX_SPEED * np.sin(angles)
+        damage = influence.sample(influence.damage, xs, ys)
+        damage[(xs < 0) | (xs >= game_map.width) | (ys < 0) | (ys >= game_map.height)] = np.inf
+        # enemies reach further than a ship moves, so among equally bad spots take the one leading out of range
+        beyond = influence.sample(influence.damage, xs + hlt.constants.MAX_SPEED * np.cos(angles),
+                                  ys + hlt.constants.MAX_SPEED * np.sin(angles))
+        best = int(np.lexsort((beyond, damage))[0])
+        here = influence.damage_at(self.ship)
+        if (damage[best], beyond[best]) >= (here, here):
+            return ''
+        nav_cmd = self.navigate(
+                hlt.entity.Position(xs[best], ys[best]),
+                game_map,
+                speed=int(hlt.constants.MAX_SPEED))
+        return nav_cmd if nav_cmd else ''
+
     def basic_navigation(self, game_map, destination,ignore_mode='none'):
-        if ignore_mode == 'none':
-            nav_cmd = self.ship.navigate(
-                    self.ship.closest_point_to(destination),
-                    game_map,
-                    speed=int(hlt.constants.MAX_SPEED))
-        elif ignore_mode == 'ships':
-            nav_cmd = self.ship.navigate(
-                    self.ship.closest_point_to(destination),
-                    game_map,
-                    speed=int(hlt.constants.MAX_SPEED),
-                    ignore_ships=True)
-        elif ignore_mode == 'planets':
-            nav_cmd = self.ship.navigate(
-                    destination,
-                    game_map,
-                    speed=int(hlt.constants.MAX_SPEED),
-                    ignore_planets=True)
-        elif ignore_mode == 'all':
-            nav_cmd = self.ship.navigate(
-                    destination,
-                    game_map,
-                    speed=int(hlt.constants.MAX_SPEED),
-                    avoid_obstacles=False)
-        else:
-            logging.warning("Invalid ignore_mode set for basic_navigation")
-            nav_cmd = ''
+        with game_map.profiler.phase('navigation'):
+            if self.quality is not None and ignore_mode in IGNORE_MODE_TIERS:
+                return self.tiered_navigation(game_map, destination, ignore_mode)
+
+            if ignore_mode == 'none':
+                nav_cmd = self.navigate(
+                        self.ship.closest_point_to(destination),
+                        game_map,
+                        speed=int(hlt.constants.MAX_SPEED))
+            elif ignore_mode == 'ships':
+                nav_cmd = self.navigate(
+                        self.ship.closest_point_to(destination),
+                        game_map,
+                        speed=int(hlt.constants.MAX_SPEED),
+                        ignore_ships=True)
+            elif ignore_mode == 'planets':
+                nav_cmd = self.navigate(
+                        destination,
+                        game_map,
+                        speed=int(hlt.constants.MAX_SPEED),
+                        ignore_planets=True)
+            elif ignore_mode == 'all':
+                nav_cmd = self.navigate(
+                        destination,
+                        game_map,
+                        speed=int(hlt.constants.MAX_SPEED),
+                        avoid_obstacles=False)
+            else:
+                logging.warning("Invalid ignore_mode set for basic_navigation")
+                nav_cmd = ''
         
+            if nav_cmd:
+                return nav_cmd
+            else:
+                return ''
+          
+        
+    def navigate(self, target, game_map, **kwargs):
+        return self.ship.navigate(target, game_map, max_corrections=self.MAX_CORRECTIONS,
+                                  angular_step=self.ANGULAR_STEP, **kwargs)
+
+    def tiered_navigation(self, game_map, destination, ignore_mode):
+        tier = self.quality.get_tier(self, ignore_mode)
+        if tier == NavigationTier.FULL_PLANNER:
+            planner = self.quality.get_path_planner(game_map)
+        start_time = time.time()
+        target = self.ship.closest_point_to(destination)
+        if tier == NavigationTier.FULL_PLANNER:
+            nav_cmd = planner.get_nav_cmds_many([self.ship], [target], cost=self.quality.cost_layer,
+                                                deadline=self.quality.get_search_deadline(start_time))[self.ship.id]
+        elif tier == NavigationTier.NAVIGATE:
+            nav_cmd = self.navigate(target, game_map, speed=int(hlt.constants.MAX_SPEED))
+        elif tier == NavigationTier.NAVIGATE_NO_SHIPS:
+            nav_cmd = self.navigate(target, game_map, speed=int(hlt.constants.MAX_SPEED), ignore_ships=True)
+        else:
+            nav_cmd = self.navigate(target, game_map, speed=int(hlt.constants.MAX_SPEED), avoid_obstacles=False)
+        self.quality.record(tier, time.time() - start_time)
+
         if nav_cmd:
             return nav_cmd
         else:
             return ''
-          
-        
+
+    def fallback_action(self, game_map, enemy_ship=None):
+        # constant-time move for ships the turn had no time left for: dock if we can, else fly straight at our
+        # planet, or at the given (nearest) enemy ship for ships without one
+        if self.target_planet:
+            if self.ship.can_dock(self.target_planet):
+                return self.ship.dock(self.target_planet)
+            target = self.target_planet
+        elif enemy_ship:
+            target = enemy_ship
+        else:
+            return ''
+        nav_cmd = self.navigate(
+                self.ship.closest_point_to(target),
+                game_map,
+                speed=int(hlt.constants.MAX_SPEED),
+                avoid_obstacles=False)
+        return nav_cmd if nav_cmd else ''
+
     def navigate_then_dock(self, game_map, planet):    
         if self.ship.can_dock(planet):
             logging.info(str(self.ship.id)+": Docking!")
@@ -179,45 +475,9 @@ class ActionShip:
         else:
             return self.basic_navigation(game_map,planet)
     
-    @staticmethod
-    def is_planet_suitable(game_map, planet, planet_status, ignore_list=set()):
-        
-        if planet.is_owned():
-            if planet_status == 'free':
-                return False
-            else:
-                if planet.owner == game_map.get_me() and (planet_status == 'enemy' or planet.is_full()):
-                    return False
-                if planet.owner != game_map.get_me() and planet_status == 'mine':
-                    return False
-                    
-        if planet in ignore_list:
-            return False
-        
-        return True
-        
-        
-    def find_closest_planet(self, game_map, planet_status='free'):
-
-        # For each planet in the game (only non-destroyed planets are included)
-        best_planet = []
-        min_dist = 1000000
-        for planet in game_map.all_planets():
-
-            if not self.is_planet_suitable(game_map, planet, planet_status):
-                continue            
-
-            # find distance to planet
-            dist = self.ship.calculate_distance_between(planet)
-            if dist < min_dist:
-                min_dist = dist
-                best_planet = planet
-
-        #only update list if we get a valid planet
-        if not best_planet:
-            return []
-        else:
-            return best_planet
+    def find_closest_planet(self, planet_index, planet_status='free'):
+        # planets were already sorted by status for this turn, so this is just a distance lookup
+        return planet_index.closest_planet(self.ship, planet_status)
             
     def find_closest_enemy_ship(self, game_map):
 
@@ -242,34 +502,125 @@ class ActionShip:
             return best_ship
     
 
+class TurnScheduler:
+    """
+    Orders ships by urgency and keeps the turn inside its time budget: ships in combat go first, then ships that
+    can dock, then the rest, with ships that were idle last turn at the back. Each ship's decision cost is
+    estimated from its recent turns, and ships that no longer fit before the deadline get a fallback move.
+    """
+
+    COMBAT = 0
+    CAN_DOCK = 1
+    NORMAL = 2
+    IDLE = 3
+
+    # an enemy this close can be in weapon range after its next move
+    COMBAT_RADIUS = hlt.constants.WEAPON_RADIUS + hlt.constants.MAX_SPEED
+    # weight of the newest sample in the moving average of decision time
+    COST_SMOOTHING = 0.3
+    # seconds assumed for a ship we have not timed yet
+    DEFAULT_COST = 0.005
+
+    def __init__(self):
+        self.cost = {}
+        self.idle_ids = set()
+        # ships with an enemy within COMBAT_RADIUS at the last rank()
+        self.combat_ids = set()
+        # closest enemy ship to each ship at the last rank(), for fallback moves
+        self.nearest_enemy = {}
+
+    def rank(self, action_ships, game_map):
+        action_ships = list(action_ships)
+        self.combat_ids = set()
+        self.nearest_enemy = {}
+        # forget ships that died (or docked and left the active list)
+        active_ids = set(actionShip.get_id() for actionShip in action_ships)
+        self.cost = dict((ship_id, cost) for ship_id, cost in self.cost.items() if ship_id in active_ids)
+        self.idle_ids &= active_ids
+        if not action_ships:
+            return []
+
+        me = game_map.get_me()
+        enemies = [ship for player in game_map.all_players() if player != me for ship in player.all_ships()]
+        enemy_xy = np.array([(ship.x, ship.y) for ship in enemies]).reshape(-1, 2)
+        ship_xy = np.array([(actionShip.ship.x, actionShip.ship.y) for actionShip in action_ships])
+        if len(enemy_xy):
+            between = np.hypot(ship_xy[:, 0:1] - enemy_xy[:, 0], ship_xy[:, 1:2] - enemy_xy[:, 1])
+            nearest = between.argmin(axis=1)
+            enemy_dist = between[np.arange(len(action_ships)), nearest]
+            self.nearest_enemy = dict((actionShip.get_id(), enemies[i])
+                                      for actionShip, i in zip(action_ships, nearest))
+        else:
+            enemy_dist = np.full(len(action_ships), np.inf)
+
+        urgency = []
+        for actionShip, dist in zip(action_ships, enemy_dist):
+            if dist <= self.COMBAT_RADIUS:
+                urgency.append(self.COMBAT)
+                self.combat_ids.add(actionShip.get_id())
+            elif actionShip.target_planet and actionShip.ship.can_dock(actionShip.target_planet):
+                urgency.append(self.CAN_DOCK)
+            elif actionShip.get_id() in self.idle_ids:
+                urgency.append(self.IDLE)
+            else:
+                urgency.append(self.NORMAL)
+        # stable sort keeps activation order inside each urgency class
+        order = sorted(range(len(action_ships)), key=urgency.__getitem__)
+        return [action_ships[i] for i in order]
+
+    def has_time_for(self, actionShip, deadline):
+        return deadline is None or time.time() + self.cost.get(actionShip.get_id(), self.DEFAULT_COST) < deadline
+
+    def record(self, actionShip, elapsed, cmd):
+        ship_id = actionShip.get_id()
+        previous = self.cost.get(ship_id, elapsed)
+        self.cost[ship_id] = (1 - self.COST_SMOOTHING) * previous + self.COST_SMOOTHING * elapsed
+        if cmd:
+            self.idle_ids.discard(ship_id)
+        else:
+            self.idle_ids.add(ship_id)
+
+
 class SwarmMaster:
 
     DIVIDE_PROB = 0.7
     ATTACK_PROB = 0.7
+    # Cost of a ship/planet pair the ship's action can't use; never chosen over a real pair
+    UNSUITABLE_COST = 1e9
+    # Seconds into the turn by which every command must be decided
+    TIME_LIMIT = 1.75
     
 
     def __init__(self):
         logging.info("Starting Swarm Master")
-        self.planets_being_explored = []
-        self.active_ship_list = []
+        # ActionShips keyed by ship id, in the order the ships first became active
+        self.active_ships = {}
+        self.planet_index = None
+        self.scheduler = TurnScheduler()
+        self.quality = QualityController()
 
             
     def update_ship_list(self, game_map):
         
-        #first check to see if any of my ships have docked or been destroyed 
-        my_ship_ids = [ship.id for ship in game_map.get_me().all_ships()]
-        logging.info("All ship ids: "+str(my_ship_ids))
-        #for actionShip in self.active_ship_list:
-            #if actionShip.ship.docking_status != hlt.entity.Ship.DockingStatus.UNDOCKED or actionShip.get_id() not in my_ship_ids:
-                #self.active_ship_list.remove(actionShip)
-        
-        #next, figure out if there are any new ships to add to the active list
-        active_ship_ids = [actionShip.get_id() for actionShip in self.active_ship_list]
-        logging.info("Active ship ids: "+str(active_ship_ids))
+        #swap in this frame's Ship objects, add new undocked ships and drop the ones that docked
+        seen_ids = set()
         for ship in game_map.get_me().all_ships():
-            if ship.docking_status == hlt.entity.Ship.DockingStatus.UNDOCKED and not ship.id in active_ship_ids:
-                self.active_ship_list.append(ActionShip(ship))
-      
+            seen_ids.add(ship.id)
+            actionShip = self.active_ships.get(ship.id)
+            if ship.docking_status != hlt.entity.Ship.DockingStatus.UNDOCKED:
+                if actionShip is not None:
+                    logging.info(str(ship.id)+": docked, removing from active ships")
+                    del self.active_ships[ship.id]
+            elif actionShip is None:
+                logging.info(str(ship.id)+": spawned, adding to active ships")
+                self.active_ships[ship.id] = ActionShip(ship, quality=self.quality)
+            else:
+                actionShip.ship = ship
+
+        #anything we still track that is missing from the frame was destroyed
+        for ship_id in self.active_ships.keys() - seen_ids:
+            logging.info(str(ship_id)+": destroyed, removing from active ships")
+            del self.active_ships[ship_id]
 
 
     def set_ship_action(self, actionShip):
@@ -285,41 +636,117 @@ class SwarmMaster:
             actionShip.set_action(ActionType.DEFEND)
         
 
-    def update_swarm(self, game_map, turn_count, turn_time):
-        
+    def assign_planets(self, planet_index):
+        """
+        Give every DIVIDE/FORTIFY ship its planet for the turn with one assignment over docking slots,
+        so the fleet spreads over the free spots instead of each ship greedily taking the nearest planet.
+        """
+        for actionShip in self.active_ships.values():
+            actionShip.target_planet = None
+        status_for_action = {ActionType.DIVIDE: 'free', ActionType.FORTIFY: 'mine'}
+        ships = [actionShip for actionShip in self.active_ships.values() if actionShip.action in status_for_action]
+        if not ships:
+            return
+
+        # one column per open docking slot
+        slots = []
+        slot_class = []
+        for planet_class in ('free', 'mine_open'):
+            for planet in planet_index.classes[planet_class]:
+                open_spots = planet_index.open_spots[planet.id]
+                slots.extend([planet] * open_spots)
+                slot_class.extend([planet_class] * open_spots)
+        if not slots:
+            return
+
+        ship_xy = np.array([(actionShip.ship.x, actionShip.ship.y) for actionShip in ships])
+        slot_xy = np.array([(planet.x, planet.y) for planet in slots])
+        cost = np.hypot(ship_xy[:, 0:1] - slot_xy[:, 0], ship_xy[:, 1:2] - slot_xy[:, 1])
+        # a slot suits a ship if its planet counts for the action's planet_status, as in find_closest_planet
+        slot_class = np.array(slot_class)
+        for action, status in status_for_action.items():
+            rows = np.array([actionShip.action == action for actionShip in ships])
+            unsuitable = ~np.isin(slot_class, PlanetIndex.STATUS_CLASSES[status])
+            cost[np.ix_(rows, unsuitable)] = self.UNSUITABLE_COST
+
+        for i, slot in enumerate(solve_assignment(cost)):
+            if slot >= 0 and cost[i, slot] < self.UNSUITABLE_COST:
+                ships[i].target_planet = slots[slot]
+
+    def mark_evaders(self, game_map):
+        """
+        Flag the ships in combat that are outgunned where they stand and expect enough damage next turn to die,
+        reading every ship's danger from the turn's influence grids at once.
+        """
+        for actionShip in self.active_ships.values():
+            actionShip.evading = False
+        ships = [self.active_ships[ship_id] for ship_id in self.scheduler.combat_ids]
+        if not ships:
+            return
+        influence = game_map.get_influence()
+        xs = np.array([actionShip.ship.x for actionShip in ships])
+        ys = np.array([actionShip.ship.y for actionShip in ships])
+        health = np.array([actionShip.ship.health for actionShip in ships])
+        outgunned = influence.sample(influence.threat, xs, ys) > influence.sample(influence.support, xs, ys)
+        doomed = influence.sample(influence.damage, xs, ys) >= health
+        for actionShip, evade in zip(ships, outgunned & doomed):
+            actionShip.evading = bool(evade)
+
+    def update_swarm(self, game_map, turn_count, turn_time=None):
+        #turn_time is when the turn's frame arrived, None to play without a time limit
+
         logging.info("Updating swarm")
         command_queue = []
-        self.planets_being_explored = []
         self.update_ship_list(game_map)
-
-        for actionShip in self.active_ship_list:
+        with game_map.profiler.phase('index'):
+            self.planet_index = PlanetIndex(game_map)
+
+        #new ships and ships that found nothing to do last turn pick between dividing and fortifying, then
+        #planets are handed out for the whole fleet at once; ships left without one turn offensive below
+        for actionShip in self.active_ships.values():
+            if not actionShip.is_action_set or actionShip.get_id() in self.scheduler.idle_ids:
+                self.set_ship_action(actionShip)
+        self.assign_planets(self.planet_index)
+
+        deadline = None if turn_time is None else turn_time + self.TIME_LIMIT
+        ordered_ships = self.scheduler.rank(self.active_ships.values(), game_map)
+        self.mark_evaders(game_map)
+        self.quality.start_turn(ordered_ships, turn_count, deadline)
+        for i, actionShip in enumerate(ordered_ships):
         
-            #if we are getting close to time limit, break early
-            if time.time() - turn_time > 1.75:
-                logging.warning("Breaking from turn "+str(turn_count)+" early due to time limit!")
+            #if the next ship won't fit in the time left, everyone left gets a cheap move instead
+            if not self.scheduler.has_time_for(actionShip, deadline):
+                logging.warning("Out of time on turn "+str(turn_count)+", "+str(len(ordered_ships) - i)+" ships get fallback moves")
+                for lateShip in ordered_ships[i:]:
+                    command_queue.append(lateShip.fallback_action(
+                            game_map, self.scheduler.nearest_enemy.get(lateShip.get_id())))
                 break
-            
-            #set action if it isn't set already
-            if not actionShip.is_action_set:
-                self.set_ship_offensive_action(actionShip)
         
-            cmd = actionShip.do_action(game_map)
+            start_time = time.time()
+            cmd = actionShip.do_action(game_map, self.planet_index)
             
             #if the set action doesn't work, then try offensive action
             if not cmd:
                 self.set_ship_offensive_action(actionShip)
-                cmd = actionShip.do_action(game_map)                
+                cmd = actionShip.do_action(game_map, self.planet_index)                
                
+            self.scheduler.record(actionShip, time.time() - start_time, cmd)
             command_queue.append(cmd)
 
         return command_queue
 
 
 class GameMaster:
-    def __init__(self):
+    def __init__(self, cprofile_turns=0, trace_memory=False, profile=False):
+        """
+        :param int cprofile_turns: Keep cProfile stats for this many of the slowest turns (0 to skip profiling)
+        :param bool trace_memory: Write a per-turn tracemalloc report at the end of the game
+        :param bool profile: Time each turn's phases and write a percentile summary at the end of the game
+        """
 
         #start up game process
-        self.game = hlt.Game("BaucomBot")
+        self.game = hlt.Game("BaucomBot", profile=profile, cprofile_turns=cprofile_turns,
+                             trace_memory=trace_memory)
         logging.info("Starting Game Master")
 
         #init game master
@@ -336,7 +763,9 @@ class GameMaster:
         self.turn_timer = time.time()
         logging.info("Starting Turn: " + str(self.turn_counter))
 
-        commands = self.swarm.update_swarm(self.game.update_map(), self.turn_counter, self.turn_timer)
+        game_map = self.game.update_map()
+        with self.game.profiler.phase('strategy'):
+            commands = self.swarm.update_swarm(game_map, self.turn_counter, self.turn_timer)
         if not commands:
             commands = ''
         self.game.send_command_queue(commands)
@@ -344,7 +773,43 @@ class GameMaster:
         logging.info("Ending Turn: "+str(self.turn_counter) + ", Elapsed time: " +str(time.time() - self.turn_timer))
 
 
+# config key -> (class, attribute) for the constants tune.py searches over
+TUNABLE_PARAMETERS = {
+    'divide_prob': (SwarmMaster, 'DIVIDE_PROB'),
+    'attack_prob': (SwarmMaster, 'ATTACK_PROB'),
+    'time_limit': (SwarmMaster, 'TIME_LIMIT'),
+    'defend_radius': (ActionShip, 'DEFEND_RADIUS'),
+    'max_corrections': (ActionShip, 'MAX_CORRECTIONS'),
+    'angular_step': (ActionShip, 'ANGULAR_STEP'),
+}
+
+
+def get_parameters():
+    return dict((key, getattr(cls, attribute)) for key, (cls, attribute) in TUNABLE_PARAMETERS.items())
+
+
+def load_parameters(path):
+    """
+    Override the tunable constants from a JSON file of {config key: value}.
+    """
+    with open(path) as f:
+        parameters = json.load(f)
+    for key, value in parameters.items():
+        if key not in TUNABLE_PARAMETERS:
+            raise ValueError("Unknown bot parameter "+str(key))
+        cls, attribute = TUNABLE_PARAMETERS[key]
+        # keep ints ints, navigate's correction loop needs them
+        setattr(cls, attribute, type(getattr(cls, attribute))(value))
+        logging.info("Parameter "+key+" set to "+str(getattr(cls, attribute)))
+
+
 if __name__ == "__main__":
-    gm = GameMaster()
+    # e.g. BAUCOMBOT_CPROFILE_TURNS=5 ./run_game.sh to see where the worst turns go
+    gm = GameMaster(int(os.environ.get('BAUCOMBOT_CPROFILE_TURNS', 0)),
+                    bool(os.environ.get('BAUCOMBOT_TRACE_MEMORY')),
+                    bool(os.environ.get('BAUCOMBOT_PROFILE')))
+    # tune.py hands each candidate its parameters this way
+    if os.environ.get('BAUCOMBOT_CONFIG'):
+        load_parameters(os.environ['BAUCOMBOT_CONFIG'])
     while True:
         gm.one_turn()
@@ -14,6 +14,8 @@ to log anything use the logging module.
 import hlt
 # Then let's import the logging module so we can print out information
 import logging
+import os
+import time
 import Navigation
 
 # GAME START
@@ -21,17 +23,29 @@ import Navigation
 game = hlt.Game("Settler")
 # Then we print our start message to the logs
 logging.info("Starting my Settler bot!")
+# D* Lite keeps each ship's search tree between turns and repairs it, but its first search costs several ARA*
+# searches and on these maps the repairs don't win that back yet, so it is opt-in (NAV_TEST_INCREMENTAL=1)
+Incremental = Navigation.IncrementalPlanner() if os.environ.get('NAV_TEST_INCREMENTAL') else None
+# We are still in the init phase until the first update_map sends our name, so start the planning workers now
+Pool = Navigation.PlanningPool(game.map.width, game.map.height)
 
 
 while True:
     # TURN START
     # Update the map for the new turn and get the latest version
     game_map = game.update_map()
+    # Leave some of the 2 second turn for sending commands
+    turn_deadline = time.time() + 1.5
     
-    Planner = Navigation.PathPlanner(game_map)
+    Planner = Navigation.PathPlanner(game_map, Incremental, Pool, turn_deadline=turn_deadline)
+    if Incremental is not None:
+        Incremental.prune([ship.id for ship in game_map.get_me().all_ships()])
 
     # Here we define the set of commands to be sent to the Halite engine at the end of the turn
     command_queue = []
+    # Ships that need a path are collected and planned in one batch
+    nav_ships = []
+    nav_destinations = []
     # For every ship that I control
     for ship in game_map.get_me().all_ships():
         # If the ship is docked
@@ -52,16 +66,18 @@ while True:
                 command_queue.append(ship.dock(planet))
             else:
                    
-                dest = ship.closest_point_to(planet) 
-                navigate_command = Planner.get_nav_cmd_for_ship(ship,dest,Navigation.PlanObstacleType.ALL)
-                    
-                # If the move is possible, add it to the command_queue (if there are too many obstacles on the way
-                # or we are trapped (or we reached our destination!), navigate_command will return null;
-                # don't fret though, we can run the command again the next turn)
-                if navigate_command:
-                    command_queue.append(navigate_command)
+                nav_ships.append(ship)
+                nav_destinations.append(ship.closest_point_to(planet))
             break
 
+    nav_commands = Planner.get_nav_cmds_many(nav_ships, nav_destinations, Navigation.PlanObstacleType.ALL)
+    for ship in nav_ships:
+        # If the move is possible, add it to the command_queue (if there are too many obstacles on the way
+        # or we are trapped (or we reached our destination!), there is no command;
+        # don't fret though, we can run the command again the next turn)
+        if nav_commands[ship.id]:
+            command_queue.append(nav_commands[ship.id])
+
     # Send our set of commands to the Halite engine for this turn
     game.send_command_queue(command_queue)
     # TURN END
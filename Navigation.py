@@ -1,11 +1,21 @@
 import numpy as np
-from Queue import PriorityQueue
+from queue import PriorityQueue
+import heapq
 import math
 from enum import Enum
 import copy
+import logging
+import time
+import os
+import sys
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
 import bresenham
+import hlt
 
 MAX_SPEED = 7
+INF = float('inf')
 
 class PlanningMap:
 
@@ -14,12 +24,13 @@ class PlanningMap:
         self.height = height
         self.map = np.zeros((self.height,self.width),dtype=bool)
         self.inflation_buffer = inflation_buffer
-        self.ship_for_map_set = -1
         
     def set_obstacle(self,xCenter,yCenter,radius,clear=False,inflation_buffer=True):
         if inflation_buffer:
             radius = radius + self.inflation_buffer
             
+        xCenter = int(round(xCenter))
+        yCenter = int(round(yCenter))
         radius = int(math.ceil(radius))
         for x in range(xCenter-radius,xCenter+1):
             for y in range(yCenter-radius,yCenter+1):
@@ -57,19 +68,12 @@ class PlanningMap:
         self.add_planet_obstacles(game_map)
         
     def get_map(self):
-        self.reset_map_for_ship() 
         return self.map
         
-    def get_map_for_ship(self,ship):
-        self.reset_map_for_ship() 
-        self.set_obstacle(ship.x,ship.y,ship.radius,clear=True)
-        self.ship_for_map_set = ship
-        return self.map
-        
-    def reset_map_for_ship(self):
-        if self.ship_for_map_set != -1:
-            self.set_obstacle(self.ship_for_map_set.x,self.ship_for_map_set.y,self.ship_for_map_set.radius,clear=False)
-            self.ship_for_map_set = -1
+    def get_map_for_ship(self,ship,ignore=()):
+        #the ship's own disk is cleared in an overlay, self.map is never touched
+        cleared = get_disk_cells([ship] + list(ignore), self.inflation_buffer, self.width, self.height)
+        return ObstacleMask(self.map, cleared)
     
         
         
@@ -79,24 +83,306 @@ class PlanObstacleType(Enum):
     PLANETS_ONLY = 1
     SHIPS_ONLY = 2
     ALL = 3
+    PLANETS_AND_ENEMIES = 4
+
+
+class OccupancyLayer(Enum):
+    PLANETS = 0
+    MY_SHIPS = 1
+    ENEMY_SHIPS = 2
+    DOCKED_SHIPS = 3
+
+#Docked ships are also in their owner's layer, so DOCKED_SHIPS only matters for masks that leave an owner out
+OBSTACLE_LAYERS = {
+    PlanObstacleType.NONE: (),
+    PlanObstacleType.PLANETS_ONLY: (OccupancyLayer.PLANETS,),
+    PlanObstacleType.SHIPS_ONLY: (OccupancyLayer.MY_SHIPS, OccupancyLayer.ENEMY_SHIPS),
+    PlanObstacleType.ALL: (OccupancyLayer.PLANETS, OccupancyLayer.MY_SHIPS, OccupancyLayer.ENEMY_SHIPS),
+    PlanObstacleType.PLANETS_AND_ENEMIES: (OccupancyLayer.PLANETS, OccupancyLayer.ENEMY_SHIPS),
+}
+
+_disk_offsets = {}
+
+def get_disk_offsets(radius):
+    #cell offsets covered by a rasterized disk, same rule as PlanningMap.set_obstacle
+    if radius not in _disk_offsets:
+        dy, dx = np.mgrid[-radius:radius+1, -radius:radius+1]
+        inside = dx*dx + dy*dy <= radius*radius
+        _disk_offsets[radius] = (dx[inside], dy[inside])
+    return _disk_offsets[radius]
+
+
+def get_disk_cells(entities, inflation_buffer, width, height):
+    #all in-map cells covered by the inflated entities, grouped by radius so the stamp is vectorized
+    by_radius = {}
+    for entity in entities:
+        radius = int(math.ceil(entity.radius + inflation_buffer))
+        by_radius.setdefault(radius, []).append((entity.x, entity.y))
+    xs = []
+    ys = []
+    for radius, centers in by_radius.items():
+        centers = np.rint(np.array(centers)).astype(np.intp)
+        dx, dy = get_disk_offsets(radius)
+        x = (centers[:, 0:1] + dx).ravel()
+        y = (centers[:, 1:2] + dy).ravel()
+        inside = (x >= 0) & (y >= 0) & (x < width) & (y < height)
+        xs.append(x[inside])
+        ys.append(y[inside])
+    if not xs:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+class ObstacleMask:
+#Read-only view of a shared grid with the cells of ignored entities cleared in a small local overlay
+#The shared grid is never written, so many ships (or threads) can plan against it at once
+#An optional cost layer adds a non-negative float to every step into a cell; a step still costs at least 1, so the
+#straight-line heuristics stay admissible. Without one every planner keeps its unit-cost inner loop
+
+    def __init__(self, grid, cleared=None, cost=None):
+        self.grid = grid
+        self.height, self.width = grid.shape
+        if cleared is None:
+            self.cleared = frozenset()
+        else:
+            xs, ys = cleared
+            self.cleared = frozenset(zip(xs.tolist(), ys.tolist()))
+        self.cost = None
+        self.step_costs = None
+        if cost is not None:
+            cost = np.ascontiguousarray(cost, dtype=np.float32)
+            if cost.shape != grid.shape:
+                raise ValueError("Cost layer is "+str(cost.shape)+", the grid is "+str(grid.shape))
+            if cost.size and cost.min() < 0:
+                raise ValueError("Cost layer must be non-negative or the heuristics overestimate")
+            self.cost = cost
+            #a flat memoryview hands the search loops plain Python floats, much cheaper than numpy scalar indexing
+            self.step_costs = memoryview(cost.reshape(-1))
+
+    def is_blocked(self, x, y):
+        return self.grid[y, x] and (x, y) not in self.cleared
+
+    def step_cost(self, x, y):
+        if self.step_costs is None:
+            return 1
+        return 1 + self.step_costs[y*self.width + x]
+
+    def get_changed_cells(self, other):
+        #cells whose blocked state or step cost may differ between two masks
+        if self.grid is other.grid:
+            changed = set()
+        else:
+            changed = set((int(col), int(row)) for row, col in np.argwhere(self.grid != other.grid))
+        if self.cost is not other.cost:
+            if self.cost is None or other.cost is None:
+                differs = (self.cost if other.cost is None else other.cost) != 0
+            else:
+                differs = self.cost != other.cost
+            changed |= set((int(col), int(row)) for row, col in np.argwhere(differs))
+        return changed | self.cleared | other.cleared
+
+    def to_array(self):
+        grid = self.grid.copy()
+        for x, y in self.cleared:
+            grid[y, x] = False
+        return grid
+
+
+def as_obstacle_mask(scene):
+    if isinstance(scene, ObstacleMask):
+        return scene
+    return ObstacleMask(np.asarray(scene, dtype=bool))
+
+
+def distance_transform(obstacles, max_distance):
+    #Euclidean distance from each cell to the nearest obstacle cell, exact up to max_distance
+    #(anything farther reads as max_distance+1). Two separable passes of array shifts, O(max_distance) numpy ops
+    height, width = obstacles.shape
+    far = max_distance + 1
+    column = np.where(obstacles, 0, far).astype(np.float32)
+    for d in range(1, min(max_distance, height - 1) + 1):
+        hit = np.zeros_like(obstacles)
+        hit[d:] |= obstacles[:-d]
+        hit[:-d] |= obstacles[d:]
+        column[hit & (column > d)] = d
+    best = column * column
+    squared = best.copy()
+    for d in range(1, min(max_distance, width - 1) + 1):
+        np.minimum(best[:, d:], squared[:, :-d] + d*d, out=best[:, d:])
+        np.minimum(best[:, :-d], squared[:, d:] + d*d, out=best[:, :-d])
+    clearance = np.sqrt(best)
+    np.minimum(clearance, far, out=clearance)
+    return clearance
+
+
+class OccupancyGrid:
+#One packed bit layer per OccupancyLayer; any obstacle mask is an OR of layers, built on demand and cached
+#A per-layer clearance (distance to the nearest obstacle cell) turns any extra safety margin into a threshold
+
+    MAX_CLEARANCE = 16
+
+    def __init__(self, width, height, inflation_buffer=0.5):
+        self.width = width
+        self.height = height
+        self.inflation_buffer = inflation_buffer
+        self.packed_width = (width + 7) // 8
+        self.layers = np.zeros((len(OccupancyLayer), height, self.packed_width), dtype=np.uint8)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self.masks = {}
+        self.clearances = {}
+        self.proximity_costs = {}
+
+    def get_disk_cells(self, entities, margin=0):
+        return get_disk_cells(entities, self.inflation_buffer + margin, self.width, self.height)
+
+    def stamp(self, grid, entities, value=True):
+        xs, ys = self.get_disk_cells(entities)
+        grid[ys, xs] = value
+        return grid
+
+    def set_layer(self, layer, entities):
+        grid = self.stamp(np.zeros((self.height, self.width), dtype=bool), entities)
+        self.layers[layer.value] = np.packbits(grid, axis=1)
+        self.clear_cache()
+
+    def add_game_map(self, game_map):
+        me = game_map.get_me()
+        my_ships = []
+        enemy_ships = []
+        docked_ships = []
+        for player in game_map.all_players():
+            ships = player.all_ships()
+            if player == me:
+                my_ships.extend(ships)
+            else:
+                enemy_ships.extend(ships)
+            docked_ships.extend(ship for ship in ships if ship.docking_status != hlt.entity.Ship.DockingStatus.UNDOCKED)
+        self.set_layer(OccupancyLayer.PLANETS, game_map.all_planets())
+        self.set_layer(OccupancyLayer.MY_SHIPS, my_ships)
+        self.set_layer(OccupancyLayer.ENEMY_SHIPS, enemy_ships)
+        self.set_layer(OccupancyLayer.DOCKED_SHIPS, docked_ships)
+
+    def get_packed_mask(self, layers):
+        if not layers:
+            return np.zeros((self.height, self.packed_width), dtype=np.uint8)
+        return np.bitwise_or.reduce(self.layers[[layer.value for layer in layers]], axis=0)
+
+    def get_mask(self, layers):
+        #shared read-only bool grid, indexed [y][x] like PlanningMap.map
+        key = frozenset(layers)
+        if key not in self.masks:
+            mask = np.unpackbits(self.get_packed_mask(layers), axis=1, count=self.width).view(bool)
+            mask.flags.writeable = False
+            self.masks[key] = mask
+        return self.masks[key]
+
+    def get_clearance(self, layers):
+        #computed at most once per layer combination per turn
+        key = frozenset(layers)
+        if key not in self.clearances:
+            clearance = distance_transform(self.get_mask(layers), self.MAX_CLEARANCE)
+            clearance.flags.writeable = False
+            self.clearances[key] = clearance
+        return self.clearances[key]
+
+    def get_proximity_cost(self, layers, radius):
+        #1 next to the layers' obstacles, fading linearly to 0 at radius cells away; cached like the clearance
+        key = (frozenset(layers), radius)
+        if key not in self.proximity_costs:
+            clearance = self.get_clearance(layers)
+            cost = np.clip(1 - (clearance - 1) / radius, 0, 1).astype(np.float32)
+            cost[self.get_mask(layers)] = 0
+            cost.flags.writeable = False
+            self.proximity_costs[key] = cost
+        return self.proximity_costs[key]
+
+    def get_mask_with_margins(self, margins):
+        #margins maps OccupancyLayer -> extra distance (cells) to keep beyond the inflation_buffer
+        #the clearance is only exact up to MAX_CLEARANCE, a bigger margin would block the whole map
+        key = tuple(sorted((layer.value, margin) for layer, margin in margins.items()))
+        if key not in self.masks:
+            too_wide = max(margins.values() or [0])
+            if too_wide > self.MAX_CLEARANCE:
+                raise ValueError("Margin "+str(too_wide)+" is wider than MAX_CLEARANCE ("+
+                                 str(self.MAX_CLEARANCE)+")")
+            mask = np.zeros((self.height, self.width), dtype=bool)
+            for layer, margin in margins.items():
+                if margin > 0:
+                    mask |= self.get_clearance((layer,)) <= margin
+                else:
+                    mask |= self.get_mask((layer,))
+            mask.flags.writeable = False
+            self.masks[key] = mask
+        return self.masks[key]
+
+    def get_margins(self, obstacle_type, margin):
+        #margin is one distance for every layer of the obstacle type, or a dict per OccupancyLayer
+        layers = OBSTACLE_LAYERS[obstacle_type]
+        if isinstance(margin, dict):
+            return dict((layer, margin.get(layer, 0)) for layer in layers)
+        return dict((layer, margin) for layer in layers)
+
+    def get_mask_for_obstacle_type(self, obstacle_type, margin=0):
+        if obstacle_type not in OBSTACLE_LAYERS:
+            raise ValueError("Invalide PlanObstacle type")
+        if not margin:
+            return self.get_mask(OBSTACLE_LAYERS[obstacle_type])
+        return self.get_mask_with_margins(self.get_margins(obstacle_type, margin))
+
+    def get_mask_ignoring(self, obstacle_type, ignore=(), margin=0, cost=None):
+        #ignored entities are cleared in an overlay; the cached shared mask stays untouched
+        grid = self.get_mask_for_obstacle_type(obstacle_type, margin)
+        if not ignore:
+            return ObstacleMask(grid, cost=cost)
+        if margin:
+            margin = max(self.get_margins(obstacle_type, margin).values() or [0])
+        return ObstacleMask(grid, self.get_disk_cells(ignore, margin), cost)
 
 class PathPlanner:
 #Everything is flipped with rows and columns for x and y 
+
+    #planet and congestion costs fade out this many cells from the obstacles
+    COST_RADIUS = 4
  
-    def __init__(self, game_map):
-        self.full_map = PlanningMap(game_map.width, game_map.height)
-        self.full_map.add_all_obstacles(game_map)
-        self.empty_map = PlanningMap(game_map.width, game_map.height)
-        self.planet_only_map = []
-        self.ship_only_map = []
+    def __init__(self, game_map, incremental_planner=None, planning_pool=None, occupancy=None, turn_deadline=None):
+        #planning workers pass in the occupancy they read from shared memory instead of a map
+        if occupancy is None:
+            occupancy = OccupancyGrid(game_map.width, game_map.height)
+            occupancy.add_game_map(game_map)
+        self.occupancy = occupancy
         self.game_map = game_map
+        #optional IncrementalPlanner and PlanningPool that outlive this (per turn) planner
+        self.incremental_planner = incremental_planner
+        self.planning_pool = planning_pool
+        self.anytime_planner = AnytimePlanner()
+        #plain A* keeps a path per queue entry and closes cells when queued, which is only right for unit steps
+        self.weighted_planner = AnytimePlanner(epsilon_start=1.0)
+        #time.time() by which every search of this turn must have returned, None for no limit
+        self.turn_deadline = turn_deadline
+        self.cooperative_planner = CooperativePlanner()
         
-    def get_nav_cmd_for_ship(self,ship,destination,obstacle_type=PlanObstacleType.ALL):
+    def get_cost_layer(self, threat=0.0, planets=0.0, congestion=0.0):
+        #extra cost of stepping into each cell, to pass as cost= to the planning calls
+        #threat is per enemy gun that can reach the cell next turn (the game map's influence grid)
+        #planets and congestion are the cost right next to a planet / one of our ships, fading out over COST_RADIUS
+        cost = np.zeros((self.occupancy.height, self.occupancy.width), dtype=np.float32)
+        if threat:
+            cost += threat * self.game_map.get_influence().threat
+        if planets:
+            cost += planets * self.occupancy.get_proximity_cost((OccupancyLayer.PLANETS,), self.COST_RADIUS)
+        if congestion:
+            cost += congestion * self.occupancy.get_proximity_cost((OccupancyLayer.MY_SHIPS,), self.COST_RADIUS)
+        return cost
+
+    def get_nav_cmd_for_ship(self,ship,destination,obstacle_type=PlanObstacleType.ALL,ignore=(),margin=0,deadline=None,
+                             cost=None):
 
-        path = self.plan_path_for_ship(ship,destination,obstacle_type)
+        path = self.plan_path_for_ship(ship,destination,obstacle_type,ignore,margin,deadline,cost)
         #print('Path')
         #print(path)
-        simple_path = self.simplify_path(ship,path,obstacle_type)
+        simple_path = self.simplify_path(ship,path,obstacle_type,ignore,margin,cost)
         #print('Simple path')
         #print(simple_path)
         dist,ang = self.path_to_nav_cmd(simple_path)
@@ -105,17 +391,115 @@ class PathPlanner:
         #print(ang*180/math.pi)
         return ship.thrust(dist,ang)
         
-    def simplify_path(self,ship,path,obstacle_type):
+    def plan_many(self,ships,destinations,obstacle_type=PlanObstacleType.ALL,simplify=False,margin=0,cost=None,
+                  deadline=None):
+        #batch version of plan_path_for_ship, returns {ship.id: path}
+        #deadline is when the whole batch must be done by, never later than the turn deadline
+        #big batches are spread over the planning pool, small ones are not worth the round trip
+        #the pool only shares the occupancy layers, so searches with a cost layer stay here
+        deadline = self.clip_deadline(deadline)
+        pool = self.planning_pool
+        if pool is None or len(ships) < pool.min_batch or cost is not None:
+            paths = {}
+            for i, (ship, destination) in enumerate(zip(ships,destinations)):
+                #each ship gets an even share of what is left of the batch's time
+                ship_deadline = None
+                if deadline is not None:
+                    ship_deadline = time.time() + (deadline - time.time()) / (len(ships) - i)
+                path = self.plan_path_for_ship(ship,destination,obstacle_type,margin=margin,deadline=ship_deadline,
+                                               cost=cost)
+                if simplify and path:
+                    path = self.simplify_path(ship,path,obstacle_type,margin=margin,cost=cost)
+                paths[ship.id] = path
+            return paths
+
+        pool.publish(self.occupancy)
+        tasks = []
+        for ship, destination in zip(ships,destinations):
+            if hasattr(destination,'x'):
+                destination = (destination.x,destination.y)
+            scene = self.get_map_for_ship_and_obstacle(ship,obstacle_type,margin=margin)
+            tasks.append((pool.generation, obstacle_type.value, self.get_cell(ship.x,ship.y),
+                          self.get_cell(*destination), list(scene.cleared), simplify, margin, deadline))
+        return dict(zip([ship.id for ship in ships], pool.map(tasks)))
+
+    def get_nav_cmds_many(self,ships,destinations,obstacle_type=PlanObstacleType.ALL,margin=0,cost=None,
+                          deadline=None):
+        simple_paths = self.plan_many(ships,destinations,obstacle_type,simplify=True,margin=margin,cost=cost,
+                                      deadline=deadline)
+        commands = {}
+        for ship in ships:
+            simple_path = simple_paths.get(ship.id)
+            if not simple_path:
+                commands[ship.id] = None
+                continue
+            dist,ang = self.path_to_nav_cmd(simple_path)
+            commands[ship.id] = ship.thrust(dist,ang)
+        return commands
 
-        ship_map = self.get_map_for_ship_and_obstacle(ship,obstacle_type)
+    def get_cooperative_nav_cmds(self,ships,destinations,window=None,deadline=None,cost=None):
+        #plan the whole batch against one reservation table so our own moving ships stop blocking each other
+        #ships outside the batch (enemies, docked ships) stay static obstacles
+        fleet_ids = set(ship.id for ship in ships)
+        static_map = self.occupancy.get_mask((OccupancyLayer.PLANETS, OccupancyLayer.ENEMY_SHIPS,
+                                              OccupancyLayer.DOCKED_SHIPS)).copy()
+        idle_ships = [ship for ship in self.game_map.get_me().all_ships() if ship.id not in fleet_ids]
+        self.occupancy.stamp(static_map, idle_ships)
+
+        starts = [self.get_cell(ship.x,ship.y) for ship in ships]
+        goals = []
+        for destination in destinations:
+            if hasattr(destination,'x'):
+                destination = (destination.x,destination.y)
+            goals.append(self.get_cell(*destination))
+
+        paths = self.cooperative_planner.plan_fleet([ship.id for ship in ships],starts,goals,
+                                                    ObstacleMask(static_map,cost=cost),window,deadline)
+        #the thrust is a straight line, not the space-time path, so it is shortened until it stays clear of the
+        #static obstacles and of every cell off the ship's own path that another ship of the fleet holds at some
+        #point of this turn (cells on the path are the reservation table's to keep free)
+        holders = self.cooperative_planner.reservations.get_holders_until(MAX_SPEED)
+        turn_map = static_map.copy()
+        for x, y in holders:
+            turn_map[y, x] = True
+        commands = {}
+        for ship, start in zip(ships,starts):
+            path = paths.get(ship.id)
+            if not path or len(path) < 2:
+                commands[ship.id] = None
+                continue
+            #a turn covers up to MAX_SPEED grid steps of the space-time path
+            turn_scene = ObstacleMask(turn_map,cost=cost)
+            turn_scene.cleared = frozenset(path[:MAX_SPEED+1])
+            target = self.find_longest_line(path[:MAX_SPEED+1],turn_scene)[1]
+            if target == start:
+                commands[ship.id] = None
+                continue
+            dist,ang = self.path_to_nav_cmd((start,target))
+            commands[ship.id] = ship.thrust(dist,ang)
+        return commands
+
+    def simplify_path(self,ship,path,obstacle_type,ignore=(),margin=0,cost=None):
+
+        ship_map = self.get_map_for_ship_and_obstacle(ship,obstacle_type,ignore,margin,cost)
         return self.find_longest_line(path,ship_map)
         
     def find_longest_line(self, path,grid):
+        #(start, farthest cell of path reachable in a straight line), or (start, start) if even the next one is not
         start_point = path[0]
+        end_point = start_point
+        #with a cost layer a shortcut must not cost more than the stretch of path it replaces
+        step_costs = getattr(grid, 'step_costs', None)
+        path_cost = 0.0
         
         for cell in path:
             if cell == start_point:
                 continue
+
+            if step_costs is not None:
+                path_cost += step_costs[cell[1]*grid.width + cell[0]]
+                if self.line_cost(start_point, cell, grid) > path_cost:
+                    break
                 
             if self.does_line_intersect(start_point, cell, grid):
                 break
@@ -123,12 +507,17 @@ class PathPlanner:
                 end_point = cell
                 
         return (start_point, end_point)
+
+    def line_cost(self, p1, p2, grid):
+        #extra cost of the cells a straight line enters, start excluded (bresenham lists cells left to right)
+        return sum(grid.step_costs[pt[1]*grid.width + pt[0]] for pt in bresenham.bresenham(p1,p2).path
+                   if pt != p1)
             
     def does_line_intersect(self, p1,p2,grid):
         
         b = bresenham.bresenham(p1,p2)
         cell_hits = b.path
-        intersections = [grid[pt[1]][pt[0]] for pt in cell_hits]
+        intersections = [grid.is_blocked(pt[0],pt[1]) for pt in cell_hits]
         return np.any(intersections)            
         
         
@@ -139,50 +528,60 @@ class PathPlanner:
         y2 = simple_path[1][1]
         
         dist = math.sqrt((x2-x1)**2 + (y2-y1)**2)  
-        ang = -math.atan2((y2-y1),(x2-x1)) #negative b/c y axis is flipped
+        #grid rows are game y, so no flip is needed; thrust takes degrees
+        ang = math.degrees(math.atan2((y2-y1),(x2-x1))) % 360
         if dist > MAX_SPEED:
             dist = MAX_SPEED
         
         return dist,ang      
      
      
-    def get_map_for_ship_and_obstacle(self, ship, obstacle_type):
-        if obstacle_type == PlanObstacleType.NONE:
-            return self.empty_map.get_map()
-            
-        elif obstacle_type == PlanObstacleType.PLANETS_ONLY:
-            if not self.planet_only_map:
-                self.planet_only_map = PlanningMap(self.game_map.width, self.game_map.height)
-                self.planet_only_map.add_planet_obstacles(self.game_map)
-            return self.planet_only_map.get_map_for_ship(ship)
-            
-        elif obstacle_type == PlanObstacleType.SHIPS_ONLY:
-            if not self.ship_only_map:
-                self.ship_only_map = PlanningMap(self.game_map.width, self.game_map.height)
-                self.ship_only_map.add_ship_obstacles(self.game_map)
-            return self.ship_only_map.get_map_for_ship(ship)
-            
-        elif obstacle_type == PlanObstacleType.ALL:
-            return self.full_map.get_map_for_ship(ship)
-            
-        else:
-            raise ValueError("Invalide PlanObstacle type") 
+    def get_map_for_ship_and_obstacle(self, ship, obstacle_type, ignore=(), margin=0, cost=None):
+        #the planning ship never blocks itself; anything in ignore is cleared too
+        #margin keeps extra distance from obstacles, see OccupancyGrid.get_margins; cost comes from get_cost_layer
+        return self.occupancy.get_mask_ignoring(obstacle_type, [ship] + list(ignore), margin, cost)
          
         
-    def plan_path_for_ship(self,ship,destination,obstacle_type):
+    def plan_path_for_ship(self,ship,destination,obstacle_type,ignore=(),margin=0,deadline=None,cost=None):
         
-        ship_map = self.get_map_for_ship_and_obstacle(ship,obstacle_type)
-        return self.find_path((ship.x,ship.y),destination,ship_map)
+        ship_map = self.get_map_for_ship_and_obstacle(ship,obstacle_type,ignore,margin,cost)
+        if hasattr(destination,'x'):
+            destination = (destination.x,destination.y)
+        start = self.get_cell(ship.x,ship.y)
+        goal = self.get_cell(*destination)
+        if self.incremental_planner is not None:
+            return self.incremental_planner.find_path(ship.id,start,goal,ship_map,obstacle_type,
+                                                      self.clip_deadline(deadline))
+        return self.find_path_before(start,goal,ship_map,deadline)
+
+    def clip_deadline(self,deadline):
+        #a search's own deadline, never later than the turn's
+        if self.turn_deadline is not None:
+            deadline = min(deadline or self.turn_deadline, self.turn_deadline)
+        return deadline
+
+    def find_path_before(self,start,goal,scene,deadline=None):
+        #anytime search when there is a clock to respect, plain A* otherwise
+        deadline = self.clip_deadline(deadline)
+        if deadline is None:
+            return self.find_path(start,goal,scene)
+        return self.anytime_planner.find_path(start,goal,scene,deadline)
+
+    def get_cell(self,x,y):
+        #round a continuous position onto the nearest cell inside the map
+        col = min(max(int(round(x)),0),self.occupancy.width-1)
+        row = min(max(int(round(y)),0),self.occupancy.height-1)
+        return (col,row)
   
     def next_path_nodes(self,node,scene,path):
         lst = ((0,1),(1,0),(0,-1),(-1,0))
         nxt = []
-        dims = (len(scene[0]), len(scene))
+        dims = (scene.width, scene.height)
         for dxy in lst:
             new_node = (node[0]+dxy[0],node[1]+dxy[1])
             if new_node[0] >= dims[0] or new_node[1] >= dims[1] or new_node[0] < 0 or new_node[1] < 0:
                 continue
-            if not scene[new_node[1]][new_node[0]]:
+            if not scene.is_blocked(new_node[0],new_node[1]):
                 nxt.append((new_node,path+[new_node]))
         return nxt
 
@@ -197,13 +596,19 @@ class PathPlanner:
         if start == goal:
             return []
 
+        scene = as_obstacle_mask(scene)
+        if scene.step_costs is not None:
+            path = self.weighted_planner.find_path(start, goal, scene, INF)
+            #an unreachable goal is None here, not ARA*'s best effort towards it
+            return path if path and path[-1] == goal else None
+
         #check to make sure goal and start are not on obstacles
-        if scene[start[1]][start[0]] == True:
-            print('Start on obstacle')
+        #stdout is the engine pipe in the bot, so this only goes to the log
+        if scene.is_blocked(*start):
+            logging.debug('Start on obstacle')
             return None
-        if scene[goal[1]][goal[0]] == True:
-            print('Goal on obstacle')
-            print(scene)
+        if scene.is_blocked(*goal):
+            logging.debug('Goal on obstacle')
             return None
 
         # initialize search queue and explored set
@@ -237,12 +642,493 @@ class PathPlanner:
                     explored.add(new_node)
   
   
+_worker_planner = None
+
+def _init_planning_worker(shm, shape, width, height, inflation_buffer):
+    #runs once per worker process; anything printed would end up on the engine pipe
+    global _worker_planner
+    sys.stdout = open(os.devnull, 'w')
+    occupancy = OccupancyGrid(width, height, inflation_buffer)
+    occupancy.layers = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    occupancy.generation = -1
+    occupancy.shm = shm
+    _worker_planner = PathPlanner(None, occupancy=occupancy)
+
+def _plan_in_worker(task):
+    generation, obstacle_type, start, goal, cleared, simplify, margin, deadline = task
+    planner = _worker_planner
+    occupancy = planner.occupancy
+    if occupancy.generation != generation:
+        #the parent published a new turn, cached masks are stale
+        occupancy.clear_cache()
+        occupancy.generation = generation
+    grid = occupancy.get_mask_for_obstacle_type(PlanObstacleType(obstacle_type), margin)
+    scene = ObstacleMask(grid)
+    scene.cleared = frozenset(cleared)
+    path = planner.find_path_before(start, goal, scene, deadline)
+    if simplify and path:
+        return planner.find_longest_line(path, scene)
+    return path
+
+
+class PlanningPool:
+#Persistent worker processes that plan against occupancy layers in shared memory
+#Start it in the init phase (after hlt.Game() returns the name is not sent yet) so no turn pays for process startup
+
+    MIN_BATCH = 16
+
+    def __init__(self, width, height, processes=None, inflation_buffer=0.5, min_batch=None):
+        self.width = width
+        self.height = height
+        self.min_batch = min_batch if min_batch is not None else self.MIN_BATCH
+        self.shape = (len(OccupancyLayer), height, (width + 7) // 8)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+        self.layers = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.layers[:] = 0
+        self.generation = 0
+        #fork keeps the bot script from being re-run in every worker; spawn is the fallback on Windows
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context('spawn')
+        self.processes = processes or max(1, (os.cpu_count() or 2) - 1)
+        self.pool = context.Pool(self.processes, initializer=_init_planning_worker,
+                                 initargs=(self.shm, self.shape, width, height, inflation_buffer))
+        atexit.register(self.close)
+
+    def publish(self, occupancy):
+        #one memcpy of the packed layers per turn instead of pickling a grid per task
+        self.layers[:] = occupancy.layers
+        self.generation += 1
+
+    def map(self, tasks):
+        chunksize = max(1, len(tasks) // (4 * self.processes))
+        return self.pool.map(_plan_in_worker, tasks, chunksize)
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool = None
+        self.layers = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class AnytimePlanner:
+#ARA* (Likhachev, Gordon & Thrun 2003): a fast inflated-heuristic path first, then tighter ones while the clock allows
+#If even the first search runs out of time, the path to the expanded cell nearest the goal is returned
+
+    EPSILON_START = 3.0
+    EPSILON_STEP = 1.0
+    CHECK_EVERY = 64
+
+    def __init__(self, epsilon_start=None, epsilon_step=None):
+        self.epsilon_start = epsilon_start if epsilon_start is not None else self.EPSILON_START
+        self.epsilon_step = epsilon_step if epsilon_step is not None else self.EPSILON_STEP
+
+    def heuristic(self, a, b):
+        return math.sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2)
+
+    def find_path(self, start, goal, scene, deadline):
+        if start == goal:
+            return []
+        scene = as_obstacle_mask(scene)
+        if scene.is_blocked(*start) or scene.is_blocked(*goal):
+            return None
+
+        self.scene = scene
+        self.goal = goal
+        self.deadline = deadline
+        self.g = {start: 0}
+        self.parents = {start: None}
+        self.closed = set()
+        self.incons = set()
+        self.closest = (self.heuristic(start, goal), start)
+        #(epsilon, cost) of each solution found, the last one being what is returned
+        self.solutions = []
+
+        epsilon = self.epsilon_start
+        self.open = [(epsilon*self.closest[0], start)]
+        best_path = None
+        while True:
+            if self.improve_path(epsilon):
+                best_path = self.get_path(goal)
+                self.solutions.append((epsilon, self.g[goal]))
+            elif best_path is None:
+                #out of time (or unreachable) before the first solution
+                best_path = self.get_path(self.closest[1]) if self.closest[1] != start else None
+            if epsilon <= 1.0 or time.time() > deadline or best_path is None:
+                return best_path
+            epsilon = max(1.0, epsilon - self.epsilon_step)
+            #states made inconsistent during the last pass go back on open with the new weight
+            states = set(node for f, node in self.open if node not in self.closed) | self.incons
+            self.open = [(self.g[node] + epsilon*self.heuristic(node, goal), node) for node in states]
+            heapq.heapify(self.open)
+            self.closed = set()
+            self.incons = set()
+
+    def improve_path(self, epsilon):
+        #returns True once g(goal) is proven within epsilon of optimal, False if out of time or unreachable
+        goal = self.goal
+        scene = self.scene
+        g = self.g
+        dims = (scene.width, scene.height)
+        step_costs = scene.step_costs
+        width = scene.width
+        expansions = 0
+        while self.open:
+            f, node = self.open[0]
+            if goal in g and g[goal] <= f:
+                return True
+            heapq.heappop(self.open)
+            if node in self.closed:
+                continue
+            self.closed.add(node)
+
+            expansions += 1
+            if expansions % self.CHECK_EVERY == 0 and time.time() > self.deadline:
+                return False
+
+            g_next = g[node] + 1
+            for dxy in ((0,1),(1,0),(0,-1),(-1,0)):
+                new_node = (node[0]+dxy[0], node[1]+dxy[1])
+                if new_node[0] >= dims[0] or new_node[1] >= dims[1] or new_node[0] < 0 or new_node[1] < 0:
+                    continue
+                if scene.is_blocked(new_node[0], new_node[1]):
+                    continue
+                if step_costs is not None:
+                    g_next = g[node] + 1 + step_costs[new_node[1]*width + new_node[0]]
+                if g_next < g.get(new_node, INF):
+                    g[new_node] = g_next
+                    self.parents[new_node] = node
+                    h = self.heuristic(new_node, goal)
+                    if h < self.closest[0]:
+                        self.closest = (h, new_node)
+                    if new_node in self.closed:
+                        self.incons.add(new_node)
+                    else:
+                        heapq.heappush(self.open, (g_next + epsilon*h, new_node))
+        return goal in g
+
+    def get_path(self, node):
+        path = []
+        while node is not None:
+            path.append(node)
+            node = self.parents[node]
+        path.reverse()
+        return path
+
+
+class DStarLite:
+#Search tree from one goal back towards a moving start, repaired in place when cells change (Koenig & Likhachev)
+#A search cut off by its deadline leaves the queue as it was, so the next plan carries on from there
+
+    CHECK_EVERY = 64
+
+    def __init__(self, goal, grid):
+        self.goal = goal
+        #masks are read-only views of the shared grid, so keeping a reference is enough
+        self.grid = grid
+        self.dims = (grid.width, grid.height)
+        self.start = None
+        self.last_start = None
+        self.complete = False
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.queue = []
+        self.queued = {}
+        #cells expanded over the tree's life, to compare repairs with fresh searches
+        self.expansions = 0
+        self.push(goal, (0, 0))
+
+    def heuristic(self, a, b):
+        return math.sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2)
+
+    def neighbors(self, node):
+        for dxy in ((0,1),(1,0),(0,-1),(-1,0)):
+            new_node = (node[0]+dxy[0],node[1]+dxy[1])
+            if 0 <= new_node[0] < self.dims[0] and 0 <= new_node[1] < self.dims[1]:
+                yield new_node
+
+    def is_blocked(self, node):
+        return self.grid.is_blocked(node[0], node[1])
+
+    def cost(self, a, b):
+        if self.is_blocked(a) or self.is_blocked(b):
+            return INF
+        return self.grid.step_cost(b[0], b[1])
+
+    def calculate_key(self, node):
+        k = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (k + self.heuristic(self.start, node) + self.km, k)
+
+    def push(self, node, key):
+        self.queued[node] = key
+        heapq.heappush(self.queue, (key, node))
+
+    def top_key(self):
+        #entries whose key no longer matches self.queued are stale and dropped lazily
+        while self.queue:
+            key, node = self.queue[0]
+            if self.queued.get(node) == key:
+                return key
+            heapq.heappop(self.queue)
+        return (INF, INF)
+
+    def update_vertex(self, node):
+        if node != self.goal:
+            best = INF
+            if not self.is_blocked(node):
+                for nxt in self.neighbors(node):
+                    if not self.is_blocked(nxt):
+                        best = min(best, self.grid.step_cost(nxt[0], nxt[1]) + self.g.get(nxt, INF))
+            self.rhs[node] = best
+        self.queued.pop(node, None)
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self.push(node, self.calculate_key(node))
+
+    def compute_shortest_path(self, deadline=None):
+        #returns False if the deadline passed before the start's cost was settled
+        start = self.start
+        expansions = 0
+        while (self.top_key() < self.calculate_key(start)
+               or self.rhs.get(start, INF) != self.g.get(start, INF)):
+            k_old = self.top_key()
+            if k_old[0] == INF:
+                break
+            expansions += 1
+            if deadline is not None and expansions % self.CHECK_EVERY == 0 and time.time() > deadline:
+                self.expansions += expansions
+                return False
+            node = heapq.heappop(self.queue)[1]
+            del self.queued[node]
+            k_new = self.calculate_key(node)
+            if k_old < k_new:
+                self.push(node, k_new)
+            elif self.g.get(node, INF) > self.rhs.get(node, INF):
+                self.g[node] = self.rhs[node]
+                for pred in self.neighbors(node):
+                    self.update_vertex(pred)
+            else:
+                self.g[node] = INF
+                self.update_vertex(node)
+                for pred in self.neighbors(node):
+                    self.update_vertex(pred)
+        self.expansions += expansions
+        return True
+
+    def update_grid(self, grid):
+        #only cells that flipped since the last plan (and their neighbors) get touched
+        if grid is self.grid:
+            return 0
+        changed = self.grid.get_changed_cells(grid)
+        self.grid = grid
+        for node in changed:
+            self.update_vertex(node)
+            for pred in self.neighbors(node):
+                self.update_vertex(pred)
+        return len(changed)
+
+    def plan(self, start, grid, deadline=None):
+        #None if the goal is unreachable, or if the deadline cut the search short (check self.complete)
+        if self.start is None:
+            self.start = self.last_start = start
+        elif start != self.start:
+            self.start = start
+            self.km += self.heuristic(self.last_start, start)
+            self.last_start = start
+        self.update_grid(grid)
+        self.complete = self.compute_shortest_path(deadline)
+        if not self.complete:
+            return None
+        return self.extract_path()
+
+    def extract_path(self):
+        node = self.start
+        if self.g.get(node, INF) == INF:
+            return None
+        path = [node]
+        while node != self.goal:
+            best = None
+            best_cost = INF
+            for nxt in self.neighbors(node):
+                c = self.cost(node, nxt) + self.g.get(nxt, INF)
+                if c < best_cost:
+                    best = nxt
+                    best_cost = c
+            if best is None:
+                return None
+            node = best
+            path.append(node)
+        return path
+
+
+class IncrementalPlanner:
+#Keeps one D* Lite tree per ship across turns so replanning cost follows how much the map changed
+#Create once and hand the same instance to each turn's PathPlanner
+#A tree not finished by the deadline is kept to finish next time, and ARA* gives this call's best effort instead
+
+    def __init__(self):
+        self.searches = {}
+        self.fallback_planner = AnytimePlanner()
+
+    def find_path(self, ship_id, start, goal, scene, obstacle_type=PlanObstacleType.ALL, deadline=None):
+
+        if start == goal:
+            return []
+
+        scene = as_obstacle_mask(scene)
+        if scene.is_blocked(*start) or scene.is_blocked(*goal):
+            return None
+
+        #a new goal or obstacle set means the old tree is no use
+        search, search_type = self.searches.get(ship_id, (None, None))
+        if search is None or search.goal != goal or search_type != obstacle_type:
+            search = DStarLite(goal, scene)
+            self.searches[ship_id] = (search, obstacle_type)
+
+        path = search.plan(start, scene, deadline)
+        if search.complete:
+            return path
+        return self.fallback_planner.find_path(start, goal, scene, deadline)
+
+    def prune(self, active_ids):
+        #drop trees for ships that died, docked or stopped planning
+        active_ids = set(active_ids)
+        for ship_id in list(self.searches):
+            if ship_id not in active_ids:
+                del self.searches[ship_id]
+
+
+class ReservationTable:
+#Space-time cells (x, y, t) claimed by ships that have already been planned this turn
+
+    def __init__(self):
+        self.cells = {}
+        self.edges = set()
+
+    def clear(self):
+        self.cells = {}
+        self.edges = set()
+
+    def reserve(self, cell, t, ship_id):
+        self.cells[(cell[0], cell[1], t)] = ship_id
+
+    def is_free(self, cell, t, ship_id):
+        owner = self.cells.get((cell[0], cell[1], t), ship_id)
+        return owner == ship_id
+
+    def is_free_until(self, cell, t, window, ship_id):
+        return all(self.is_free(cell, t_next, ship_id) for t_next in range(t+1, window+1))
+
+    def is_edge_free(self, a, b, t):
+        #two ships swapping cells between t and t+1 would pass through each other
+        return (b, a, t) not in self.edges
+
+    def get_holders_until(self, t_max):
+        #cell -> ids of the ships holding it at any time up to t_max
+        holders = {}
+        for (x, y, t), ship_id in self.cells.items():
+            if t <= t_max:
+                holders.setdefault((x, y), set()).add(ship_id)
+        return holders
+
+    def reserve_path(self, path, ship_id, window):
+        for t, cell in enumerate(path):
+            self.reserve(cell, t, ship_id)
+            if t > 0:
+                self.edges.add((path[t-1], cell, t-1))
+        #a ship that arrives early keeps its cell for the rest of the window
+        for t in range(len(path), window+1):
+            self.reserve(path[-1], t, ship_id)
+
+
+class CooperativePlanner:
+#Windowed hierarchical cooperative A* (Silver 2005): each ship searches (x, y, t) up to the window
+#against the reservation table left by the ships planned before it, then reserves its own path
+
+    WINDOW = 2*MAX_SPEED
+
+    def __init__(self, window=None):
+        self.window = window if window is not None else self.WINDOW
+        self.reservations = ReservationTable()
+
+    def heuristic(self, a, b):
+        return math.sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2)
+
+    def plan_fleet(self, ship_ids, starts, goals, scene, window=None, deadline=None):
+        window = window if window is not None else self.window
+        self.reservations.clear()
+        #ships not yet planned still hold their current cell for the first step
+        for ship_id, start in zip(ship_ids, starts):
+            self.reservations.reserve(start, 0, ship_id)
+            self.reservations.reserve(start, 1, ship_id)
+
+        paths = {}
+        for ship_id, start, goal in zip(ship_ids, starts, goals):
+            if deadline is not None and time.time() > deadline:
+                break
+            path = self.find_path(ship_id, start, goal, scene, window)
+            if path is None:
+                #stay put, and make sure nobody plans through us
+                path = [start]
+            paths[ship_id] = path
+            self.reservations.reserve_path(path, ship_id, window)
+        return paths
+
+    def find_path(self, ship_id, start, goal, scene, window):
+        scene = as_obstacle_mask(scene)
+        if scene.is_blocked(*start):
+            return None
+        dims = (scene.width, scene.height)
+        reservations = self.reservations
+        moves = ((0,0),(0,1),(1,0),(0,-1),(-1,0))
+
+        #g is t plus the cost layer of every cell entered (or waited in) so far; without a layer g == t
+        q = [(self.heuristic(start, goal), 0, 0, start, None)]
+        parents = {}
+        while q:
+            f, g, t, node, parent = heapq.heappop(q)
+            if (node, t) in parents:
+                continue
+            parents[(node, t)] = parent
+
+            #beyond the window the heuristic stands in for the rest of the route
+            if t == window or (node == goal and reservations.is_free_until(node, t, window, ship_id)):
+                path = []
+                state = (node, t)
+                while state is not None:
+                    path.append(state[0])
+                    state = parents[state]
+                path.reverse()
+                return path
+
+            for dxy in moves:
+                new_node = (node[0]+dxy[0], node[1]+dxy[1])
+                if new_node[0] >= dims[0] or new_node[1] >= dims[1] or new_node[0] < 0 or new_node[1] < 0:
+                    continue
+                if scene.is_blocked(new_node[0], new_node[1]):
+                    continue
+                if (new_node, t+1) in parents:
+                    continue
+                if not reservations.is_free(new_node, t+1, ship_id):
+                    continue
+                if not reservations.is_edge_free(node, new_node, t):
+                    continue
+                g_next = g + scene.step_cost(new_node[0], new_node[1])
+                heapq.heappush(q, (g_next+self.heuristic(new_node, goal), g_next, t+1, new_node, (node, t)))
+        return None
+
+
 class TestShip:
     def __init__(self,x,y,r):
         self.x = x
         self.y = y
         self.radius = r 
         self.id = 1  
+        self.docking_status = hlt.entity.Ship.DockingStatus.UNDOCKED
         
     def thrust(self, magnitude, angle):
         return "t {} {} {}".format(self.id, int(magnitude), round(angle))           
@@ -292,7 +1178,7 @@ if __name__ == "__main__":
 
     m = TestMap(12,10)
     p = PathPlanner(m)
-    print(p.full_map.get_map())
+    print(p.occupancy.get_mask_for_obstacle_type(PlanObstacleType.ALL).astype(int))
     s = m.get_me().all_ships()[0]
     d = (3,6)
     p.get_nav_cmd_for_ship(s,d,PlanObstacleType.ALL)
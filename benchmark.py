@@ -0,0 +1,321 @@
+"""
+Scaling benchmark for the per-turn hot paths, run on synthetic frames.
+
+Frames are built from local_engine map layouts filled with random ships, over a grid of map sizes, player counts
+and ship counts. Each component is timed separately and scaled to a whole turn (per-ship calls are multiplied by the
+number of our undocked ships), so the curves show where each one crosses the turn limit.
+
+Example:
+    python3 benchmark.py --ships 10 100 1000 --output benchmark_results.json
+"""
+
+import argparse
+import copy
+import json
+import logging
+import math
+import platform
+import random
+import time
+import numpy as np
+import hlt
+import local_engine
+import Navigation
+import MyBot
+
+#: Seconds the engine gives a bot per turn
+TURN_LIMIT = local_engine.TURN_TIMEOUT
+
+MAP_SIZES = [(240, 160), (312, 208), (384, 256)]
+SHIP_COUNTS = [10, 30, 100, 300, 1000]
+#: Share of ships generated docked (while planets have free spots)
+DOCKED_FRACTION = 0.2
+#: Turns ahead predict_positions looks
+PREDICT_TURNS = 5
+
+
+def _make_state(width, height, players, ships, seed):
+    rng = random.Random(seed)
+    state = local_engine.GameState(width, height, players, seed)
+    # drop the starting fleets, the ships below replace them
+    state.ships.clear()
+    planets = list(state.planets.values())
+    for i in range(ships):
+        owner = i % players
+        planet = rng.choice(planets)
+        if rng.random() < DOCKED_FRACTION and len(planet.docked) < planet.docking_spots and \
+                planet.owner in (None, owner):
+            angle = rng.uniform(0, 2 * math.pi)
+            distance = planet.radius + 1
+            ship = state.add_ship(owner, planet.x + distance * math.cos(angle), planet.y + distance * math.sin(angle))
+            state.dock(ship, planet, finished=True)
+            continue
+        while True:
+            x, y = rng.uniform(1, width - 1), rng.uniform(1, height - 1)
+            if all(math.hypot(x - p.x, y - p.y) > p.radius + 1 for p in planets):
+                break
+        state.add_ship(owner, x, y)
+    return state, rng
+
+
+def make_frame(width, height, players, ships, seed=0):
+    """
+    Build an engine frame with the given number of ships spread over the players.
+
+    :param int width: Map width
+    :param int height: Map height
+    :param int players: 2 or 4
+    :param int ships: Total number of ships
+    :param int seed: Seed for the layout and ship placement
+    :return: The frame in the engine's wire format
+    :rtype: str
+    """
+    return _make_state(width, height, players, ships, seed)[0].frame()
+
+
+def make_frames(width, height, players, ships, seed=0):
+    """
+    Like make_frame, plus the frame before it, with every undocked ship one random move away from where it ends
+    up, so a Map fed both has motion to estimate.
+
+    :return: The two frames, oldest first
+    :rtype: list[str]
+    """
+    state, rng = _make_state(width, height, players, ships, seed)
+    previous = state.frame()
+    for ship in state.ships.values():
+        if ship.docking_status == local_engine.UNDOCKED:
+            speed = rng.uniform(0, hlt.constants.MAX_SPEED)
+            angle = rng.uniform(0, 2 * math.pi)
+            ship.x = min(max(ship.x + speed * math.cos(angle), 0), width)
+            ship.y = min(max(ship.y + speed * math.sin(angle), 0), height)
+    return [previous, state.frame()]
+
+
+def parse_map(frames, width, height):
+    """
+    :param frames: A frame, or frames to parse in turn into the same Map (as the bot's Game does) so its motion
+        history covers them
+    :param int width: Map width
+    :param int height: Map height
+    :return: The map after the last frame
+    :rtype: hlt.game_map.Map
+    """
+    game_map = hlt.game_map.Map(0, width, height)
+    for frame in [frames] if isinstance(frames, str) else frames:
+        game_map._parse(frame)
+    return game_map
+
+
+def _undocked_ships(game_map):
+    return [ship for ship in game_map.get_me().all_ships()
+            if ship.docking_status == hlt.entity.Ship.DockingStatus.UNDOCKED]
+
+
+def _nearest_planet_point(ship, game_map):
+    planet = min(game_map.all_planets(), key=ship.calculate_distance_between)
+    return ship.closest_point_to(planet)
+
+
+def _time_calls(calls, budget):
+    """
+    Run the calls in turn until they are all done or the budget is spent (at least one always runs).
+
+    :return: Mean seconds per call and the number of calls timed
+    """
+    elapsed = 0.0
+    timed = 0
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        elapsed += time.perf_counter() - start
+        timed += 1
+        if elapsed > budget:
+            break
+    return elapsed / timed, timed
+
+
+def bench_parse(frame, game_map, budget):
+    def call():
+        tokens = frame.split()
+        players, tokens = hlt.game_map.Player._parse(tokens)
+        hlt.entity.Planet._parse(tokens)
+    return _time_calls([call] * 5, budget), 1
+
+
+def bench_link(frame, game_map, budget):
+    # linking swaps ids for objects in place, so every run links a freshly parsed map
+    calls = []
+    for _ in range(5):
+        tokens = frame.split()
+        fresh = hlt.game_map.Map(0, game_map.width, game_map.height)
+        fresh._players, tokens = hlt.game_map.Player._parse(tokens)
+        fresh._planets, tokens = hlt.entity.Planet._parse(tokens)
+        calls.append(fresh._link)
+    return _time_calls(calls, budget), 1
+
+
+def bench_obstacles_between(frame, game_map, budget):
+    ships = _undocked_ships(game_map)
+    calls = [lambda ship=ship: game_map.obstacles_between(ship, _nearest_planet_point(ship, game_map))
+             for ship in ships]
+    return _time_calls(calls, budget), len(ships)
+
+
+def bench_navigate(frame, game_map, budget):
+    ships = _undocked_ships(game_map)
+    calls = [lambda ship=ship: ship.navigate(_nearest_planet_point(ship, game_map), game_map,
+                                             speed=int(hlt.constants.MAX_SPEED)) for ship in ships]
+    return _time_calls(calls, budget), len(ships)
+
+
+def bench_planning_map(frame, game_map, budget):
+    def call():
+        Navigation.PlanningMap(game_map.width, game_map.height).add_all_obstacles(game_map)
+    return _time_calls([call] * 5, budget), 1
+
+
+def bench_occupancy_grid(frame, game_map, budget):
+    def call():
+        Navigation.OccupancyGrid(game_map.width, game_map.height).add_game_map(game_map)
+    return _time_calls([call] * 5, budget), 1
+
+
+def bench_find_path(frame, game_map, budget):
+    ships = _undocked_ships(game_map)
+    planner = Navigation.PathPlanner(game_map)
+
+    def plan(ship):
+        target = _nearest_planet_point(ship, game_map)
+        scene = planner.get_map_for_ship_and_obstacle(ship, Navigation.PlanObstacleType.ALL)
+        planner.find_path(planner.get_cell(ship.x, ship.y), planner.get_cell(target.x, target.y), scene)
+    return _time_calls([lambda ship=ship: plan(ship) for ship in ships], budget), len(ships)
+
+
+def bench_update_swarm(frame, game_map, budget):
+    # runs against the bot's own deadline, so above the limit this shows the fallback cost rather than growing
+    def call(fresh_map):
+        random.seed(0)
+        MyBot.SwarmMaster().update_swarm(fresh_map, 1, time.time())
+    # copies keep the map's motion history, a freshly parsed frame would start without one
+    maps = [copy.deepcopy(game_map) for _ in range(3)]
+    return _time_calls([lambda fresh_map=fresh_map: call(fresh_map) for fresh_map in maps], budget), 1
+
+
+def bench_predict_positions(frame, game_map, budget):
+    def call():
+        game_map.predict_positions(np.arange(1, PREDICT_TURNS + 1))
+    return _time_calls([call] * 5, budget), 1
+
+
+COMPONENTS = {
+    'parse': bench_parse,
+    'link': bench_link,
+    'obstacles_between': bench_obstacles_between,
+    'navigate': bench_navigate,
+    'planning_map': bench_planning_map,
+    'occupancy_grid': bench_occupancy_grid,
+    'find_path': bench_find_path,
+    'update_swarm': bench_update_swarm,
+    'predict_positions': bench_predict_positions,
+}
+
+
+def run_benchmark(sizes=MAP_SIZES, player_counts=(2, 4), ship_counts=SHIP_COUNTS, components=None, budget=2.0,
+                  seed=0):
+    """
+    Time every component on every frame configuration.
+
+    :param list[(int, int)] sizes: Map sizes
+    :param list[int] player_counts: Player counts
+    :param list[int] ship_counts: Total ship counts
+    :param list[str] components: Components to time (default all)
+    :param float budget: Seconds to spend timing one component on one frame
+    :param int seed: Frame seed
+    :return: One record per component and configuration
+    :rtype: list[dict]
+    """
+    records = []
+    for width, height in sizes:
+        for players in player_counts:
+            for ships in ship_counts:
+                frames = make_frames(width, height, players, ships, seed)
+                frame = frames[-1]
+                game_map = parse_map(frames, width, height)
+                for name in components or COMPONENTS:
+                    (per_call, samples), calls_per_turn = COMPONENTS[name](frame, game_map, budget)
+                    records.append({
+                        'component': name,
+                        'width': width,
+                        'height': height,
+                        'players': players,
+                        'ships': ships,
+                        'samples': samples,
+                        'calls_per_turn': calls_per_turn,
+                        'seconds_per_call': per_call,
+                        'seconds_per_turn': per_call * calls_per_turn,
+                    })
+                    print("{}x{} {}p {:>5} ships  {:<18} {:>10.5f}s/turn".format(
+                        width, height, players, ships, name, per_call * calls_per_turn))
+    return records
+
+
+def summarize(records, turn_limit=TURN_LIMIT):
+    """
+    :param list[dict] records: Output of run_benchmark
+    :param float turn_limit: Seconds per turn
+    :return: Scaling curves ([ships, seconds per turn] per component and map/players) and the smallest ship count
+        at which each curve passes the turn limit (None if it never does)
+    :rtype: dict
+    """
+    curves = {}
+    for record in records:
+        key = "{}x{}/{}p".format(record['width'], record['height'], record['players'])
+        curves.setdefault(record['component'], {}).setdefault(key, []).append(
+            [record['ships'], record['seconds_per_turn']])
+    crossings = {}
+    for component, by_config in curves.items():
+        for key, points in by_config.items():
+            points.sort()
+            over = [ships for ships, seconds in points if seconds > turn_limit]
+            crossings.setdefault(component, {})[key] = over[0] if over else None
+    return {'curves': curves, 'limit_crossings': crossings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=["{}x{}".format(w, h) for w, h in MAP_SIZES],
+                        help="map sizes as WIDTHxHEIGHT")
+    parser.add_argument('--players', nargs='+', type=int, default=[2, 4], choices=(2, 4))
+    parser.add_argument('--ships', nargs='+', type=int, default=SHIP_COUNTS)
+    parser.add_argument('--components', nargs='+', default=None, choices=sorted(COMPONENTS))
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help="seconds spent timing one component on one frame")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    # the bot logs every ship's decisions
+    logging.disable(logging.CRITICAL)
+    sizes = [tuple(int(v) for v in size.split('x')) for size in args.sizes]
+    records = run_benchmark(sizes, args.players, args.ships, args.components, args.budget, args.seed)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'turn_limit': TURN_LIMIT,
+            'budget': args.budget,
+            'seed': args.seed,
+        },
+        'results': records,
+    }
+    report.update(summarize(records))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -51,7 +51,7 @@ class bresenham:
 
 if __name__ == '__main__':
     l = bresenham([8,9],[2,2])
-    print l.path
+    print(l.path)
 
     map = []
     for x in range(0,15):
@@ -65,5 +65,5 @@ if __name__ == '__main__':
 	
     for y in range(0,15):
 	    for x in range(0,15):
-		    print map[x][y],
-	    print
+		    print(map[x][y], end=' ')
+	    print()
@@ -1,3 +1,6 @@
 #!/bin/sh
 rm *.log
 rm *.hlt
+rm *.profile.json
+rm *.prof
+rm *.memory.json
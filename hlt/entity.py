@@ -212,6 +212,8 @@ class Ship(Entity):
     :ivar y: The ship y-coordinate.
     :ivar radius: The ship radius.
     :ivar health: The ship's remaining health.
+    :ivar vel_x: The x velocity the engine reported (see Map.get_velocity for one estimated from the ship's motion).
+    :ivar vel_y: The y velocity the engine reported.
     :ivar DockingStatus docking_status: The docking status (UNDOCKED, DOCKED, DOCKING, UNDOCKING)
     :ivar planet: The ID of the planet the ship is docked to, if applicable.
     :ivar owner: The player ID of the owner, if any. If None, Entity is not owned.
@@ -231,6 +233,8 @@ class Ship(Entity):
         self.owner = player_id
         self.radius = constants.SHIP_RADIUS
         self.health = hp
+        self.vel_x = vel_x
+        self.vel_y = vel_y
         self.docking_status = docking_status
         self.planet = planet if (docking_status is not Ship.DockingStatus.UNDOCKED) else None
         self._docking_progress = progress
@@ -1,4 +1,5 @@
-from . import collision, entity
+from . import collision, entity, influence, motion
+from .profiling import TurnProfiler
 
 
 class Map:
@@ -8,19 +9,25 @@ class Map:
     :ivar my_id: Current player id associated with the map
     :ivar width: Map width
     :ivar height: Map height
+    :ivar profiler: Where the map's and the bot's phase timers go
     """
 
-    def __init__(self, my_id, width, height):
+    def __init__(self, my_id, width, height, profiler=None):
         """
         :param my_id: User's id (tag)
         :param width: Map width
         :param height: Map height
+        :param profiling.TurnProfiler profiler: The bot's profiler (default one that records nothing)
         """
         self.my_id = my_id
         self.width = width
         self.height = height
+        self.profiler = profiler or TurnProfiler()
         self._players = {}
         self._planets = {}
+        self._influence = None
+        # outlives _parse, the engine's Map object is reused every turn
+        self._motion = motion.MotionHistory()
 
     def get_me(self):
         """
@@ -59,6 +66,49 @@ class Map:
         """
         return list(self._planets.values())
 
+    def get_influence(self):
+        """
+        :return: This turn's enemy threat, our support and expected damage grids (built on first use)
+        :rtype: influence.InfluenceMap
+        """
+        if self._influence is None:
+            with self.profiler.phase('influence'):
+                self._influence = influence.InfluenceMap(self)
+        return self._influence
+
+    def enemy_ships(self):
+        """
+        :return: Every ship not owned by the user
+        :rtype: list[entity.Ship]
+        """
+        return [ship for player in self.all_players() if player.id != self.my_id for ship in player.all_ships()]
+
+    def get_velocity(self, ship):
+        """
+        :param entity.Ship ship: Any ship in the current frame
+        :return: Its velocity (units per turn) estimated from its last few positions
+        :rtype: (float, float)
+        """
+        return self._motion.get_velocity(ship.id)
+
+    def predict_positions(self, turns_ahead, ships=None):
+        """
+        Where ships will be if they keep their estimated velocity, for all of them at once.
+
+        :param turns_ahead: Turns to look ahead, a number or an array of them
+        :param list[entity.Ship] ships: Ships to predict (default enemy_ships())
+        :return: Positions kept inside the map, shape (len(ships), 2) for a number or (len(ships), len(turns_ahead), 2)
+            for an array, rows in the order of ships
+        :rtype: numpy.ndarray
+        """
+        if ships is None:
+            ships = self.enemy_ships()
+        rows = [self._motion.rows[ship.id] for ship in ships]
+        positions = self._motion.predict_positions(turns_ahead, rows)
+        positions[..., 0].clip(0, self.width, out=positions[..., 0])
+        positions[..., 1].clip(0, self.height, out=positions[..., 1])
+        return positions
+
     def nearby_entities_by_distance(self, entity):
         """
         :param entity: The source entity to find distances from
@@ -81,20 +131,27 @@ class Map:
         for celestial_object in self.all_planets() + self._all_ships():
             celestial_object._link(self._players, self._planets)
 
-    def _parse(self, map_string):
+    def _parse(self, map_string, same_turn=False):
         """
         Parse the map description from the game.
 
         :param map_string: The string which the Halite engine outputs
+        :param bool same_turn: The frame is from the same turn as the previous one (the first turn's frame repeats
+            the initial map), so ship motion doesn't advance
         :return: nothing
         """
-        tokens = map_string.split()
+        with self.profiler.phase('parse'):
+            self._influence = None
+            tokens = map_string.split()
 
-        self._players, tokens = Player._parse(tokens)
-        self._planets, tokens = entity.Planet._parse(tokens)
+            self._players, tokens = Player._parse(tokens)
+            self._planets, tokens = entity.Planet._parse(tokens)
 
-        assert(len(tokens) == 0)  # There should be no remaining tokens at this point
-        self._link()
+            assert(len(tokens) == 0)  # There should be no remaining tokens at this point
+        with self.profiler.phase('link'):
+            self._link()
+        with self.profiler.phase('motion'):
+            self._motion.update(self._all_ships(), same_turn)
 
     def _all_ships(self):
         """
@@ -137,6 +194,9 @@ class Map:
         obstacles = []
         entities = ([] if issubclass(entity.Planet, ignore) else self.all_planets()) \
             + ([] if issubclass(entity.Ship, ignore) else self._all_ships())
+        if self.profiler.enabled:
+            self.profiler.count('obstacles_between', ship_id=ship.id)
+            self.profiler.count('intersect_segment_circle', len(entities), ship_id=ship.id)
         for foreign_entity in entities:
             if foreign_entity == ship or foreign_entity == target:
                 continue
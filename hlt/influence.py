@@ -0,0 +1,117 @@
+import numpy as np
+
+from . import constants
+from .entity import Ship
+
+
+class InfluenceMap:
+    """
+    Per-turn grids (one cell per map unit) of who can shoot where, so a ship reads its local danger with one lookup
+    instead of scanning every enemy.
+
+    Ships move before they fire, so a ship reaches every cell within its weapon range (WEAPON_RADIUS between the hulls)
+    plus one turn of movement. Only armed ships count: undocked, with their weapon cooled down.
+
+    :ivar threat: Enemy ships that can fire on the cell next turn
+    :ivar support: Ships of ours that can fire on an enemy there next turn (a ship of ours standing there included)
+    :ivar damage: Damage a ship of ours there can expect next turn, with each enemy splitting its WEAPON_DAMAGE over
+        all of our ships it reaches
+    """
+
+    def __init__(self, game_map, speed=constants.MAX_SPEED):
+        """
+        :param game_map: The map for this turn
+        :param float speed: Movement allowed for before firing (0 for the current positions only)
+        """
+        self.width = game_map.width
+        self.height = game_map.height
+        self.reach = constants.WEAPON_RADIUS + 2 * constants.SHIP_RADIUS + speed
+        enemy_xy = []
+        mine_xy = []
+        for player in game_map.all_players():
+            armed = [(ship.x, ship.y) for ship in player.all_ships()
+                     if ship.docking_status == Ship.DockingStatus.UNDOCKED and ship._weapon_cooldown == 0]
+            (mine_xy if player.id == game_map.my_id else enemy_xy).extend(armed)
+        enemy_xy = np.array(enemy_xy, dtype=float).reshape(-1, 2)
+        mine_xy = np.array(mine_xy, dtype=float).reshape(-1, 2)
+
+        enemy_cells, enemy_index = self._discs(enemy_xy)
+        mine_cells, _ = self._discs(mine_xy)
+        self.threat = self._sum(enemy_cells)
+        self.support = self._sum(mine_cells)
+        if len(enemy_xy) and len(mine_xy):
+            # ships of ours each enemy can hit next turn, with both sides moving first
+            between = np.hypot(enemy_xy[:, 0:1] - mine_xy[:, 0], enemy_xy[:, 1:2] - mine_xy[:, 1])
+            targets = (between <= self.reach + speed).sum(axis=1)
+        else:
+            targets = np.zeros(len(enemy_xy))
+        share = constants.WEAPON_DAMAGE / np.maximum(targets, 1)
+        self.damage = self._sum(enemy_cells, share[enemy_index])
+
+    def _discs(self, xy):
+        """
+        The cells within reach of every point, all at once.
+
+        :param np.ndarray xy: Points, shape (n, 2)
+        :return: Flat index of each covered cell, and which point covers it
+        :rtype: (np.ndarray, np.ndarray)
+        """
+        r = int(np.ceil(self.reach))
+        dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+        dx = dx.ravel()
+        dy = dy.ravel()
+        cells = np.floor(xy).astype(int)
+        xs = cells[:, 0:1] + dx
+        ys = cells[:, 1:2] + dy
+        # disc membership is decided from the cell centre to the exact position
+        ox = xs + 0.5 - xy[:, 0:1]
+        oy = ys + 0.5 - xy[:, 1:2]
+        inside = (ox * ox + oy * oy <= self.reach * self.reach) & \
+                 (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        index = np.broadcast_to(np.arange(len(xy))[:, None], inside.shape)[inside]
+        return ys[inside] * self.width + xs[inside], index
+
+    def _sum(self, cells, weights=None):
+        return np.bincount(cells, weights, self.height * self.width).astype(np.float32).reshape(self.height,
+                                                                                             self.width)
+
+    def _cell(self, x, y):
+        return min(max(int(y), 0), self.height - 1), min(max(int(x), 0), self.width - 1)
+
+    def threat_at(self, entity):
+        """
+        :param entity: Anything with x and y
+        :return: Enemy ships that can fire there next turn
+        :rtype: float
+        """
+        return float(self.threat[self._cell(entity.x, entity.y)])
+
+    def support_at(self, entity):
+        """
+        :param entity: Anything with x and y
+        :return: Ships of ours that can fire there next turn
+        :rtype: float
+        """
+        return float(self.support[self._cell(entity.x, entity.y)])
+
+    def damage_at(self, entity):
+        """
+        :param entity: Anything with x and y
+        :return: Damage a ship of ours there can expect next turn
+        :rtype: float
+        """
+        return float(self.damage[self._cell(entity.x, entity.y)])
+
+    def sample(self, grid, xs, ys):
+        """
+        Look up many points at once.
+
+        :param np.ndarray grid: threat, support or damage
+        :param np.ndarray xs: x coordinates
+        :param np.ndarray ys: y coordinates
+        :return: The grid's values at the points (points off the map read the nearest edge cell)
+        :rtype: np.ndarray
+        """
+        rows = np.clip(np.asarray(ys, dtype=int), 0, self.height - 1)
+        cols = np.clip(np.asarray(xs, dtype=int), 0, self.width - 1)
+        return grid[rows, cols]
@@ -0,0 +1,102 @@
+import numpy as np
+
+from . import constants
+
+
+class MotionHistory:
+    """
+    The last few positions of every ship, kept in arrays across frames, with velocities estimated from the frame to
+    frame differences (so they don't depend on what velocity, if any, the engine reports).
+
+    :ivar ids: Ship ids, one row each
+    :ivar positions: Recent positions, shape (ships, length, 2), newest last; a new ship's history is its first
+        position repeated
+    :ivar frames: Frames each ship has been seen in, capped at length
+    """
+    #: Frames kept per ship; velocity is the mean over the differences between them
+    LENGTH = 3
+
+    def __init__(self, length=None):
+        """
+        :param int length: Frames kept per ship
+        """
+        self.length = length or self.LENGTH
+        self.ids = np.empty(0, dtype=np.int64)
+        self.positions = np.empty((0, self.length, 2))
+        self.frames = np.empty(0, dtype=np.int64)
+        self.velocities = np.empty((0, 2))
+        self.rows = {}
+
+    def update(self, ships, same_turn=False):
+        """
+        Record a new frame. Ships missing from it (destroyed) are dropped.
+
+        :param list[entity.Ship] ships: Every ship in the frame
+        :param bool same_turn: The frame is from the same turn as the last one, so it replaces the last positions
+            instead of adding a (zero length) step
+        :return: nothing
+        """
+        ids = np.array([ship.id for ship in ships], dtype=np.int64)
+        xy = np.array([(ship.x, ship.y) for ship in ships], dtype=float).reshape(-1, 2)
+        previous = self._find_rows(ids)
+        known = previous >= 0
+
+        positions = np.repeat(xy[:, None, :], self.length, axis=1)
+        frames = np.ones(len(ids), dtype=np.int64)
+        if same_turn:
+            positions[known, :-1] = self.positions[previous[known], :-1]
+            frames[known] = self.frames[previous[known]]
+        else:
+            positions[known, :-1] = self.positions[previous[known], 1:]
+            frames[known] = np.minimum(self.frames[previous[known]] + 1, self.length)
+
+        self.ids = ids
+        self.positions = positions
+        self.frames = frames
+        self.rows = dict(zip(ids.tolist(), range(len(ids))))
+        self.velocities = self._estimate_velocities()
+
+    def _find_rows(self, ids):
+        # rows of the given ids in the previous frame (-1 for new ships), by binary search over the sorted old ids
+        if not len(self.ids) or not len(ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        order = np.argsort(self.ids)
+        index = np.minimum(np.searchsorted(self.ids[order], ids), len(order) - 1)
+        return np.where(self.ids[order][index] == ids, order[index], -1)
+
+    def _estimate_velocities(self):
+        n = len(self.ids)
+        oldest = self.positions[np.arange(n), self.length - self.frames]
+        velocities = (self.positions[:, -1] - oldest) / np.maximum(self.frames - 1, 1)[:, None]
+        # no ship moves faster than MAX_SPEED, which keeps the estimate sane if a frame was missed
+        speed = np.hypot(velocities[:, 0], velocities[:, 1])
+        return velocities * np.minimum(1, constants.MAX_SPEED / np.maximum(speed, 1e-9))[:, None]
+
+    def get_velocity(self, ship_id):
+        """
+        :param int ship_id: The ship
+        :return: Estimated velocity (units per turn), zero for a ship seen in one frame only
+        :rtype: (float, float)
+        """
+        row = self.rows.get(ship_id)
+        if row is None:
+            return 0.0, 0.0
+        return float(self.velocities[row, 0]), float(self.velocities[row, 1])
+
+    def predict_positions(self, turns_ahead, rows=None):
+        """
+        Extrapolate ships at their estimated velocity.
+
+        :param turns_ahead: Turns to look ahead, a number or an array of them
+        :param np.ndarray rows: Which rows (default all)
+        :return: Positions, shape (ships, 2) for a number or (ships, len(turns_ahead), 2) for an array
+        :rtype: np.ndarray
+        """
+        if rows is None:
+            rows = slice(None)
+        current = self.positions[rows, -1]
+        velocities = self.velocities[rows]
+        turns = np.asarray(turns_ahead, dtype=float)
+        if turns.ndim == 0:
+            return current + velocities * turns
+        return current[:, None, :] + velocities[:, None, :] * turns[None, :, None]
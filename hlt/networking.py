@@ -1,58 +1,77 @@
-import sys
 import logging
 import copy
+import atexit
 
 from . import game_map
+from .profiling import TurnProfiler, SlowTurnCapture, TurnMemoryTracker
+from .transport import StdioTransport
 
 
 class Game:
     """
     :ivar map: Current map representation
     :ivar initial_map: The initial version of the map before game starts
+    :ivar profiler: This bot's per-phase turn timers (also reachable as map.profiler)
+    :ivar slow_turns: This bot's cProfile capture of its slowest turns
+    :ivar memory: This bot's per-turn allocation tracking
     """
-    @staticmethod
-    def _send_string(s):
+    #: Turns between rewrites of the enabled reports. The engine kills bots when the game ends, so exit handlers
+    #: can't be relied on to write them.
+    REPORT_EVERY = 10
+
+    def _send_string(self, s):
         """
         Send data to the game. Call :function:`done_sending` once finished.
 
         :param str s: String to send
         :return: nothing
         """
-        sys.stdout.write(s)
+        self._transport.send(s)
 
-    @staticmethod
-    def _done_sending():
+    def _done_sending(self):
         """
         Finish sending commands to the game.
 
         :return: nothing
         """
-        sys.stdout.write('\n')
-        sys.stdout.flush()
+        self._transport.done_sending()
 
-    @staticmethod
-    def _get_string():
+    def _get_string(self):
         """
         Read input from the game.
 
         :return: The input read from the Halite engine
         :rtype: str
         """
-        result = sys.stdin.readline().rstrip('\n')
-        return result
+        return self._transport.read_line()
 
-    @staticmethod
-    def send_command_queue(command_queue):
+    def send_command_queue(self, command_queue):
         """
         Issue the given list of commands.
 
         :param list[str] command_queue: List of commands to send the Halite engine
         :return: nothing
         """
-        for command in command_queue:
-            Game._send_string(command)
+        with self.profiler.phase('send'):
+            for command in command_queue:
+                self._send_string(command)
+
+            self._done_sending()
+        self.profiler.end_turn()
+        self.slow_turns.end_turn()
+        self.memory.end_turn()
+        self._turns += 1
+        if self._reports and self._turns % self.REPORT_EVERY == 0:
+            self.write_reports()
+
+    def write_reports(self):
+        """
+        Write (or refresh) the reports of the enabled profilers. Also runs at exit, in case the bot gets to exit.
 
-        Game._done_sending()
+        :return: nothing
+        """
+        for write, path in self._reports:
+            write(path)
 
     @staticmethod
     def _set_up_logging(tag, name):
@@ -67,19 +86,42 @@ class Game:
         logging.basicConfig(filename=log_file, level=logging.DEBUG, filemode='w')
         logging.info("Initialized bot {}".format(name))
 
-    def __init__(self, name):
+    def __init__(self, name, profile=False, cprofile_turns=0, trace_memory=False, transport=None, log=True):
         """
         Initialize the bot with the given name.
 
         :param name: The name of the bot.
+        :param bool profile: Time each turn's phases and write a percentile summary.
+        :param int cprofile_turns: Run cProfile on every turn and dump this many of the slowest as .prof files.
+        :param bool trace_memory: Trace allocations with tracemalloc each turn and write a memory report.
+        :param transport: How to talk to the engine (default stdin/stdout; see hlt.transport)
+        :param bool log: Write the bot's log file (turn it off for bots sharing a process, they would all log to
+            the first one's file)
         """
         self._name = name
+        self._transport = transport or StdioTransport()
         self._send_name = False
         tag = int(self._get_string())
-        Game._set_up_logging(tag, name)
+        if log:
+            Game._set_up_logging(tag, name)
+        # one set per Game, so bots sharing a process don't mix their numbers
+        self.profiler = TurnProfiler(profile)
+        self.slow_turns = SlowTurnCapture(cprofile_turns)
+        self.memory = TurnMemoryTracker(trace_memory)
+        self._turns = 0
+        self._reports = []
+        if profile:
+            self._reports.append((self.profiler.write_summary, "{}_{}.profile.json".format(tag, name)))
+        if cprofile_turns:
+            self._reports.append((self.slow_turns.dump, "{}_{}".format(tag, name)))
+        if trace_memory:
+            self._reports.append((self.memory.write_summary, "{}_{}.memory.json".format(tag, name)))
+        if self._reports:
+            atexit.register(self.write_reports)
         width, height = [int(x) for x in self._get_string().strip().split()]
-        self.map = game_map.Map(tag, width, height)
-        self.update_map()
+        self.map = game_map.Map(tag, width, height, self.profiler)
+        # the initial frame is parsed outside any turn, so the per-turn hooks don't count it as turn 1
+        self.map._parse(self._get_string())
         self.initial_map = copy.deepcopy(self.map)
         self._send_name = True
 
@@ -90,10 +132,16 @@ class Game:
         :return: new parsed map
         :rtype: game_map.Map
         """
+        first_turn = self._send_name
         if self._send_name:
             self._send_string(self._name)
             self._done_sending()
             self._send_name = False
         logging.info("---NEW TURN---")
-        self.map._parse(self._get_string())
+        map_string = self._get_string()
+        self.profiler.start_turn()
+        self.memory.start_turn()
+        self.slow_turns.start_turn()
+        # the first turn is played on the initial map
+        self.map._parse(map_string, same_turn=first_turn)
         return self.map
@@ -0,0 +1,357 @@
+import cProfile
+import heapq
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+
+class _NullPhase:
+    """
+    Stand-in returned by a disabled profiler so timed blocks cost one attribute lookup.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def _write_json(path, data):
+    # through a temporary file and a rename, so a bot killed mid-write leaves the previous report intact
+    partial = path + '.partial'
+    with open(partial, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(partial, path)
+
+
+class _Phase:
+    """
+    Context manager adding the time spent inside the block to one phase of the current turn.
+    """
+    __slots__ = ('_totals', '_name', '_start')
+
+    def __init__(self, totals, name):
+        self._totals = totals
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._totals[self._name] = self._totals.get(self._name, 0.0) + time.perf_counter() - self._start
+        return False
+
+
+class TurnProfiler:
+    """
+    Per-phase timers and counters for each turn, summarized as percentiles at the end of the game.
+
+    Phases may nest (navigation runs inside strategy), so phase times are not meant to add up to the turn time.
+
+    :ivar enabled: Whether timers and counters record anything
+    :ivar last_turn: Phase times (seconds) of the last finished turn, including the whole 'turn'
+    """
+
+    def __init__(self, enabled=False):
+        """
+        :param bool enabled: Start recording straight away
+        """
+        self.enabled = enabled
+        self.turns = 0
+        self.last_turn = {}
+        self._turn_start = None
+        self._phase_totals = {}
+        self._counter_totals = {}
+        self._phase_history = {}
+        self._counter_history = {}
+        self._ship_counters = {}
+
+    def phase(self, name):
+        """
+        Time a block of code as part of the named phase of the current turn.
+
+        :param str name: The phase name (e.g. 'parse', 'navigation')
+        :return: A context manager
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self._phase_totals, name)
+
+    def count(self, name, n=1, ship_id=None):
+        """
+        Add to a counter for the current turn, and to the ship's game total if a ship is given.
+
+        :param str name: The counter name
+        :param int n: How much to add
+        :param int ship_id: The ship responsible, if any
+        :return: nothing
+        """
+        if not self.enabled:
+            return
+        self._counter_totals[name] = self._counter_totals.get(name, 0) + n
+        if ship_id is not None:
+            ship_counters = self._ship_counters.setdefault(ship_id, {})
+            ship_counters[name] = ship_counters.get(name, 0) + n
+
+    def start_turn(self):
+        """
+        Mark the start of a turn (called when the engine's frame arrives).
+
+        :return: nothing
+        """
+        if not self.enabled:
+            return
+        self._turn_start = time.perf_counter()
+        self._phase_totals = {}
+        self._counter_totals = {}
+
+    def end_turn(self):
+        """
+        Mark the end of a turn (called once the commands are sent) and file its totals.
+
+        :return: nothing
+        """
+        if not self.enabled or self._turn_start is None:
+            return
+        self._phase_totals['turn'] = time.perf_counter() - self._turn_start
+        # every turn gets an entry for every phase seen so far, so percentiles count turns without the phase as 0
+        for name in set(self._phase_history) | set(self._phase_totals):
+            self._phase_history.setdefault(name, [0.0] * self.turns).append(self._phase_totals.get(name, 0.0))
+        for name in set(self._counter_history) | set(self._counter_totals):
+            self._counter_history.setdefault(name, [0] * self.turns).append(self._counter_totals.get(name, 0))
+        self.turns += 1
+        self.last_turn = self._phase_totals
+        self._turn_start = None
+
+    @staticmethod
+    def _percentiles(values):
+        ordered = sorted(values)
+        if not ordered:
+            return {'p50': 0, 'p95': 0, 'max': 0}
+
+        def pick(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+        return {'p50': pick(0.5), 'p95': pick(0.95), 'max': ordered[-1]}
+
+    def summary(self, top_ships=10):
+        """
+        :param int top_ships: How many of the busiest ships to list per counter
+        :return: p50/p95/max per phase (seconds) and per counter, plus the ships with the highest counts
+        :rtype: dict
+        """
+        busiest = {}
+        names = set(name for counters in self._ship_counters.values() for name in counters)
+        for name in names:
+            ranked = sorted(self._ship_counters.items(), key=lambda item: item[1].get(name, 0), reverse=True)
+            busiest[name] = [[ship_id, counters.get(name, 0)] for ship_id, counters in ranked[:top_ships]]
+        return {
+            'turns': self.turns,
+            'phases': dict((name, self._percentiles(values)) for name, values in self._phase_history.items()),
+            'counters': dict((name, self._percentiles(values)) for name, values in self._counter_history.items()),
+            'busiest_ships': busiest,
+        }
+
+    def write_summary(self, path):
+        """
+        Log the summary and write it as JSON.
+
+        :param str path: File to write
+        :return: nothing
+        """
+        if not self.turns:
+            return
+        summary = self.summary()
+        for name, stats in sorted(summary['phases'].items()):
+            logging.info("Phase {}: p50 {:.4f}s, p95 {:.4f}s, max {:.4f}s".format(
+                name, stats['p50'], stats['p95'], stats['max']))
+        _write_json(path, summary)
+
+
+class SlowTurnCapture:
+    """
+    Runs cProfile around every turn but only keeps the stats of the slowest turns, which are the ones that time out
+    late in the game and disappear in a whole-game profile.
+
+    :ivar keep: How many of the slowest turns to keep (0 disables capturing)
+    """
+
+    def __init__(self, keep=0):
+        """
+        :param int keep: How many of the slowest turns to keep
+        """
+        self.keep = keep
+        self.turn = 0
+        self._profile = None
+        self._turn_start = None
+        self._slowest = []
+        self._written = set()
+
+    def start_turn(self):
+        """
+        Start profiling a turn.
+
+        :return: nothing
+        """
+        if not self.keep:
+            return
+        if self._profile is not None:
+            # a turn that never ended (no commands sent), drop it rather than stack a second profiler on it
+            self._profile.disable()
+        self.turn += 1
+        self._profile = cProfile.Profile()
+        self._turn_start = time.perf_counter()
+        self._profile.enable()
+
+    def end_turn(self):
+        """
+        Stop profiling the turn and keep it if it is among the slowest so far.
+
+        :return: nothing
+        """
+        if self._profile is None:
+            return
+        self._profile.disable()
+        entry = (time.perf_counter() - self._turn_start, self.turn, self._profile)
+        self._profile = None
+        # min-heap on duration, so the fastest kept turn is the one to drop
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        elif entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def dump(self, prefix):
+        """
+        Write the kept turns as <prefix>_turn<N>.prof files, loadable with pstats or snakeviz. Can be called again
+        as the game goes on: only newly kept turns are written, and files of turns no longer kept are removed.
+
+        :param str prefix: Path prefix for the files
+        :return: The paths written, slowest first
+        :rtype: list[str]
+        """
+        paths = []
+        for duration, turn, profile in sorted(self._slowest, reverse=True):
+            path = "{}_turn{}.prof".format(prefix, turn)
+            paths.append(path)
+            if path in self._written:
+                continue
+            partial = path + '.partial'
+            profile.dump_stats(partial)
+            os.replace(partial, path)
+            logging.info("Turn {} took {:.4f}s, profile written to {}".format(turn, duration, path))
+        # turns pushed out of the slowest since the last dump
+        for path in self._written.difference(paths):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._written = set(paths)
+        return paths
+
+
+class TurnMemoryTracker:
+    """
+    Traces Python allocations with tracemalloc and records, per turn, the net growth, the peak reached above the
+    turn's starting usage and the source lines that grew the most.
+
+    Tracing slows allocation-heavy code down noticeably, so keep it for memory work rather than timing runs.
+    tracemalloc is process-wide, so with several bots in one process each one's report covers all of them.
+
+    :ivar enabled: Whether turns are traced
+    """
+    TOP_SITES = 5
+
+    def __init__(self, enabled=False):
+        """
+        :param bool enabled: Start tracing straight away
+        """
+        self.enabled = enabled
+        self.turns = []
+        self._site_totals = {}
+        self._start_size = None
+        self._start_snapshot = None
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def start_turn(self):
+        """
+        Mark the start of a turn (called when the engine's frame arrives).
+
+        :return: nothing
+        """
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._start_snapshot = self._take_snapshot()
+        tracemalloc.reset_peak()
+        self._start_size = tracemalloc.get_traced_memory()[0]
+
+    def end_turn(self):
+        """
+        Mark the end of a turn (called once the commands are sent) and file its memory use.
+
+        :return: nothing
+        """
+        if not self.enabled or self._start_size is None:
+            return
+        size, peak = tracemalloc.get_traced_memory()
+        diffs = self._take_snapshot().compare_to(self._start_snapshot, 'lineno')
+        sites = []
+        for diff in diffs[:self.TOP_SITES]:
+            if diff.size_diff <= 0:
+                break
+            frame = diff.traceback[0]
+            site = "{}:{}".format(frame.filename, frame.lineno)
+            sites.append([site, diff.size_diff, diff.count_diff])
+            self._site_totals[site] = self._site_totals.get(site, 0) + diff.size_diff
+        self.turns.append({
+            'turn': len(self.turns) + 1,
+            'net_bytes': size - self._start_size,
+            'peak_bytes': peak - self._start_size,
+            'traced_bytes': size,
+            'top_sites': sites,
+        })
+        self._start_size = None
+        self._start_snapshot = None
+
+    def summary(self, top_sites=10):
+        """
+        :param int top_sites: How many sites to list in the game-wide ranking
+        :return: p50/p95/max of net growth and turn peak, the turns with the highest peaks, and the lines that grew
+            the most over the game
+        :rtype: dict
+        """
+        worst = sorted(self.turns, key=lambda turn: turn['peak_bytes'], reverse=True)
+        ranked = sorted(self._site_totals.items(), key=lambda item: item[1], reverse=True)
+        return {
+            'turns': len(self.turns),
+            'net_bytes': TurnProfiler._percentiles([turn['net_bytes'] for turn in self.turns]),
+            'peak_bytes': TurnProfiler._percentiles([turn['peak_bytes'] for turn in self.turns]),
+            'final_traced_bytes': self.turns[-1]['traced_bytes'] if self.turns else 0,
+            'worst_turns': worst[:5],
+            'top_sites': [list(item) for item in ranked[:top_sites]],
+            'per_turn': [[turn['turn'], turn['net_bytes'], turn['peak_bytes']] for turn in self.turns],
+        }
+
+    def write_summary(self, path):
+        """
+        Log the headline numbers and write the report as JSON.
+
+        :param str path: File to write
+        :return: nothing
+        """
+        if not self.turns:
+            return
+        summary = self.summary()
+        logging.info("Turn peak memory: p50 {} B, p95 {} B, max {} B".format(
+            summary['peak_bytes']['p50'], summary['peak_bytes']['p95'], summary['peak_bytes']['max']))
+        _write_json(path, summary)
+
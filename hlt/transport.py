@@ -0,0 +1,177 @@
+import queue
+import socket
+import sys
+
+
+class StdioTransport:
+    """
+    Lines over the process's stdin/stdout, as the Halite engine runs bots.
+    """
+    def __init__(self, stdin=None, stdout=None):
+        """
+        :param stdin: Text stream to read from (default sys.stdin)
+        :param stdout: Text stream to write to (default sys.stdout)
+        """
+        self._stdin = stdin or sys.stdin
+        self._stdout = stdout or sys.stdout
+
+    def read_line(self, timeout=None):
+        """
+        :param float timeout: Ignored, stdin is read blocking
+        :return: The next line, without its newline
+        :rtype: str
+        :raises EOFError: once the engine closed the stream
+        """
+        line = self._stdin.readline()
+        if not line:
+            raise EOFError("The engine closed stdin")
+        return line.rstrip('\n')
+
+    def send(self, s):
+        """
+        :param str s: Part of the current line
+        :return: nothing
+        """
+        self._stdout.write(s)
+
+    def done_sending(self):
+        """
+        End the current line and hand it over.
+
+        :return: nothing
+        """
+        self._stdout.write('\n')
+        self._stdout.flush()
+
+    def close(self):
+        pass
+
+
+class QueueTransport:
+    """
+    Lines over a pair of queues, for an engine and bots in the same process (queue.Queue, threads) or in related
+    processes (multiprocessing.Queue). Within a process a line is handed over as the same str object, so a frame
+    built once by the engine goes to every bot without being encoded, copied or written to a pipe.
+    """
+    _CLOSED = None
+
+    def __init__(self, inbox=None, outbox=None):
+        """
+        :param inbox: Queue the other end sends to (default a new queue.Queue)
+        :param outbox: Queue the other end reads from (default a new queue.Queue)
+        """
+        self.inbox = inbox if inbox is not None else queue.Queue()
+        self.outbox = outbox if outbox is not None else queue.Queue()
+        self._parts = []
+
+    def peer(self):
+        """
+        :return: The other end of this transport
+        :rtype: QueueTransport
+        """
+        return QueueTransport(self.outbox, self.inbox)
+
+    def read_line(self, timeout=None):
+        """
+        :param float timeout: Seconds to wait (None to wait for good)
+        :return: The next line, or None if none came in time
+        :rtype: str
+        :raises EOFError: once the other end closed
+        """
+        try:
+            line = self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if line is self._CLOSED:
+            # leave the marker for any later read
+            self.inbox.put(line)
+            raise EOFError("The other end closed the transport")
+        return line
+
+    def send(self, s):
+        """
+        :param str s: Part of the current line
+        :return: nothing
+        """
+        self._parts.append(s)
+
+    def done_sending(self):
+        """
+        End the current line and hand it over.
+
+        :return: nothing
+        """
+        self.outbox.put(self._parts[0] if len(self._parts) == 1 else ''.join(self._parts))
+        self._parts = []
+
+    def close(self):
+        """
+        Tell the other end no more lines are coming.
+
+        :return: nothing
+        """
+        self.outbox.put(self._CLOSED)
+
+
+class SocketTransport:
+    """
+    Lines over a connected stream socket, e.g. a bot connecting to an engine on localhost.
+    """
+    def __init__(self, sock):
+        """
+        :param socket.socket sock: A connected stream socket
+        """
+        self.socket = sock
+        self._buffer = b''
+        self._parts = []
+
+    @classmethod
+    def connect(cls, address):
+        """
+        :param address: (host, port), or a path for a Unix socket
+        :return: A transport over a new connection
+        :rtype: SocketTransport
+        """
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(address)
+        return cls(sock)
+
+    def read_line(self, timeout=None):
+        """
+        :param float timeout: Seconds to wait (None to wait for good)
+        :return: The next line, or None if none came in time
+        :rtype: str
+        :raises EOFError: once the other end closed the connection
+        """
+        self.socket.settimeout(timeout)
+        while b'\n' not in self._buffer:
+            try:
+                chunk = self.socket.recv(65536)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise EOFError("The other end closed the connection")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode()
+
+    def send(self, s):
+        """
+        :param str s: Part of the current line
+        :return: nothing
+        """
+        self._parts.append(s)
+
+    def done_sending(self):
+        """
+        End the current line and hand it over.
+
+        :return: nothing
+        """
+        self._parts.append('\n')
+        self.socket.sendall(''.join(self._parts).encode())
+        self._parts = []
+
+    def close(self):
+        self.socket.close()
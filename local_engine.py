@@ -0,0 +1,753 @@
+"""
+Local stand-in for the Halite II engine, so bots can be played against each other without the halite binary.
+
+It speaks the same stdio protocol as the real engine (tag, map size, frames in, one line of commands out) and
+follows the main rules closely enough to compare bots: thrust/dock/undock, docking turns, production and spawning,
+weapons with cooldown, crashes into planets and other ships, and the per-turn time limit. Simplifications:
+- collisions are checked at a few points along each move rather than continuously
+- a destroyed planet kills its docked ships and any ship within the explosion radius outright
+- players are ranked by elimination turn, then by total ship health at the end
+"""
+
+import math
+import os
+import random
+import re
+import selectors
+import subprocess
+import threading
+import time
+import numpy as np
+from hlt import constants
+from hlt.transport import QueueTransport
+import replay
+
+#: Seconds a bot gets to initialize (real engine limit)
+INIT_TIMEOUT = 60.0
+#: Seconds a bot gets per turn (real engine limit)
+TURN_TIMEOUT = 2.0
+#: Production needed to spawn a ship
+SHIP_COST = 72
+#: Points checked along each move for collisions
+MOVE_SUBSTEPS = 4
+#: Distance between a player's starting ships, which start in a column
+START_SPACING = 5
+#: Seconds bots get to exit on their own once their stdin is closed at the end of the game (to write reports)
+EXIT_GRACE = 1.0
+
+UNDOCKED, DOCKING, DOCKED, UNDOCKING = range(4)
+
+_COMMAND_TOKENS = re.compile(r'[tdu]|-?\d+')
+
+
+def default_max_turns(width, height):
+    """
+    :return: The turn limit for a map of the given size
+    :rtype: int
+    """
+    return 100 + int(math.sqrt(width * height))
+
+
+def parse_commands(line):
+    """
+    Parse one bot's command line. The starter kit writes commands back to back without separators
+    (e.g. "t 3 7 90d 4 1"), so this tokenizes instead of splitting.
+
+    :param str line: The line the bot sent
+    :return: List of (command, ship_id, args) tuples; malformed trailing commands are dropped
+    :rtype: list[(str, int, list[int])]
+    """
+    arg_counts = {'t': 2, 'd': 1, 'u': 0}
+    tokens = _COMMAND_TOKENS.findall(line)
+    commands = []
+    i = 0
+    while i < len(tokens):
+        command = tokens[i]
+        if command not in arg_counts:
+            i += 1
+            continue
+        values = tokens[i + 1:i + 2 + arg_counts[command]]
+        if len(values) < 1 + arg_counts[command] or not all(v.lstrip('-').isdigit() for v in values):
+            break
+        commands.append((command, int(values[0]), [int(v) for v in values[1:]]))
+        i += 2 + arg_counts[command]
+    return commands
+
+
+class _Ship:
+    __slots__ = ('id', 'owner', 'x', 'y', 'health', 'vel_x', 'vel_y', 'docking_status', 'planet', 'progress',
+                 'cooldown')
+
+    def __init__(self, ship_id, owner, x, y):
+        self.id = ship_id
+        self.owner = owner
+        self.x = x
+        self.y = y
+        self.health = constants.BASE_SHIP_HEALTH
+        self.vel_x = 0.0
+        self.vel_y = 0.0
+        self.docking_status = UNDOCKED
+        self.planet = None
+        self.progress = 0
+        self.cooldown = 0
+
+
+class _Planet:
+    __slots__ = ('id', 'x', 'y', 'radius', 'health', 'docking_spots', 'production', 'remaining', 'owner', 'docked')
+
+    def __init__(self, planet_id, x, y, radius):
+        self.id = planet_id
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.health = int(radius * constants.MAX_SHIP_HEALTH)
+        self.docking_spots = max(2, int(radius / 2))
+        self.production = 0
+        self.remaining = int(radius * 100)
+        self.owner = None
+        self.docked = []
+
+
+class GameState:
+    """
+    The rules of the game, independent of how the bots are connected.
+
+    :ivar width: Map width
+    :ivar height: Map height
+    :ivar num_players: Number of players
+    :ivar turn: Turns played so far
+    :ivar ships: Live ships by id
+    :ivar planets: Live planets by id
+    :ivar eliminated: Turn each eliminated player went out, by player id
+    """
+
+    def __init__(self, width, height, num_players, seed=0):
+        """
+        :param int width: Map width
+        :param int height: Map height
+        :param int num_players: 2 or 4
+        :param int seed: Seed for the map layout
+        """
+        if num_players not in (2, 4):
+            raise ValueError("Halite maps are for 2 or 4 players, not {}".format(num_players))
+        self.width = width
+        self.height = height
+        self.num_players = num_players
+        self.turn = 0
+        self.ships = {}
+        self.planets = {}
+        self.eliminated = {}
+        self._next_ship_id = 0
+        self._generate(random.Random(seed))
+
+    def _starts(self):
+        if self.num_players == 2:
+            return [(self.width / 4, self.height / 2), (3 * self.width / 4, self.height / 2)]
+        return [(self.width / 4, self.height / 4), (3 * self.width / 4, self.height / 4),
+                (self.width / 4, 3 * self.height / 4), (3 * self.width / 4, 3 * self.height / 4)]
+
+    def _mirrors(self, x, y):
+        # point reflection for 2 players, both axes for 4, so every player sees the same map
+        if self.num_players == 2:
+            return [(x, y), (self.width - x, self.height - y)]
+        return [(x, y), (self.width - x, y), (x, self.height - y), (self.width - x, self.height - y)]
+
+    def _generate(self, rng):
+        starts = self._starts()
+        placed = []
+        cx, cy = self.width / 2, self.height / 2
+
+        def fits(x, y, radius):
+            if not (radius + 5 < x < self.width - radius - 5 and radius + 5 < y < self.height - radius - 5):
+                return False
+            if any(math.hypot(x - sx, y - sy) < radius + 15 for sx, sy in starts):
+                return False
+            return all(math.hypot(x - px, y - py) > radius + pr + 6 for px, py, pr in placed)
+
+        # four planets around the middle, mirrored on both axes (which is fair for 2 players too), then groups
+        # mirrored for the player count; sizes, spots and ids all follow from the seed
+        for _ in range(200):
+            radius = rng.uniform(3, 8)
+            dx = rng.uniform(radius + 3, self.width / 8 + radius)
+            dy = rng.uniform(radius + 3, self.height / 8 + radius)
+            group = [(cx - dx, cy - dy), (cx + dx, cy - dy), (cx - dx, cy + dy), (cx + dx, cy + dy)]
+            if all(fits(gx, gy, radius) for gx, gy in group):
+                placed.extend((gx, gy, radius) for gx, gy in group)
+                break
+        wanted = rng.randint(3, 6)
+        for _ in range(200):
+            if len(placed) >= 4 + wanted * len(self._mirrors(0, 0)):
+                break
+            radius = rng.uniform(3, 8)
+            x, y = rng.uniform(0, self.width / 2), rng.uniform(0, self.height)
+            group = self._mirrors(x, y)
+            if all(fits(gx, gy, radius) for gx, gy in group) and \
+                    all(math.hypot(ax - bx, ay - by) > 2 * radius + 6 for ax, ay in group for bx, by in group
+                        if (ax, ay) != (bx, by)):
+                placed.extend((gx, gy, radius) for gx, gy in group)
+        for planet_id, (x, y, radius) in enumerate(placed):
+            self.planets[planet_id] = _Planet(planet_id, x, y, radius)
+        for player, (sx, sy) in enumerate(starts):
+            for offset in (-START_SPACING, 0, START_SPACING):
+                self.add_ship(player, sx, sy + offset)
+
+    def add_ship(self, owner, x, y):
+        """
+        Put a new full-health ship on the map.
+
+        :param int owner: The player id
+        :param float x: The x-coordinate
+        :param float y: The y-coordinate
+        :return: The ship
+        """
+        ship = _Ship(self._next_ship_id, owner, x, y)
+        self.ships[ship.id] = ship
+        self._next_ship_id += 1
+        return ship
+
+    def frame(self):
+        """
+        :return: The current state in the engine's wire format
+        :rtype: str
+        """
+        tokens = [str(self.num_players)]
+        for player in range(self.num_players):
+            ships = [ship for ship in self.ships.values() if ship.owner == player]
+            tokens += [str(player), str(len(ships))]
+            for ship in ships:
+                tokens += [str(ship.id), "{:.4f}".format(ship.x), "{:.4f}".format(ship.y), str(ship.health),
+                           "{:.4f}".format(ship.vel_x), "{:.4f}".format(ship.vel_y), str(ship.docking_status),
+                           str(ship.planet if ship.planet is not None else 0), str(ship.progress),
+                           str(ship.cooldown)]
+        tokens.append(str(len(self.planets)))
+        for planet in self.planets.values():
+            owned = planet.owner is not None
+            tokens += [str(planet.id), "{:.4f}".format(planet.x), "{:.4f}".format(planet.y), str(planet.health),
+                       "{:.4f}".format(planet.radius), str(planet.docking_spots), str(planet.production),
+                       str(planet.remaining), str(int(owned)), str(planet.owner if owned else 0),
+                       str(len(planet.docked))] + [str(ship_id) for ship_id in planet.docked]
+        return " ".join(tokens)
+
+    def replay_planets(self):
+        """
+        :return: The planets' fixed properties, as in a replay header
+        :rtype: list[dict]
+        """
+        return [{'id': planet.id, 'x': planet.x, 'y': planet.y, 'r': planet.radius, 'health': planet.health,
+                 'docking_spots': planet.docking_spots, 'production': planet.remaining}
+                for planet in self.planets.values()]
+
+    def replay_frame(self):
+        """
+        :return: The current state as a replay frame
+        :rtype: dict
+        """
+        ships = dict((str(player), {}) for player in range(self.num_players))
+        for ship in self.ships.values():
+            docking = {'status': replay.DOCKING_NAMES[ship.docking_status]}
+            if ship.docking_status != UNDOCKED:
+                docking.update({'planet_id': ship.planet, 'turns_left': ship.progress})
+            ships[str(ship.owner)][str(ship.id)] = {
+                'id': ship.id, 'owner': ship.owner, 'x': ship.x, 'y': ship.y, 'health': ship.health,
+                'vel_x': ship.vel_x, 'vel_y': ship.vel_y, 'docking': docking, 'cooldown': ship.cooldown}
+        planets = {}
+        for planet in self.planets.values():
+            planets[str(planet.id)] = {
+                'id': planet.id, 'health': planet.health, 'docked_ships': list(planet.docked),
+                'remaining_production': planet.remaining, 'current_production': planet.production,
+                'owner': planet.owner}
+        return {'ships': ships, 'planets': planets, 'events': []}
+
+    def alive_players(self):
+        """
+        :return: Ids of players that still have ships
+        :rtype: set[int]
+        """
+        return set(ship.owner for ship in self.ships.values())
+
+    def eliminate(self, player):
+        """
+        Remove a player from the game (e.g. after a timeout), along with all their ships.
+
+        :param int player: The player id
+        :return: nothing
+        """
+        for ship in [ship for ship in self.ships.values() if ship.owner == player]:
+            self._kill_ship(ship)
+        self.eliminated.setdefault(player, self.turn)
+
+    def _kill_ship(self, ship):
+        if self.ships.pop(ship.id, None) is not None:
+            self._release(ship)
+
+    def _release(self, ship):
+        planet = self.planets.get(ship.planet)
+        if planet is not None and ship.id in planet.docked:
+            planet.docked.remove(ship.id)
+            if not planet.docked:
+                planet.owner = None
+
+    def step(self, commands):
+        """
+        Play one turn.
+
+        :param dict[int, list] commands: Parsed commands by player id (see parse_commands)
+        :return: nothing
+        """
+        self.turn += 1
+        for ship in self.ships.values():
+            ship.vel_x = ship.vel_y = 0.0
+        self._apply_commands(commands)
+        self._advance_docking()
+        self._move()
+        self._fire()
+        self._produce()
+        for player in range(self.num_players):
+            if player not in self.eliminated and not any(s.owner == player for s in self.ships.values()):
+                self.eliminated[player] = self.turn
+
+    def _apply_commands(self, commands):
+        dock_requests = {}
+        for player, player_commands in commands.items():
+            for command, ship_id, args in player_commands:
+                ship = self.ships.get(ship_id)
+                if ship is None or ship.owner != player:
+                    continue
+                if command == 't' and ship.docking_status == UNDOCKED:
+                    magnitude = min(max(args[0], 0), constants.MAX_SPEED)
+                    angle = math.radians(args[1])
+                    ship.vel_x = magnitude * math.cos(angle)
+                    ship.vel_y = magnitude * math.sin(angle)
+                elif command == 'd' and ship.docking_status == UNDOCKED:
+                    planet = self.planets.get(args[0])
+                    if planet is not None and math.hypot(ship.x - planet.x, ship.y - planet.y) <= \
+                            planet.radius + constants.DOCK_RADIUS + constants.SHIP_RADIUS:
+                        dock_requests.setdefault(planet.id, []).append(ship)
+                elif command == 'u' and ship.docking_status == DOCKED:
+                    ship.docking_status = UNDOCKING
+                    ship.progress = constants.DOCK_TURNS
+        for planet_id, ships in dock_requests.items():
+            planet = self.planets[planet_id]
+            owners = set(ship.owner for ship in ships)
+            # players racing for the same free planet in the same turn both miss out
+            if len(owners) > 1 or (planet.owner is not None and planet.owner not in owners):
+                continue
+            for ship in ships[:planet.docking_spots - len(planet.docked)]:
+                self.dock(ship, planet)
+
+    def dock(self, ship, planet, finished=False):
+        """
+        Dock a ship to a planet, without checking whether it is allowed to.
+
+        :param ship: The ship
+        :param planet: The planet
+        :param bool finished: Skip the docking turns and leave the ship fully docked
+        :return: nothing
+        """
+        planet.owner = ship.owner
+        planet.docked.append(ship.id)
+        ship.planet = planet.id
+        ship.docking_status = DOCKED if finished else DOCKING
+        ship.progress = 0 if finished else constants.DOCK_TURNS
+
+    def _advance_docking(self):
+        for ship in self.ships.values():
+            if ship.docking_status in (DOCKING, UNDOCKING) and ship.progress > 0:
+                ship.progress -= 1
+                if ship.progress:
+                    continue
+                if ship.docking_status == DOCKING:
+                    ship.docking_status = DOCKED
+                else:
+                    self._release(ship)
+                    ship.docking_status = UNDOCKED
+                    ship.planet = None
+
+    def _move(self):
+        ships = list(self.ships.values())
+        if not ships:
+            return
+        start = np.array([[ship.x, ship.y] for ship in ships])
+        velocity = np.array([[ship.vel_x, ship.vel_y] for ship in ships])
+        planets = list(self.planets.values())
+        centers = np.array([[planet.x, planet.y] for planet in planets]).reshape(-1, 2)
+        radii = np.array([planet.radius for planet in planets])
+        alive = np.ones(len(ships), dtype=bool)
+        planet_damage = {}
+        for step in range(1, MOVE_SUBSTEPS + 1):
+            position = start + velocity * (step / MOVE_SUBSTEPS)
+            if len(planets):
+                gap = np.linalg.norm(position[:, None, :] - centers[None, :, :], axis=2) - radii[None, :]
+                crashed = alive & (gap.min(axis=1) < constants.SHIP_RADIUS) & np.any(velocity != 0, axis=1)
+                for i in np.flatnonzero(crashed):
+                    planet = planets[int(np.argmin(gap[i]))]
+                    planet_damage[planet.id] = planet_damage.get(planet.id, 0) + ships[i].health
+                alive &= ~crashed
+            distance = np.linalg.norm(position[:, None, :] - position[None, :, :], axis=2)
+            np.fill_diagonal(distance, np.inf)
+            collided = alive & np.any((distance < 2 * constants.SHIP_RADIUS) & alive[None, :], axis=1)
+            alive &= ~collided
+        inside = (position[:, 0] >= 0) & (position[:, 0] <= self.width) & \
+                 (position[:, 1] >= 0) & (position[:, 1] <= self.height)
+        alive &= inside
+        for ship, (x, y), survived in zip(ships, position, alive):
+            if survived:
+                ship.x, ship.y = float(x), float(y)
+            else:
+                self._kill_ship(ship)
+        for planet_id, damage in planet_damage.items():
+            planet = self.planets[planet_id]
+            planet.health -= damage
+            if planet.health <= 0:
+                self._destroy_planet(planet)
+
+    def _destroy_planet(self, planet):
+        del self.planets[planet.id]
+        reach = planet.radius + constants.EXPLOSION_RADIUS
+        for ship in list(self.ships.values()):
+            if ship.planet == planet.id or math.hypot(ship.x - planet.x, ship.y - planet.y) <= reach:
+                self._kill_ship(ship)
+
+    def _fire(self):
+        ships = list(self.ships.values())
+        if not ships:
+            return
+        position = np.array([[ship.x, ship.y] for ship in ships])
+        owner = np.array([ship.owner for ship in ships])
+        can_fire = np.array([ship.docking_status == UNDOCKED and ship.cooldown == 0 for ship in ships])
+        distance = np.linalg.norm(position[:, None, :] - position[None, :, :], axis=2)
+        in_range = (distance <= constants.WEAPON_RADIUS + 2 * constants.SHIP_RADIUS) & \
+                   (owner[:, None] != owner[None, :]) & can_fire[:, None]
+        targets = in_range.sum(axis=1)
+        firing = targets > 0
+        # each attacker splits its damage evenly over the enemies in range
+        share = np.where(firing, constants.WEAPON_DAMAGE / np.maximum(targets, 1), 0.0)
+        damage = (in_range * share[:, None]).sum(axis=0)
+        for ship, fired, hit in zip(ships, firing, damage):
+            if fired:
+                ship.cooldown = constants.WEAPON_COOLDOWN
+            elif ship.cooldown:
+                ship.cooldown -= 1
+            if hit:
+                ship.health -= int(math.ceil(hit))
+                if ship.health <= 0:
+                    self._kill_ship(ship)
+
+    def _produce(self):
+        for planet in list(self.planets.values()):
+            if planet.owner is None:
+                continue
+            docked = sum(1 for ship_id in planet.docked if self.ships[ship_id].docking_status == DOCKED)
+            produced = min(docked * constants.BASE_PRODUCTIVITY, planet.remaining)
+            planet.remaining -= produced
+            planet.production += produced
+            while planet.production >= SHIP_COST:
+                planet.production -= SHIP_COST
+                self._spawn_near(planet)
+
+    def _spawn_near(self, planet):
+        # spawn on the side facing the middle of the map, trying other angles if that spot is taken
+        toward_center = math.atan2(self.height / 2 - planet.y, self.width / 2 - planet.x)
+        distance = planet.radius + constants.SPAWN_RADIUS
+        for k in range(12):
+            angle = toward_center + (k + 1) // 2 * (1 if k % 2 else -1) * math.pi / 6
+            x = planet.x + distance * math.cos(angle)
+            y = planet.y + distance * math.sin(angle)
+            if all(math.hypot(x - ship.x, y - ship.y) > 2 * constants.SHIP_RADIUS for ship in self.ships.values()):
+                self.add_ship(planet.owner, x, y)
+                return
+
+    def is_over(self, max_turns):
+        """
+        :param int max_turns: The turn limit
+        :return: Whether the game has finished
+        :rtype: bool
+        """
+        return self.turn >= max_turns or len(self.alive_players()) <= 1
+
+    def ranks(self):
+        """
+        :return: Rank of every player (1 is the winner)
+        :rtype: dict[int, int]
+        """
+        health = dict((player, 0) for player in range(self.num_players))
+        for ship in self.ships.values():
+            health[ship.owner] += ship.health
+        order = sorted(range(self.num_players),
+                       key=lambda player: (self.eliminated.get(player, self.turn + 1), health[player]), reverse=True)
+        return dict((player, rank + 1) for rank, player in enumerate(order))
+
+
+class _BotProcess:
+    """
+    A bot running as a child process, talking over its stdin/stdout like under the real engine.
+    """
+
+    def __init__(self, command, cwd, env=None):
+        if env:
+            env = dict(os.environ, **env)
+        self.process = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.buffer = b''
+
+    def send(self, line):
+        try:
+            self.process.stdin.write(line.encode() + b'\n')
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def pop_line(self):
+        if b'\n' not in self.buffer:
+            return None
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.decode(errors='replace')
+
+    def close_input(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def kill(self, wait=0.0):
+        if wait > 0:
+            try:
+                self.process.wait(wait)
+            except subprocess.TimeoutExpired:
+                pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def _run_bot_thread(bot, transport):
+    try:
+        bot(transport)
+    except EOFError:
+        pass
+    finally:
+        # a bot that crashed stops answering at once instead of running out the clock
+        transport.close()
+
+
+class _BotThread:
+    """
+    A bot running in a thread of the engine's process, talking over in-memory queues. Frames are handed over as the
+    str the engine built, with no pipe or encoding in between.
+    """
+
+    def __init__(self, bot):
+        self.transport = QueueTransport()
+        self.thread = threading.Thread(target=_run_bot_thread, args=(bot, self.transport.peer()), daemon=True)
+        self.thread.start()
+
+    def send(self, message):
+        for line in message.split('\n'):
+            self.transport.send(line)
+            self.transport.done_sending()
+        return True
+
+    def read_line(self, timeout):
+        try:
+            return self.transport.read_line(timeout)
+        except EOFError:
+            return None
+
+    def close_input(self):
+        self.transport.close()
+
+    def kill(self, wait=0.0):
+        # threads can't be killed: the bot gets EOFError on its next read and stops there
+        self.transport.close()
+
+
+def _read_lines(bots, deadline):
+    """
+    Wait for one line from each bot, reading them all at once so a slow bot doesn't inflate the others' latency.
+
+    :param dict[int, _BotProcess] bots: Bots to read from, by player id
+    :param float deadline: time.perf_counter() value to give up at
+    :return: The line and arrival time of each bot that answered in time
+    :rtype: dict[int, (str, float)]
+    """
+    answers = {}
+    selector = selectors.DefaultSelector()
+    for player, bot in bots.items():
+        line = bot.pop_line()
+        if line is not None:
+            answers[player] = (line, time.perf_counter())
+        else:
+            selector.register(bot.process.stdout, selectors.EVENT_READ, player)
+    while selector.get_map() and time.perf_counter() < deadline:
+        for key, _ in selector.select(max(0.0, deadline - time.perf_counter())):
+            player = key.data
+            bot = bots[player]
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                # the bot exited; it will count as timed out
+                selector.unregister(key.fileobj)
+                continue
+            bot.buffer += chunk
+            line = bot.pop_line()
+            if line is not None:
+                answers[player] = (line, time.perf_counter())
+                selector.unregister(key.fileobj)
+    selector.close()
+    return answers
+
+
+class LocalEngine:
+    """
+    Plays one game between bot processes, or between bots running in threads of this process.
+
+    An in-process bot is a callable taking an hlt transport to build its hlt.Game with (see
+    tournament.in_process_bot); it returns, or raises EOFError from the transport, when the game is over. In-process bots
+    share the interpreter, so they are handed each frame one at a time and each gets the whole turn to itself; their
+    latencies are then comparable with bot processes', while a game skips process start-up and pipe traffic.
+
+    :ivar state: The GameState being played
+    """
+
+    def __init__(self, bot_commands, width=240, height=160, seed=0, max_turns=None, turn_timeout=TURN_TIMEOUT,
+                 init_timeout=INIT_TIMEOUT, cwd=None, replay_path=None, bot_envs=None):
+        """
+        :param list bot_commands: Command line (list[str]) for each player's bot (2 or 4 of them), or in-process bot
+            callables for every player
+        :param int width: Map width
+        :param int height: Map height
+        :param int seed: Seed for the map layout
+        :param int max_turns: Turn limit (defaults to the real engine's limit for the map size)
+        :param float turn_timeout: Seconds each bot gets per turn
+        :param float init_timeout: Seconds each bot gets to initialize
+        :param str cwd: Directory the bots run in (their logs end up there)
+        :param str replay_path: Write a .hlt replay of the game here (gzip compressed if it ends in .gz)
+        :param list[dict] bot_envs: Extra environment variables for each player's bot process (None for none)
+        """
+        self.in_process = all(callable(bot) for bot in bot_commands)
+        if not self.in_process and any(callable(bot) for bot in bot_commands):
+            raise ValueError("Bots are either all in-process or all processes")
+        if self.in_process and bot_envs and any(bot_envs):
+            raise ValueError("In-process bots share this process's environment")
+        self.bot_commands = bot_commands
+        self.seed = seed
+        self.state = GameState(width, height, len(bot_commands), seed)
+        self.max_turns = max_turns or default_max_turns(width, height)
+        self.turn_timeout = turn_timeout
+        self.init_timeout = init_timeout
+        self.cwd = cwd
+        self.replay_path = replay_path
+        self.bot_envs = bot_envs or [None] * len(bot_commands)
+
+    def _exchange(self, bots, messages, timeout):
+        """
+        Send each bot its message and wait for its answer line.
+
+        :param dict bots: Bots by player id
+        :param dict[int, str] messages: What to send each bot
+        :param float timeout: Seconds each bot gets to answer
+        :return: The line and latency (seconds) of each bot that answered in time
+        :rtype: dict[int, (str, float)]
+        """
+        if not self.in_process:
+            for player, bot in bots.items():
+                bot.send(messages[player])
+            sent = time.perf_counter()
+            return dict((player, (line, arrived - sent))
+                        for player, (line, arrived) in _read_lines(bots, sent + timeout).items())
+        answers = {}
+        for player, bot in bots.items():
+            sent = time.perf_counter()
+            bot.send(messages[player])
+            line = bot.read_line(timeout)
+            if line is not None:
+                answers[player] = (line, time.perf_counter() - sent)
+        return answers
+
+    def run(self):
+        """
+        Play the game to the end.
+
+        :return: Turns played, plus each player's name, rank, ships left, per-turn latencies (seconds), and the
+            turn they timed out on (None if they never did)
+        :rtype: dict
+        """
+        state = self.state
+        if self.in_process:
+            bots = dict((player, _BotThread(bot)) for player, bot in enumerate(self.bot_commands))
+        else:
+            bots = dict((player, _BotProcess(command, self.cwd, env))
+                        for player, (command, env) in enumerate(zip(self.bot_commands, self.bot_envs)))
+        names = dict((player, None) for player in bots)
+        latencies = dict((player, []) for player in bots)
+        timed_out = dict((player, None) for player in bots)
+        planets = state.replay_planets()
+        frames = []
+        moves = []
+        try:
+            frame = state.frame()
+            answers = self._exchange(bots, dict((player, "{}\n{} {}\n{}".format(player, state.width, state.height,
+                                                                                frame)) for player in bots),
+                                     self.init_timeout)
+            for player in bots:
+                if player in answers:
+                    names[player] = answers[player][0].strip()
+                else:
+                    timed_out[player] = 0
+                    state.eliminate(player)
+                    bots[player].kill()
+            while not state.is_over(self.max_turns):
+                live = dict((player, bot) for player, bot in bots.items()
+                            if timed_out[player] is None and player not in state.eliminated)
+                frame = state.frame()
+                if self.replay_path:
+                    frames.append(state.replay_frame())
+                answers = self._exchange(live, dict((player, frame) for player in live), self.turn_timeout)
+                commands = {}
+                for player in live:
+                    if player in answers:
+                        line, latency = answers[player]
+                        latencies[player].append(latency)
+                        commands[player] = parse_commands(line)
+                    else:
+                        timed_out[player] = state.turn + 1
+                        state.eliminate(player)
+                        live[player].kill()
+                if self.replay_path:
+                    moves.append(dict((str(player), [dict((str(ship_id), replay.command_to_move(c, ship_id, args))
+                                                          for c, ship_id, args in player_commands)])
+                                      for player, player_commands in commands.items()))
+                state.step(commands)
+        finally:
+            # the bots see their input end and get a moment to exit cleanly before being killed
+            for bot in bots.values():
+                bot.close_input()
+            deadline = time.perf_counter() + EXIT_GRACE
+            for bot in bots.values():
+                bot.kill(max(0.0, deadline - time.perf_counter()))
+        if self.replay_path:
+            frames.append(state.replay_frame())
+            replay.write_replay(self.replay_path, {
+                'version': 1, 'seed': self.seed, 'width': state.width, 'height': state.height,
+                'num_players': state.num_players, 'num_frames': len(frames),
+                'player_names': [names[player] for player in sorted(bots)],
+                'planets': planets, 'frames': frames, 'moves': moves})
+        ranks = state.ranks()
+        ships = dict((player, 0) for player in bots)
+        for ship in state.ships.values():
+            ships[ship.owner] += 1
+        return {
+            'turns': state.turn,
+            'players': [{
+                'name': names[player],
+                'rank': ranks[player],
+                'ships': ships[player],
+                'timed_out': timed_out[player],
+                'latencies': latencies[player],
+            } for player in sorted(bots)],
+        }
@@ -0,0 +1,241 @@
+"""
+Microbenchmarks for the geometry kernels, checked against stored baselines, plus randomized equivalence checks
+between each reference (scalar) kernel and its fast path.
+
+Every kernel runs over a fixed, seeded batch of inputs; its best per-call time is compared with the baseline file
+and the run fails when any kernel is slower than the baseline by more than the threshold, or when a fast path
+disagrees with its reference on any random trial. Baselines are machine specific, so refresh them with
+--update-baseline after moving machines or after an intended speed change.
+
+Example:
+    python3 microbench.py                    # check against microbench_baseline.json
+    python3 microbench.py --update-baseline  # re-pin the baselines
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+import numpy as np
+from hlt import collision
+from hlt.entity import Planet, Position
+import bresenham
+import Navigation
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'microbench_baseline.json')
+#: Slowdown (current / baseline) above which a kernel fails
+THRESHOLD = 1.3
+#: Calls per timed batch
+BATCH = 200
+REPEATS = 7
+
+
+def _circle(x, y, radius):
+    return Planet(0, x, y, 1000, radius, 2, 0, 0, False, 0, [])
+
+
+def _point(rng, width=240, height=160):
+    return Position(rng.uniform(0, width), rng.uniform(0, height))
+
+
+def _circles(rng, count, width=240, height=160):
+    return [_circle(rng.uniform(-5, width + 5), rng.uniform(-5, height + 5), rng.choice([0.5, rng.uniform(3, 8)]))
+            for _ in range(count)]
+
+
+def _cell_pair(rng):
+    # bresenham divides by the run length, so the ends must differ
+    while True:
+        start = (rng.randrange(240), rng.randrange(160))
+        end = (min(239, max(0, start[0] + rng.randint(-60, 60))), min(159, max(0, start[1] + rng.randint(-60, 60))))
+        if start != end:
+            return start, end
+
+
+def setup_intersect_segment_circle(rng):
+    cases = [(_point(rng), _point(rng), _circles(rng, 1)[0]) for _ in range(BATCH)]
+    return lambda: [collision.intersect_segment_circle(start, end, circle, fudge=0.6) for start, end, circle in cases]
+
+
+def setup_calculate_distance_between(rng):
+    cases = [(_point(rng), _point(rng)) for _ in range(BATCH)]
+    return lambda: [a.calculate_distance_between(b) for a, b in cases]
+
+
+def setup_closest_point_to(rng):
+    cases = [(_point(rng), _circles(rng, 1)[0]) for _ in range(BATCH)]
+    return lambda: [ship.closest_point_to(planet) for ship, planet in cases]
+
+
+def setup_bresenham(rng):
+    cases = [_cell_pair(rng) for _ in range(BATCH)]
+    return lambda: [bresenham.bresenham(start, end).path for start, end in cases]
+
+
+def setup_set_obstacle(rng):
+    planning_map = Navigation.PlanningMap(240, 160)
+    cases = _circles(rng, BATCH)
+    return lambda: [planning_map.set_obstacle(circle.x, circle.y, circle.radius) for circle in cases]
+
+
+def setup_occupancy_stamp(rng):
+    occupancy = Navigation.OccupancyGrid(240, 160)
+    grid = np.zeros((160, 240), dtype=bool)
+    cases = _circles(rng, BATCH)
+    # one call stamps the whole batch, so scale it back to per entity below via the batch size
+    return lambda: occupancy.stamp(grid, cases)
+
+
+def setup_distance_transform(rng):
+    obstacles = np.random.RandomState(rng.randrange(2 ** 31)).rand(160, 240) < 0.02
+    return lambda: Navigation.distance_transform(obstacles, Navigation.OccupancyGrid.MAX_CLEARANCE)
+
+
+#: name -> (setup(rng) returning a callable, calls made by one run of that callable)
+KERNELS = {
+    'intersect_segment_circle': (setup_intersect_segment_circle, BATCH),
+    'calculate_distance_between': (setup_calculate_distance_between, BATCH),
+    'closest_point_to': (setup_closest_point_to, BATCH),
+    'bresenham': (setup_bresenham, BATCH),
+    'set_obstacle': (setup_set_obstacle, BATCH),
+    'occupancy_stamp': (setup_occupancy_stamp, BATCH),
+    'distance_transform': (setup_distance_transform, 1),
+}
+
+
+def time_kernel(name, seed=0):
+    """
+    :param str name: Kernel name
+    :param int seed: Input seed
+    :return: Best seconds per call over the repeats
+    :rtype: float
+    """
+    setup, calls = KERNELS[name]
+    run = setup(random.Random(seed))
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    return min(timer.repeat(REPEATS, number)) / (number * calls)
+
+
+def check_set_obstacle(rng):
+    # PlanningMap.set_obstacle is the reference rasterizer for OccupancyGrid's vectorized stamp
+    width, height = rng.randint(20, 120), rng.randint(20, 120)
+    inflation = rng.choice([0.0, 0.5, 1.3])
+    circles = _circles(rng, rng.randint(0, 30), width, height)
+    reference = Navigation.PlanningMap(width, height, inflation)
+    reference.add_entity_obstacles(circles)
+    fast = Navigation.OccupancyGrid(width, height, inflation).stamp(np.zeros((height, width), dtype=bool), circles)
+    return np.array_equal(reference.get_map(), fast)
+
+
+def check_distance_transform(rng):
+    # brute force nearest-obstacle distance; the fast version is exact up to max_distance and above it beyond
+    width, height = rng.randint(5, 40), rng.randint(5, 40)
+    max_distance = rng.randint(1, 8)
+    obstacles = np.random.RandomState(rng.randrange(2 ** 31)).rand(height, width) < rng.uniform(0.01, 0.2)
+    fast = Navigation.distance_transform(obstacles, max_distance)
+    oy, ox = np.nonzero(obstacles)
+    ys, xs = np.mgrid[0:height, 0:width]
+    if len(ox):
+        reference = np.sqrt(((xs[..., None] - ox) ** 2 + (ys[..., None] - oy) ** 2).min(axis=2))
+    else:
+        reference = np.full((height, width), np.inf)
+    near = reference <= max_distance
+    return np.allclose(fast[near], reference[near], atol=1e-5) and bool(np.all(fast[~near] > max_distance))
+
+
+def check_obstacle_mask(rng):
+    # ObstacleMask.is_blocked reads through the cleared overlay; to_array materializes it
+    width, height = rng.randint(5, 60), rng.randint(5, 60)
+    grid = np.random.RandomState(rng.randrange(2 ** 31)).rand(height, width) < 0.3
+    count = rng.randint(0, 20)
+    cleared = (np.array([rng.randrange(width) for _ in range(count)], dtype=np.intp),
+               np.array([rng.randrange(height) for _ in range(count)], dtype=np.intp))
+    mask = Navigation.ObstacleMask(grid, cleared)
+    array = mask.to_array()
+    return all(mask.is_blocked(x, y) == bool(array[y, x]) for y in range(height) for x in range(width))
+
+
+#: name -> check(rng) returning whether the fast path matched its reference on one random case
+EQUIVALENCE_CHECKS = {
+    'set_obstacle/occupancy_stamp': check_set_obstacle,
+    'distance_transform/brute_force': check_distance_transform,
+    'obstacle_mask/to_array': check_obstacle_mask,
+}
+
+
+def run_equivalence(trials, seed=0):
+    """
+    :param int trials: Random cases per check
+    :param int seed: Seed for the cases
+    :return: The first failing trial number of each check that failed
+    :rtype: dict[str, int]
+    """
+    failures = {}
+    for name, check in EQUIVALENCE_CHECKS.items():
+        rng = random.Random(seed)
+        for trial in range(trials):
+            if not check(rng):
+                failures[name] = trial
+                break
+    return failures
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kernels', nargs='+', default=sorted(KERNELS), choices=sorted(KERNELS))
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help="write the timings as the new baselines")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="allowed slowdown ratio")
+    parser.add_argument('--trials', type=int, default=200, help="random cases per equivalence check")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    failures = run_equivalence(args.trials, args.seed)
+    for name in EQUIVALENCE_CHECKS:
+        if name in failures:
+            print("MISMATCH {:<34} first failing trial {} (seed {})".format(name, failures[name], args.seed))
+            failed = True
+        else:
+            print("ok       {:<34} {} trials".format(name, args.trials))
+
+    timings = dict((name, time_kernel(name, args.seed)) for name in args.kernels)
+    baseline = None if args.update_baseline else load_baseline(args.baseline)
+    if baseline is None and not args.update_baseline:
+        print("No baseline at {}, run with --update-baseline to pin one".format(args.baseline))
+    elif baseline is not None and baseline.get('machine') != platform.machine():
+        print("Baseline was pinned on {}, timings may not be comparable".format(baseline.get('machine')))
+    for name, seconds in sorted(timings.items()):
+        pinned = baseline['kernels'].get(name) if baseline else None
+        if pinned is None:
+            print("{:<28} {:>10.3f} us".format(name, 1e6 * seconds))
+            continue
+        ratio = seconds / pinned
+        slow = ratio > args.threshold
+        failed = failed or slow
+        print("{:<28} {:>10.3f} us  baseline {:>10.3f} us  x{:.2f}{}".format(
+            name, 1e6 * seconds, 1e6 * pinned, ratio, "  SLOWER" if slow else ""))
+
+    if args.update_baseline:
+        pinned = load_baseline(args.baseline) or {'kernels': {}}
+        pinned['kernels'].update(timings)
+        pinned.update({'machine': platform.machine(), 'python': platform.python_version(), 'numpy': np.__version__})
+        with open(args.baseline, 'w') as f:
+            json.dump(pinned, f, indent=1, sort_keys=True)
+        print("Baselines written to {}".format(args.baseline))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
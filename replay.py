@@ -0,0 +1,259 @@
+"""
+Reading and writing Halite II replay (.hlt) files, and turning replay frames back into the engine's wire format.
+
+A replay is one JSON object: map size, player names, the planets' fixed properties, then one entry per turn in
+"frames" (ships by owner and ship id, planets by id) and the commands of each turn in "moves". The halite binary
+compresses replays with zstd; gzip and plain JSON are read too.
+
+load_replay reads a whole replay at once; ReplayStream decodes one frame at a time for corpus-sized work.
+"""
+
+import codecs
+import gzip
+import json
+import re
+
+DOCKING_STATUS = {'undocked': 0, 'docking': 1, 'docked': 2, 'undocking': 3}
+DOCKING_NAMES = dict((value, name) for name, value in DOCKING_STATUS.items())
+
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_replay(path):
+    """
+    Open a replay for reading as a binary stream, decompressing it on the fly.
+
+    :param str path: The .hlt file
+    :return: A binary file object
+    """
+    f = open(path, 'rb')
+    magic = f.read(4)
+    f.seek(0)
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=f)
+    if magic == _ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            f.close()
+            raise ImportError("{} is zstd compressed, pip install zstandard to read it".format(path))
+        return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+    return f
+
+
+def load_replay(path):
+    """
+    :param str path: The .hlt file
+    :return: The whole replay
+    :rtype: dict
+    """
+    with open_replay(path) as f:
+        return json.loads(f.read().decode())
+
+
+class ReplayStream:
+    """
+    Reads a replay's frames one at a time, so memory stays at one frame (plus a read chunk) however long the game.
+
+    Keys other than "frames" and "moves" are collected into header as they are passed. The halite binary writes keys
+    in alphabetical order, so most of the header (height, planets, width...) is only complete once the frames have
+    been read.
+
+    :ivar header: The top-level values read so far, except frames and moves
+    """
+    CHUNK_SIZE = 1 << 20
+    _WHITESPACE = re.compile(r'\s*')
+
+    def __init__(self, path, chunk_size=None):
+        """
+        :param str path: The .hlt file
+        :param int chunk_size: Bytes read at a time
+        """
+        self.path = path
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.header = {}
+        self._decoder = json.JSONDecoder()
+
+    def frames(self):
+        """
+        :return: The frames in order (moves are skipped)
+        :rtype: iterator[dict]
+        """
+        for key, value in self._values():
+            if key == 'frames':
+                yield value
+
+    def moves(self):
+        """
+        :return: Each turn's moves in order (frames are skipped)
+        :rtype: iterator[dict]
+        """
+        for key, value in self._values():
+            if key == 'moves':
+                yield value
+
+    def _values(self):
+        # a tiny incremental reader for the top-level object: each value (or each element of the frames and moves
+        # arrays) is handed to the C json decoder once the buffer holds all of it
+        with open_replay(self.path) as f:
+            text = codecs.getincrementaldecoder('utf-8')()
+            self._buffer = ''
+            self._position = 0
+            self._eof = False
+
+            def fill():
+                chunk = f.read(self.chunk_size)
+                self._eof = not chunk
+                self._buffer = self._buffer[self._position:] + text.decode(chunk, final=self._eof)
+                self._position = 0
+                return not self._eof
+
+            def next_char():
+                while True:
+                    self._position = self._WHITESPACE.match(self._buffer, self._position).end()
+                    if self._position < len(self._buffer):
+                        return self._buffer[self._position]
+                    if not fill():
+                        raise ValueError("{} ends early".format(self.path))
+
+            def decode():
+                next_char()
+                while True:
+                    try:
+                        value, end = self._decoder.raw_decode(self._buffer, self._position)
+                    except ValueError:
+                        # part of the value is still unread; a real syntax error shows up at the end of the file
+                        if not fill():
+                            raise
+                        continue
+                    # a number at the end of the buffer may continue in the next chunk
+                    if end == len(self._buffer) and not self._eof:
+                        fill()
+                        continue
+                    self._position = end
+                    return value
+
+            if next_char() != '{':
+                raise ValueError("{} is not a replay".format(self.path))
+            self._position += 1
+            while next_char() != '}':
+                if self._buffer[self._position] == ',':
+                    self._position += 1
+                key = decode()
+                if next_char() != ':':
+                    raise ValueError("{} is not a replay".format(self.path))
+                self._position += 1
+                if key in ('frames', 'moves') and next_char() == '[':
+                    self._position += 1
+                    while next_char() != ']':
+                        if self._buffer[self._position] == ',':
+                            self._position += 1
+                        yield key, decode()
+                    self._position += 1
+                else:
+                    self.header[key] = decode()
+
+
+def write_replay(path, replay):
+    """
+    Write a replay, gzip compressed if the path ends in .gz.
+
+    :param str path: File to write
+    :param dict replay: The replay
+    :return: nothing
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        json.dump(replay, f, separators=(',', ':'))
+
+
+def planet_layout(replay):
+    """
+    :param dict replay: The replay (only its header is needed)
+    :return: Fixed planet properties (x, y, radius, docking spots) by planet id
+    :rtype: dict[int, dict]
+    """
+    layout = {}
+    for planet in replay['planets']:
+        layout[int(planet['id'])] = {
+            'x': planet['x'],
+            'y': planet['y'],
+            'r': planet.get('r', planet.get('radius')),
+            'docking_spots': planet['docking_spots'],
+        }
+    return layout
+
+
+def frame_to_engine_string(frame, layout, num_players):
+    """
+    Rebuild the engine's input line for one replay frame (every bot gets the same line).
+
+    :param dict frame: One entry of the replay's "frames"
+    :param dict layout: Output of planet_layout
+    :param int num_players: Number of players in the game
+    :return: The frame in the engine's wire format
+    :rtype: str
+    """
+    tokens = [str(num_players)]
+    ships_by_owner = frame.get('ships', {})
+    for player in range(num_players):
+        ships = sorted(ships_by_owner.get(str(player), {}).values(), key=lambda ship: ship['id'])
+        tokens += [str(player), str(len(ships))]
+        for ship in ships:
+            docking = ship.get('docking', {})
+            tokens += [str(ship['id']), repr(float(ship['x'])), repr(float(ship['y'])), str(int(ship['health'])),
+                       repr(float(ship.get('vel_x', 0))), repr(float(ship.get('vel_y', 0))),
+                       str(DOCKING_STATUS[docking.get('status', 'undocked')]), str(docking.get('planet_id', 0)),
+                       str(docking.get('turns_left', 0)), str(ship.get('cooldown', 0))]
+    planets = sorted(frame.get('planets', {}).values(), key=lambda planet: planet['id'])
+    tokens.append(str(len(planets)))
+    for planet in planets:
+        fixed = layout[int(planet['id'])]
+        owner = planet.get('owner')
+        docked = planet.get('docked_ships', [])
+        tokens += [str(planet['id']), repr(float(fixed['x'])), repr(float(fixed['y'])), str(int(planet['health'])),
+                   repr(float(fixed['r'])), str(fixed['docking_spots']), str(planet.get('current_production', 0)),
+                   str(planet.get('remaining_production', 0)), str(int(owner is not None)),
+                   str(owner if owner is not None else 0), str(len(docked))] + [str(ship_id) for ship_id in docked]
+    return " ".join(tokens)
+
+
+def iter_engine_frames(replay):
+    """
+    :param dict replay: The replay
+    :return: (turn index, engine input line) for every frame
+    :rtype: iterator[(int, str)]
+    """
+    layout = planet_layout(replay)
+    for turn, frame in enumerate(replay['frames']):
+        yield turn, frame_to_engine_string(frame, layout, replay['num_players'])
+
+
+def move_to_command(ship_id, move):
+    """
+    :param int ship_id: The ship the move is for
+    :param dict move: A move as stored in the replay's "moves"
+    :return: The command as the bot sent it
+    :rtype: str
+    """
+    if move['type'] == 'thrust':
+        return "t {} {} {}".format(ship_id, move['magnitude'], move['angle'])
+    if move['type'] == 'dock':
+        return "d {} {}".format(ship_id, move['planet_id'])
+    return "u {}".format(ship_id)
+
+
+def command_to_move(command, ship_id, args):
+    """
+    :param str command: 't', 'd' or 'u'
+    :param int ship_id: The ship
+    :param list[int] args: The command's arguments
+    :return: The move as stored in the replay's "moves"
+    :rtype: dict
+    """
+    if command == 't':
+        return {'type': 'thrust', 'shipId': ship_id, 'magnitude': args[0], 'angle': args[1]}
+    if command == 'd':
+        return {'type': 'dock', 'shipId': ship_id, 'planet_id': args[0]}
+    return {'type': 'undock', 'shipId': ship_id}
@@ -0,0 +1,222 @@
+"""
+Replay a recorded game through a bot's turn function offline, timing every turn and its phases, and diff the
+commands against an earlier run to see what a code change did.
+
+The bot plays one seat of the recorded game: every turn it gets the frame that seat saw, but the game carries on as
+recorded rather than reacting to the new commands, so runs are repeatable. The random module is reseeded every turn,
+and --no-deadline hands the bot an unlimited turn (MyBot then also lets every search run to completion) so deadline
+fallbacks and cut-short searches don't make the commands timing dependent.
+
+Example:
+    python3 replay_regression.py game.hlt --player 0 --output before.json
+    (change the code)
+    python3 replay_regression.py game.hlt --player 0 --output after.json --compare before.json
+"""
+
+import argparse
+import copy
+import importlib.util
+import json
+import logging
+import os
+import random
+import time
+import hlt
+import replay
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_bot_module(script):
+    """
+    Import a bot script by file name (several have names that aren't valid module names).
+
+    :param str script: The script, relative to this directory
+    :return: The module
+    """
+    name = os.path.splitext(os.path.basename(script))[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _swarm_bot(script, unlimited=None):
+    """
+    :param str script: The bot script
+    :param float unlimited: For bots that always need a turn start: how far ahead to put it when there is no
+        deadline
+    """
+    def make_turn(initial_map):
+        swarm = load_bot_module(script).SwarmMaster()
+
+        def turn(game_map, turn_count, turn_time):
+            if turn_time is None and unlimited is not None:
+                turn_time = time.time() + unlimited
+            return swarm.update_swarm(game_map, turn_count, turn_time)
+        return turn
+    return make_turn
+
+
+def _v3_bot(initial_map):
+    swarm = load_bot_module('MyBot_v3.py').SwarmMaster(initial_map, track_enemies=False)
+    return lambda game_map, turn, turn_time: swarm.update_swarm(game_map)
+
+
+#: Bot name -> factory taking the initial map and returning turn(game_map, turn, turn_time) -> commands, where
+#: turn_time is None for no deadline.
+#: The starter bots run their turn loop at module level, so they can only be played over stdio.
+TURN_FUNCTIONS = {
+    'MyBot': _swarm_bot('MyBot.py'),
+    'v3': _v3_bot,
+    'v3-1_failed': _swarm_bot('MyBot_v3-1_failed.py', unlimited=1e9),
+}
+
+
+def replay_bot(game, make_turn, player, start=1, end=None, seed=0, no_deadline=False):
+    """
+    Feed one seat's frames of a recorded game to a bot.
+
+    :param dict game: The replay
+    :param make_turn: Factory from TURN_FUNCTIONS
+    :param int player: The seat to play
+    :param int start: First turn to play (earlier turns are only parsed, so the bot starts cold there
+        but the map's motion history doesn't)
+    :param int end: Last turn to play (default the end of the game)
+    :param int seed: Base seed for the random module
+    :param bool no_deadline: Give the bot an unlimited turn
+    :return: Per turn: turn number, latency, phase times and commands
+    :rtype: list[dict]
+    """
+    profiler = hlt.profiling.TurnProfiler(enabled=True)
+    frames = list(replay.iter_engine_frames(game))
+    # one Map for the whole game, as hlt.Game keeps, so its motion history builds up frame by frame
+    game_map = hlt.game_map.Map(player, game['width'], game['height'], profiler)
+    game_map._parse(frames[0][1])
+    initial_map = copy.deepcopy(game_map)
+    turn_function = make_turn(initial_map)
+    records = []
+    # frame i is what the bots saw before the moves of turn i + 1
+    for index, frame in frames[:-1]:
+        turn = index + 1
+        if end is not None and turn > end:
+            break
+        # turn 1 is played on the initial frame, parsed above
+        if turn < start:
+            game_map._parse(frame, same_turn=turn == 1)
+            continue
+        random.seed(seed + turn)
+        profiler.start_turn()
+        started = time.perf_counter()
+        game_map._parse(frame, same_turn=turn == 1)
+        if game_map.get_me() is None or not game_map.get_me().all_ships():
+            profiler.end_turn()
+            break
+        turn_time = None if no_deadline else time.time()
+        with profiler.phase('strategy'):
+            commands = turn_function(game_map, turn, turn_time)
+        latency = time.perf_counter() - started
+        profiler.end_turn()
+        records.append({'turn': turn, 'latency': latency, 'phases': dict(profiler.last_turn),
+                        'commands': [command for command in commands or [] if command]})
+    return records
+
+
+def summarize(records):
+    """
+    :param list[dict] records: Output of replay_bot
+    :return: Latency percentiles for the whole turn and for each phase, with turns a phase didn't run in counted
+        as 0 (as hlt.profiling.TurnProfiler reports them)
+    :rtype: dict
+    """
+    percentiles = hlt.profiling.TurnProfiler._percentiles
+    names = set(name for record in records for name in record['phases'])
+    return {
+        'turns': len(records),
+        'latency': percentiles([record['latency'] for record in records]),
+        'phases': dict((name, percentiles([record['phases'].get(name, 0.0) for record in records]))
+                       for name in names),
+    }
+
+
+def _commands_by_ship(commands):
+    return dict((int(command.split()[1]), command) for command in commands)
+
+
+def diff_runs(before, after):
+    """
+    Compare the commands and timings of two runs over the same replay and seat.
+
+    :param list[dict] before: Records of the earlier run
+    :param list[dict] after: Records of the later run
+    :return: Turns whose commands differ (per ship: before and after, None when missing) and the latency change
+    :rtype: dict
+    """
+    before_turns = dict((record['turn'], record) for record in before)
+    changed = []
+    for record in after:
+        earlier = before_turns.get(record['turn'])
+        if earlier is None:
+            continue
+        old = _commands_by_ship(earlier['commands'])
+        new = _commands_by_ship(record['commands'])
+        ships = [[ship_id, old.get(ship_id), new.get(ship_id)] for ship_id in sorted(set(old) | set(new))
+                 if old.get(ship_id) != new.get(ship_id)]
+        if ships:
+            changed.append({'turn': record['turn'], 'ships': ships})
+    compared = set(before_turns) & set(record['turn'] for record in after)
+    before_summary = summarize(before)
+    after_summary = summarize(after)
+    return {
+        'turns_compared': len(compared),
+        'turns_changed': len(changed),
+        'changes': changed,
+        'latency_before': before_summary['latency'],
+        'latency_after': after_summary['latency'],
+        'phases_before': before_summary['phases'],
+        'phases_after': after_summary['phases'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('replay', help=".hlt file (plain, gzip or zstd)")
+    parser.add_argument('--bot', default='MyBot', choices=sorted(TURN_FUNCTIONS))
+    parser.add_argument('--player', type=int, default=0, help="seat to play")
+    parser.add_argument('--start', type=int, default=1, help="first turn to play")
+    parser.add_argument('--end', type=int, default=None, help="last turn to play")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-deadline', action='store_true', help="give the bot unlimited time per turn")
+    parser.add_argument('--output', default=None, help="write the per-turn records and summary here")
+    parser.add_argument('--compare', default=None, help="output of an earlier run to diff against")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    game = replay.load_replay(args.replay)
+    records = replay_bot(game, TURN_FUNCTIONS[args.bot], args.player, args.start, args.end, args.seed,
+                         args.no_deadline)
+    report = {'replay': args.replay, 'bot': args.bot, 'player': args.player, 'seed': args.seed,
+              'no_deadline': args.no_deadline, 'summary': summarize(records), 'turns': records}
+    latency = report['summary']['latency']
+    print("{} turns: p50 {:.4f}s, p95 {:.4f}s, max {:.4f}s".format(
+        len(records), latency['p50'], latency['p95'], latency['max']))
+    for name, stats in sorted(report['summary']['phases'].items()):
+        print("  {:<12} p50 {:.4f}s, p95 {:.4f}s, max {:.4f}s".format(name, stats['p50'], stats['p95'], stats['max']))
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+        report['diff'] = diff_runs(before['turns'], records)
+        diff = report['diff']
+        print("Commands changed on {} of {} turns; p50 latency {:.4f}s -> {:.4f}s".format(
+            diff['turns_changed'], diff['turns_compared'], diff['latency_before']['p50'],
+            diff['latency_after']['p50']))
+        for change in diff['changes'][:10]:
+            print("  turn {}: {}".format(change['turn'], ", ".join(
+                "{} {} -> {}".format(ship_id, old, new) for ship_id, old, new in change['ships'][:5])))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
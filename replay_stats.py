@@ -0,0 +1,139 @@
+"""
+Statistics over a directory of replays, streamed one frame at a time and spread over a process pool.
+
+Each replay is reduced to a few small columns in a worker, and the columns of all replays are concatenated and
+saved as compressed numpy archives (one per table, each with a 'replays' array that the 'replay' column indexes):
+- first_dock.npz: replay, planet, turn, player -- the first turn each planet had a ship docking or docked
+- ship_losses.npz: replay, turn, player, lost -- ships a player lost each turn (only turns with losses)
+- fleet_size.npz: replay, player, mean, max -- ships per turn over the whole game
+
+Example:
+    python3 replay_stats.py replays/ --output stats/
+    python3 -c "import numpy; d = numpy.load('stats/ship_losses.npz'); print(d['lost'].sum())"
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import numpy as np
+import replay
+
+TABLES = {
+    'first_dock': ('replay', 'planet', 'turn', 'player'),
+    'ship_losses': ('replay', 'turn', 'player', 'lost'),
+    'fleet_size': ('replay', 'player', 'mean', 'max'),
+}
+
+
+def summarize_replay(path):
+    """
+    One pass over a replay's frames.
+
+    :param str path: The .hlt file
+    :return: Rows (without the replay column) for each table
+    :rtype: dict[str, list[tuple]]
+    """
+    first_dock = {}
+    losses = []
+    fleet_total = {}
+    fleet_max = {}
+    previous = {}
+    turns = 0
+    for turn, frame in enumerate(replay.ReplayStream(path).frames()):
+        turns += 1
+        current = {}
+        for player, ships in frame.get('ships', {}).items():
+            player = int(player)
+            current[player] = set(ships)
+            fleet_total[player] = fleet_total.get(player, 0) + len(ships)
+            fleet_max[player] = max(fleet_max.get(player, 0), len(ships))
+        for player, ids in previous.items():
+            lost = len(ids - current.get(player, set()))
+            if lost:
+                losses.append((turn, player, lost))
+        previous = current
+        for planet in frame.get('planets', {}).values():
+            if planet.get('docked_ships') and planet['id'] not in first_dock:
+                owner = planet.get('owner')
+                first_dock[planet['id']] = (turn, -1 if owner is None else owner)
+    return {
+        'first_dock': [(planet, turn, owner) for planet, (turn, owner) in sorted(first_dock.items())],
+        'ship_losses': losses,
+        'fleet_size': [(player, fleet_total[player] / turns, fleet_max[player]) for player in sorted(fleet_total)],
+    }
+
+
+def _apply(task):
+    function, path = task
+    try:
+        return path, function(path), None
+    except Exception as e:
+        return path, None, "{}: {}".format(type(e).__name__, e)
+
+
+def map_replays(function, paths, processes=None, chunksize=4):
+    """
+    Run an analysis over replays on a process pool. A replay the function fails on is reported, not raised.
+
+    :param function: Top-level function taking a replay path (it must pickle)
+    :param list[str] paths: Replay files
+    :param int processes: Worker count (default one per core)
+    :param int chunksize: Replays handed to a worker at a time
+    :return: (path, result, error) per replay, in completion order; error is None on success
+    :rtype: iterator[(str, object, str)]
+    """
+    with multiprocessing.Pool(processes) as pool:
+        for item in pool.imap_unordered(_apply, [(function, path) for path in paths], chunksize):
+            yield item
+
+
+def find_replays(directory):
+    """
+    :param str directory: Directory searched recursively
+    :return: The .hlt files in it, compressed or not
+    :rtype: list[str]
+    """
+    return sorted(glob.glob(os.path.join(directory, '**', '*.hlt*'), recursive=True))
+
+
+def write_tables(output, paths, summaries):
+    """
+    Concatenate per-replay rows into columns and save each table.
+
+    :param str output: Directory to write to
+    :param list[str] paths: Replay files, in the order their index is stored in the 'replay' column
+    :param dict[str, dict] summaries: summarize_replay output by path
+    :return: nothing
+    """
+    os.makedirs(output, exist_ok=True)
+    index = dict((path, i) for i, path in enumerate(paths))
+    for table, columns in TABLES.items():
+        rows = [(index[path],) + row for path, summary in summaries.items() for row in summary[table]]
+        data = dict((column, np.array([row[i] for row in rows])) for i, column in enumerate(columns))
+        data['replays'] = np.array(paths)
+        np.savez_compressed(os.path.join(output, table + '.npz'), **data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help="directory of .hlt replays (searched recursively)")
+    parser.add_argument('--output', default='replay_stats', help="directory for the .npz tables")
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    paths = find_replays(args.directory)
+    summaries = {}
+    for count, (path, summary, error) in enumerate(map_replays(summarize_replay, paths, args.processes), 1):
+        if error:
+            print("Skipping {}: {}".format(path, error))
+        else:
+            summaries[path] = summary
+        if count % 100 == 0:
+            print("{}/{} replays".format(count, len(paths)))
+    write_tables(args.output, [path for path in paths if path in summaries], summaries)
+    print("{} replays summarized into {}".format(len(summaries), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import hlt
+import local_engine
+from hlt import constants
+
+
+def make_map(mine, enemies, width=160, height=100):
+    state = local_engine.GameState(width, height, 2)
+    state.ships.clear()
+    state.planets.clear()
+    for x, y in mine:
+        state.add_ship(0, x, y)
+    for x, y in enemies:
+        state.add_ship(1, x, y)
+    game_map = hlt.game_map.Map(0, width, height)
+    game_map._parse(state.frame())
+    return game_map, state
+
+
+def test_one_ship_threat_footprint():
+    # reach is weapon range between the hulls plus a move: 5 + 2 * 0.5 + 7 = 13, measured to cell centres
+    influence = make_map([], [(50.5, 50.5)])[0].get_influence()
+    assert influence.reach == 13
+    assert influence.threat[50, 63] == 1
+    assert influence.threat[50, 64] == 0
+    assert influence.threat[62, 55] == 1  # 12, 5, 13
+    assert influence.threat[62, 56] == 0
+    assert influence.threat[37, 50] == 1
+    assert influence.threat[36, 50] == 0
+    inside = sum(1 for dx in range(-13, 14) for dy in range(-13, 14) if dx * dx + dy * dy <= 169)
+    assert influence.threat.sum() == inside
+    assert not influence.support.any()
+    # no ship of ours in range, so the enemy's whole shot lands wherever we stand in its reach
+    assert influence.damage[50, 50] == constants.WEAPON_DAMAGE
+
+
+def test_docked_and_cooling_ships_are_unarmed():
+    game_map = make_map([], [(50.5, 50.5), (80.5, 50.5)])[0]
+    docked, cooling = game_map.get_player(1).all_ships()
+    docked.docking_status = hlt.entity.Ship.DockingStatus.DOCKED
+    cooling._weapon_cooldown = 1
+    assert not game_map.get_influence().threat.any()
+
+
+def test_damage_is_split_over_the_ships_each_enemy_reaches():
+    # A is within reach plus our move (20) of both our ships, B of the second only
+    mine = [(40.5, 50.5), (70.5, 50.5)]
+    a, b = (55.5, 50.5), (80.5, 50.5)
+    influence = make_map(mine, [a, b])[0].get_influence()
+    half = constants.WEAPON_DAMAGE / 2
+    assert influence.damage[50, 60] == half  # A only
+    assert influence.damage[50, 90] == constants.WEAPON_DAMAGE  # B only
+    assert influence.damage[50, 68] == half + constants.WEAPON_DAMAGE  # both
+    assert influence.threat[50, 68] == 2
+    assert influence.damage[50, 20] == 0
+    assert influence.support[50, 40] == 1
+    assert influence.support[50, 55] == 0  # 15 from both
+    assert influence.support.max() == 1
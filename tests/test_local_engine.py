@@ -0,0 +1,41 @@
+import math
+import local_engine
+from hlt import constants
+
+
+def layout(state):
+    return sorted((round(planet.x, 3), round(planet.y, 3), round(planet.radius, 3)) for planet in state.planets.values())
+
+
+def test_layouts_are_symmetric_and_vary_with_the_seed():
+    for players in (2, 4):
+        layouts = set()
+        for seed in range(20):
+            state = local_engine.GameState(240, 160, players, seed)
+            planets = layout(state)
+            assert len(planets) >= 4
+            # every planet has its mirror images for the other players
+            for x, y, radius in planets:
+                for mx, my in state._mirrors(x, y):
+                    assert any(math.hypot(mx - px, my - py) < 1e-2 and abs(radius - pr) < 1e-2
+                               for px, py, pr in planets)
+            centre = state.planets[0]
+            assert math.hypot(centre.x - 120, centre.y - 80) > centre.radius
+            layouts.add(tuple(planets))
+        assert len(layouts) == 20
+
+
+def test_starting_ships_survive_the_first_turn():
+    for players in (2, 4):
+        for seed in range(10):
+            state = local_engine.GameState(240, 160, players, seed)
+            ships = list(state.ships.values())
+            for a in ships:
+                for b in ships:
+                    if a is not b:
+                        assert math.hypot(a.x - b.x, a.y - b.y) >= local_engine.START_SPACING
+            # the whole fleet flying the same way at full speed
+            commands = dict((player, [('t', ship.id, [int(constants.MAX_SPEED), 0])
+                                      for ship in ships if ship.owner == player]) for player in range(players))
+            state.step(commands)
+            assert len(state.ships) == len(ships)
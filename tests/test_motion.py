@@ -0,0 +1,56 @@
+import numpy as np
+
+import hlt
+import local_engine
+from benchmark import make_frames, parse_map
+
+
+def test_constant_velocity_ship_is_extrapolated():
+    state = local_engine.GameState(160, 100, 2)
+    state.ships.clear()
+    state.planets.clear()
+    mover = state.add_ship(1, 40, 50)
+    still = state.add_ship(1, 100, 20)
+    state.add_ship(0, 10, 90)
+    game_map = hlt.game_map.Map(0, 160, 100)
+    for _ in range(2):
+        game_map._parse(state.frame())
+        mover.x += 3
+        mover.y -= 4
+    # the second frame has the ship at (43, 46), after a move of (3, -4)
+    ship = game_map.get_player(1).get_ship(mover.id)
+    assert np.allclose(game_map.get_velocity(ship), (3, -4))
+    assert np.allclose(game_map.predict_positions(2, [ship]), [(49, 38)])
+    other = game_map.get_player(1).get_ship(still.id)
+    assert np.allclose(game_map.predict_positions(np.array([1, 2]), [ship, other]),
+                       [[(46, 42), (49, 38)], [(100, 20), (100, 20)]])
+
+
+def test_benchmark_frames_fill_the_motion_history():
+    game_map = parse_map(make_frames(240, 160, 2, 100, seed=0), 240, 160)
+    moving = [ship for ship in game_map._all_ships() if any(game_map.get_velocity(ship))]
+    assert moving
+    assert all(ship.docking_status == ship.DockingStatus.UNDOCKED for ship in moving)
+
+
+def test_first_turn_repeating_the_initial_frame_is_not_a_step():
+    state = local_engine.GameState(160, 100, 2)
+    state.ships.clear()
+    state.planets.clear()
+    mover = state.add_ship(1, 40, 50)
+    state.add_ship(0, 10, 90)
+    engine = hlt.QueueTransport()
+    # the initial map, then turn 1 on the same positions, then turn 2 after one move
+    for line in ("0", "160 100", state.frame(), state.frame()):
+        engine.send(line)
+        engine.done_sending()
+    game = hlt.Game("motion", transport=engine.peer(), log=False)
+    game.update_map()
+    game.send_command_queue([])
+    mover.x += 6
+    engine.send(state.frame())
+    engine.done_sending()
+    game_map = game.update_map()
+    ship = game_map.get_player(1).get_ship(mover.id)
+    assert np.allclose(game_map.get_velocity(ship), (6, 0))
+    assert np.allclose(game_map.predict_positions(1, [ship]), [(52, 50)])
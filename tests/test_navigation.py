@@ -0,0 +1,241 @@
+import math
+import time
+
+import numpy as np
+import pytest
+import Navigation
+from Navigation import OccupancyGrid, OccupancyLayer
+
+
+class Circle:
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+
+def brute_force_clearance(obstacles):
+    ys, xs = np.mgrid[0:obstacles.shape[0], 0:obstacles.shape[1]]
+    oy, ox = np.nonzero(obstacles)
+    return np.sqrt(((xs[..., None] - ox) ** 2 + (ys[..., None] - oy) ** 2).min(axis=2))
+
+
+def test_margin_up_to_max_clearance_is_exact():
+    grid = OccupancyGrid(60, 50)
+    grid.set_layer(OccupancyLayer.ENEMY_SHIPS, [Circle(10, 10, 0.5)])
+    reference = brute_force_clearance(grid.get_mask((OccupancyLayer.ENEMY_SHIPS,)))
+    mask = grid.get_mask_with_margins({OccupancyLayer.ENEMY_SHIPS: OccupancyGrid.MAX_CLEARANCE})
+    assert np.array_equal(mask, reference <= OccupancyGrid.MAX_CLEARANCE)
+    assert not mask.all()
+
+
+def test_margin_beyond_max_clearance_raises():
+    grid = OccupancyGrid(60, 50)
+    grid.set_layer(OccupancyLayer.ENEMY_SHIPS, [Circle(10, 10, 0.5)])
+    with pytest.raises(ValueError):
+        grid.get_mask_with_margins({OccupancyLayer.ENEMY_SHIPS: OccupancyGrid.MAX_CLEARANCE + 1})
+    with pytest.raises(ValueError):
+        grid.get_mask_for_obstacle_type(Navigation.PlanObstacleType.ALL, OccupancyGrid.MAX_CLEARANCE + 0.5)
+
+
+def path_cost(path, scene):
+    return sum(scene.step_cost(x, y) for x, y in path[1:])
+
+
+def test_cost_layer_steers_every_planner_the_same_way():
+    width, height = 30, 20
+    grid = np.zeros((height, width), dtype=bool)
+    # an expensive band across the straight line, which is cheaper to go around than through
+    cost = np.zeros((height, width), dtype=np.float32)
+    cost[5:16, 15] = 50
+    start, goal = (2, 10), (27, 10)
+    planner = Navigation.PathPlanner(None, occupancy=OccupancyGrid(width, height))
+
+    free = planner.find_path(start, goal, Navigation.ObstacleMask(grid))
+    assert (15, 10) in free
+
+    scene = Navigation.ObstacleMask(grid, cost=cost)
+    a_star = planner.find_path(start, goal, scene)
+    ara_star = Navigation.AnytimePlanner().find_path(start, goal, scene, Navigation.INF)
+    d_star = Navigation.DStarLite(goal, scene).plan(start, scene)
+    for path in (a_star, ara_star, d_star):
+        assert path[0] == start and path[-1] == goal
+        assert all(cost[y, x] == 0 for x, y in path)
+        assert path_cost(path, scene) == path_cost(a_star, scene)
+    # the detour is longer than the straight line
+    assert path_cost(a_star, scene) > len(free) - 1
+
+
+def test_d_star_lite_repairs_around_a_new_cost():
+    width, height = 30, 20
+    grid = np.zeros((height, width), dtype=bool)
+    start, goal = (2, 10), (27, 10)
+    search = Navigation.DStarLite(goal, Navigation.ObstacleMask(grid))
+    assert (15, 10) in search.plan(start, Navigation.ObstacleMask(grid))
+
+    cost = np.zeros((height, width), dtype=np.float32)
+    cost[5:16, 15] = 50
+    scene = Navigation.ObstacleMask(grid, cost=cost)
+    repaired = search.plan(start, scene)
+    fresh = Navigation.DStarLite(goal, scene).plan(start, scene)
+    assert all(cost[y, x] == 0 for x, y in repaired)
+    assert path_cost(repaired, scene) == path_cost(fresh, scene)
+
+
+def test_shortcuts_under_a_cost_layer_go_both_ways():
+    width, height = 30, 20
+    grid = np.zeros((height, width), dtype=bool)
+    scene = Navigation.ObstacleMask(grid, cost=np.full((height, width), 0.5, dtype=np.float32))
+    planner = Navigation.PathPlanner(None, occupancy=OccupancyGrid(width, height))
+    for start, goal in (((2, 10), (12, 10)), ((12, 10), (2, 10))):
+        path = planner.find_path(start, goal, scene)
+        assert planner.find_longest_line(path, scene) == (start, goal)
+
+
+def test_incremental_search_past_its_deadline_falls_back_and_resumes():
+    width, height = 240, 160
+    grid = np.zeros((height, width), dtype=bool)
+    grid[10:150, 120] = True
+    start, goal = (5, 80), (235, 80)
+    scene = Navigation.ObstacleMask(grid)
+    incremental = Navigation.IncrementalPlanner()
+
+    started = time.time()
+    partial = incremental.find_path(1, start, goal, scene, deadline=started)
+    assert time.time() - started < 0.1
+    search = incremental.searches[1][0]
+    assert not search.complete
+    # ARA*'s best effort from the start towards the goal
+    assert partial[0] == start and partial[-1] != goal
+
+    # the same tree is finished on the next call
+    expanded = search.expansions
+    full = incremental.find_path(1, start, goal, scene)
+    assert incremental.searches[1][0] is search and search.complete
+    assert search.expansions > expanded
+    reference = Navigation.PathPlanner(None, occupancy=OccupancyGrid(width, height)).find_path(start, goal, scene)
+    assert full[0] == start and full[-1] == goal
+    assert len(full) == len(reference)
+
+
+def test_d_star_lite_repair_matches_a_fresh_search_for_less_work():
+    width, height = 240, 160
+    grid = np.zeros((height, width), dtype=bool)
+    grid[10:150, 120] = True
+    start, goal = (5, 80), (235, 80)
+    search = Navigation.DStarLite(goal, Navigation.ObstacleMask(grid))
+    search.plan(start, Navigation.ObstacleMask(grid))
+
+    # a wall appears across the current path, then the first one opens up, while the ship moves on
+    changes = [((slice(60, 100), 60), True), ((slice(70, 90), 120), False)]
+    for (rows, col), blocked in changes:
+        grid = grid.copy()
+        grid[rows, col] = blocked
+        start = (start[0] + 2, start[1])
+        scene = Navigation.ObstacleMask(grid)
+        expanded = search.expansions
+        repaired = search.plan(start, scene)
+        fresh_search = Navigation.DStarLite(goal, scene)
+        fresh = fresh_search.plan(start, scene)
+        assert repaired[0] == start and repaired[-1] == goal
+        assert not any(grid[y, x] for x, y in repaired)
+        assert len(repaired) == len(fresh)
+        assert search.expansions - expanded < fresh_search.expansions
+
+
+class FleetMap:
+    def __init__(self, ships):
+        self.ships = ships
+
+    def get_me(self):
+        return self
+
+    def all_ships(self):
+        return self.ships
+
+
+def assert_no_collisions(paths, window):
+    # ships that arrive early hold their last cell, as the reservation table has them
+    held = dict((ship_id, path + [path[-1]] * (window + 1 - len(path))) for ship_id, path in paths.items())
+    for t in range(window + 1):
+        cells = [path[t] for path in held.values()]
+        assert len(set(cells)) == len(cells)
+        if t:
+            moves = set((path[t - 1], path[t]) for path in held.values() if path[t - 1] != path[t])
+            assert not any((b, a) in moves for a, b in moves)
+
+
+def test_cooperative_fleet_crossing_paths_never_share_a_cell():
+    scene = Navigation.ObstacleMask(np.zeros((11, 11), dtype=bool))
+    planner = Navigation.CooperativePlanner()
+    paths = planner.plan_fleet([1, 2], [(0, 5), (5, 0)], [(10, 5), (5, 10)], scene)
+    assert_no_collisions(paths, planner.window)
+    assert paths[1][-1] == (10, 5) and paths[2][-1] == (5, 10)
+
+
+def test_cooperative_fleet_head_on_ships_pass_without_swapping():
+    # a corridor three cells wide, the ships start facing each other on its middle row
+    grid = np.ones((11, 11), dtype=bool)
+    grid[4:7, :] = False
+    planner = Navigation.CooperativePlanner()
+    paths = planner.plan_fleet([1, 2], [(2, 5), (8, 5)], [(8, 5), (2, 5)], Navigation.ObstacleMask(grid))
+    assert_no_collisions(paths, planner.window)
+    assert paths[1][-1] == (8, 5) and paths[2][-1] == (2, 5)
+
+
+def test_cooperative_thrust_stays_off_the_obstacles_it_routed_around():
+    occupancy = OccupancyGrid(20, 20)
+    occupancy.set_layer(OccupancyLayer.PLANETS, [Circle(x, y, 0) for x in range(2, 5) for y in range(2, 5)])
+    grid = occupancy.get_mask((OccupancyLayer.PLANETS,))
+    ship = Navigation.TestShip(0, 0, 0.5)
+    planner = Navigation.PathPlanner(FleetMap([ship]), occupancy=occupancy)
+    # the first turn of the space-time path goes along the top of the block and ends at (6, 1), whose straight
+    # line from (0, 0) would clip the block's corner
+    path = planner.cooperative_planner.plan_fleet([ship.id], [(0, 0)], [(9, 3)], Navigation.ObstacleMask(grid))
+    assert path[ship.id][Navigation.MAX_SPEED] == (6, 1)
+    assert planner.does_line_intersect((0, 0), (6, 1), Navigation.ObstacleMask(grid))
+
+    _, _, speed, angle = planner.get_cooperative_nav_cmds([ship], [(9, 3)])[ship.id].split()
+    target = (int(round(int(speed) * math.cos(math.radians(int(angle))))),
+              int(round(int(speed) * math.sin(math.radians(int(angle))))))
+    assert target != (0, 0)
+    assert target in path[ship.id]
+    assert not planner.does_line_intersect((0, 0), target, Navigation.ObstacleMask(grid))
+
+
+def random_maze(seed=0, width=60, height=40, density=0.3):
+    grid = np.random.default_rng(seed).random((height, width)) < density
+    start, goal = (1, height // 2), (width - 2, height // 2)
+    grid[start[1], start[0]] = grid[goal[1], goal[0]] = False
+    return grid, start, goal
+
+
+def test_anytime_solutions_stay_within_epsilon_and_improve():
+    grid, start, goal = random_maze()
+    scene = Navigation.ObstacleMask(grid)
+    optimal = len(Navigation.PathPlanner(None, occupancy=OccupancyGrid(60, 40)).find_path(start, goal, scene)) - 1
+    planner = Navigation.AnytimePlanner()
+    path = planner.find_path(start, goal, scene, Navigation.INF)
+    assert [epsilon for epsilon, _ in planner.solutions] == [3.0, 2.0, 1.0]
+    for epsilon, cost in planner.solutions:
+        assert optimal <= cost <= epsilon * optimal
+    costs = [cost for _, cost in planner.solutions]
+    assert costs == sorted(costs, reverse=True)
+    # this maze's first, inflated solution is a real detour that the later passes shorten
+    assert costs[0] > costs[-1] == optimal
+    assert path[0] == start and path[-1] == goal and len(path) - 1 == optimal
+
+
+def test_anytime_search_out_of_time_returns_a_partial_path():
+    grid, start, goal = random_maze(width=240, height=160, density=0.2)
+    scene = Navigation.ObstacleMask(grid)
+    planner = Navigation.AnytimePlanner()
+    started = time.time()
+    path = planner.find_path(start, goal, scene, started)
+    assert time.time() - started < 0.1
+    assert not planner.solutions
+    # towards the goal, through free cells, as far as the search got
+    assert path[0] == start and path[-1] != goal
+    assert planner.heuristic(path[-1], goal) < planner.heuristic(start, goal)
+    assert not any(grid[y, x] for x, y in path)
+    assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
@@ -0,0 +1,86 @@
+import atexit
+import json
+
+import hlt
+import local_engine
+
+
+def start_game(name, state):
+    engine = hlt.QueueTransport()
+    for line in ("0", "{} {}".format(state.width, state.height), state.frame()):
+        engine.send(line)
+        engine.done_sending()
+    return hlt.Game(name, transport=engine.peer(), log=False), engine
+
+
+def test_games_in_one_process_keep_their_own_profilers():
+    state = local_engine.GameState(240, 160, 2, seed=0)
+    first, first_engine = start_game("first", state)
+    second, _ = start_game("second", state)
+    assert first.profiler is not second.profiler
+    assert first.map.profiler is first.profiler
+    first.profiler.enabled = True
+
+    first_engine.send(state.frame())
+    first_engine.done_sending()
+    first.update_map().get_influence()
+    first.send_command_queue([])
+    assert first.profiler.turns == 1
+    assert 'influence' in first.profiler.last_turn
+    assert second.profiler.turns == 0
+    assert not second.profiler.last_turn
+
+
+def test_turns_are_numbered_from_the_first_engine_turn(tmp_path, monkeypatch):
+    # the reports go to the working directory
+    monkeypatch.chdir(tmp_path)
+    state = local_engine.GameState(240, 160, 2, seed=0)
+    engine = hlt.QueueTransport()
+    for line in ("0", "{} {}".format(state.width, state.height), state.frame()):
+        engine.send(line)
+        engine.done_sending()
+    game = hlt.Game("numbered", profile=True, cprofile_turns=5, trace_memory=True, transport=engine.peer(), log=False)
+    # parsing the initial frame is not a turn
+    assert game.profiler.turns == 0
+    assert game.slow_turns.turn == 0
+    assert not game.memory.turns
+    try:
+        for _ in range(2):
+            engine.send(state.frame())
+            engine.done_sending()
+            game.update_map()
+            game.send_command_queue([])
+    finally:
+        game.slow_turns.end_turn()
+        game.memory.enabled = False
+        atexit.unregister(game.write_reports)
+    assert game.profiler.turns == 2
+    assert sorted(turn for _, turn, _ in game.slow_turns._slowest) == [1, 2]
+    assert [turn['turn'] for turn in game.memory.turns] == [1, 2]
+
+
+def test_reports_are_written_during_the_game(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hlt.Game, 'REPORT_EVERY', 2)
+    state = local_engine.GameState(240, 160, 2, seed=0)
+    engine = hlt.QueueTransport()
+    for line in ("0", "{} {}".format(state.width, state.height), state.frame()):
+        engine.send(line)
+        engine.done_sending()
+    game = hlt.Game("reports", profile=True, cprofile_turns=1, transport=engine.peer(), log=False)
+    atexit.unregister(game.write_reports)
+    for turn in range(1, 4):
+        engine.send(state.frame())
+        engine.done_sending()
+        game.update_map()
+        game.send_command_queue([])
+        if turn == 1:
+            assert not list(tmp_path.iterdir())
+    # written at turn 2, without the bot exiting
+    assert sorted(path.name for path in tmp_path.iterdir()) in (
+        ['0_reports.profile.json', '0_reports_turn1.prof'], ['0_reports.profile.json', '0_reports_turn2.prof'])
+    assert json.loads((tmp_path / '0_reports.profile.json').read_text())['turns'] == 2
+    game.write_reports()
+    # one slowest turn kept, so at most one profile on disk
+    assert len(list(tmp_path.glob('*.prof'))) == 1
+    assert json.loads((tmp_path / '0_reports.profile.json').read_text())['turns'] == 3
@@ -0,0 +1,50 @@
+from multiprocessing import shared_memory
+
+import pytest
+
+import hlt
+import Navigation
+from benchmark import make_frame
+
+
+@pytest.fixture(scope='module')
+def game_map():
+    game_map = hlt.game_map.Map(0, 120, 80)
+    game_map._parse(make_frame(120, 80, 2, 40, seed=2))
+    return game_map
+
+
+def batch(game_map):
+    ships = [ship for ship in game_map.get_me().all_ships()
+             if ship.docking_status == ship.DockingStatus.UNDOCKED]
+    planets = game_map.all_planets()
+    destinations = [ship.closest_point_to(planets[i % len(planets)]) for i, ship in enumerate(ships)]
+    return ships, destinations
+
+
+@pytest.mark.parametrize('margin', [0, 2])
+@pytest.mark.parametrize('simplify', [False, True])
+def test_pool_plans_what_the_sequential_planner_does(game_map, margin, simplify):
+    ships, destinations = batch(game_map)
+    assert len(ships) >= 10
+    sequential = Navigation.PathPlanner(game_map).plan_many(ships, destinations, simplify=simplify, margin=margin)
+    pool = Navigation.PlanningPool(game_map.width, game_map.height, processes=2, min_batch=1)
+    try:
+        pooled = Navigation.PathPlanner(game_map, planning_pool=pool).plan_many(ships, destinations,
+                                                                                 simplify=simplify, margin=margin)
+    finally:
+        pool.close()
+    assert pooled == sequential
+    assert sum(1 for path in sequential.values() if path) >= len(ships) // 2
+
+
+def test_pool_releases_its_shared_memory_on_close():
+    pool = Navigation.PlanningPool(40, 30, processes=1)
+    name = pool.shm.name
+    shared_memory.SharedMemory(name=name).close()
+    pool.close()
+    assert pool.pool is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+    # closing twice (the atexit hook after an explicit close) is fine
+    pool.close()
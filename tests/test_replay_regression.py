@@ -0,0 +1,31 @@
+import local_engine
+import replay
+import replay_regression
+import tournament
+from hlt.profiling import TurnProfiler
+
+
+def test_no_deadline_replays_are_repeatable(tmp_path):
+    path = str(tmp_path / 'game.hlt')
+    bots = [tournament.in_process_bot('v3'), tournament.in_process_bot('v3')]
+    local_engine.LocalEngine(bots, seed=3, max_turns=15, replay_path=path).run()
+    game = replay.load_replay(path)
+    make_turn = replay_regression.TURN_FUNCTIONS['MyBot']
+    runs = [replay_regression.replay_bot(game, make_turn, 0, no_deadline=True) for _ in range(2)]
+    assert len(runs[0]) == 15
+    assert [record['commands'] for record in runs[0]] == [record['commands'] for record in runs[1]]
+    assert not replay_regression.diff_runs(*runs)['turns_changed']
+
+
+def test_summary_counts_turns_without_a_phase_as_zero():
+    profiler = TurnProfiler(enabled=True)
+    records = []
+    for turn, phases in enumerate(({'strategy': 0.3, 'navigation': 0.2}, {'strategy': 0.1}, {'strategy': 0.2})):
+        profiler.start_turn()
+        profiler._phase_totals.update(phases)
+        profiler.end_turn()
+        records.append({'turn': turn + 1, 'latency': 0.5, 'phases': phases, 'commands': []})
+    summary = replay_regression.summarize(records)
+    expected = profiler.summary()['phases']
+    assert summary['phases']['navigation'] == expected['navigation'] == {'p50': 0.0, 'p95': 0.2, 'max': 0.2}
+    assert summary['phases']['strategy'] == expected['strategy']
@@ -0,0 +1,95 @@
+import logging
+import random
+import time
+import hlt
+import local_engine
+import MyBot
+from benchmark import make_frame
+
+logging.disable(logging.CRITICAL)
+
+
+def parse(frame, width, height, my_id=0):
+    game_map = hlt.game_map.Map(my_id, width, height)
+    game_map._parse(frame)
+    return game_map
+
+
+def play_turns(state, turns):
+    # MyBot plays player 0 of the engine state, everyone else stands still
+    random.seed(0)
+    swarm = MyBot.SwarmMaster()
+    for turn in range(1, turns + 1):
+        game_map = parse(state.frame(), state.width, state.height)
+        commands = swarm.update_swarm(game_map, turn, time.time())
+        yield swarm, commands
+        state.step({0: local_engine.parse_commands(''.join(commands))})
+
+
+def test_new_ships_get_planets():
+    state = local_engine.GameState(240, 160, 2, seed=1)
+    for swarm, commands in play_turns(state, 3):
+        ships = list(swarm.active_ships.values())
+        assert ships
+        assert all(actionShip.target_planet for actionShip in ships)
+        assert all(actionShip.action in (MyBot.ActionType.DIVIDE, MyBot.ActionType.FORTIFY) for actionShip in ships)
+        assert all(commands)
+
+
+def test_large_fleet_gets_planets():
+    frame = make_frame(240, 160, 2, 300, seed=0)
+    random.seed(0)
+    swarm = MyBot.SwarmMaster()
+    for turn in range(1, 4):
+        swarm.update_swarm(parse(frame, 240, 160), turn, time.time())
+        assigned = [actionShip for actionShip in swarm.active_ships.values() if actionShip.target_planet]
+        assert assigned
+        # a slot per ship at most
+        for planet in set(actionShip.target_planet for actionShip in assigned):
+            taking = sum(actionShip.target_planet is planet for actionShip in assigned)
+            assert taking <= swarm.planet_index.open_spots[planet.id]
+
+
+def test_fortify_also_takes_free_planets():
+    state = local_engine.GameState(240, 160, 2, seed=1)
+    game_map = parse(state.frame(), state.width, state.height)
+    swarm = MyBot.SwarmMaster()
+    swarm.update_ship_list(game_map)
+    for actionShip in swarm.active_ships.values():
+        actionShip.set_action(MyBot.ActionType.FORTIFY)
+    # nothing of ours is docked yet, so only free planets are left to fortify
+    swarm.assign_planets(MyBot.PlanetIndex(game_map))
+    assert all(actionShip.target_planet and not actionShip.target_planet.is_owned()
+               for actionShip in swarm.active_ships.values())
+
+
+def test_late_ships_all_get_moves():
+    frame = make_frame(240, 160, 2, 300, seed=0)
+    game_map = parse(frame, 240, 160)
+    random.seed(0)
+    swarm = MyBot.SwarmMaster()
+    swarm.update_ship_list(game_map)
+    # half the fleet without a planet to fly to
+    for i, actionShip in enumerate(swarm.active_ships.values()):
+        actionShip.set_action(MyBot.ActionType.ATTACK if i % 2 else MyBot.ActionType.DIVIDE)
+    commands = swarm.update_swarm(game_map, 1, time.time() - MyBot.SwarmMaster.TIME_LIMIT)
+    assert len(commands) == len(swarm.active_ships)
+    assert all(commands)
+
+
+def test_scheduler_forgets_dead_ships():
+    state = local_engine.GameState(240, 160, 2, seed=1)
+    game_map = parse(state.frame(), state.width, state.height)
+    swarm = MyBot.SwarmMaster()
+    swarm.update_swarm(game_map, 1, time.time())
+    scheduler = swarm.scheduler
+    ships = list(swarm.active_ships.values())
+    for actionShip in ships:
+        scheduler.record(actionShip, 0.001, '')
+    assert scheduler.idle_ids == set(actionShip.get_id() for actionShip in ships)
+
+    scheduler.rank(ships[1:], game_map)
+    assert scheduler.idle_ids == set(actionShip.get_id() for actionShip in ships[1:])
+    assert set(scheduler.cost) == scheduler.idle_ids
+    scheduler.rank([], game_map)
+    assert not scheduler.idle_ids and not scheduler.cost
@@ -0,0 +1,266 @@
+"""
+Self-play tournament between the bot variants in this directory, played on the local engine stand-in.
+
+Games are seeded (map size and layout follow from the tournament seed and game number), spread over a process pool,
+and appended to a results file as they finish, so an interrupted tournament picks up where it stopped when run again
+with the same arguments.
+
+Example:
+    python3 tournament.py --games 200 --bots MyBot v3 starter --results results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import hlt
+import local_engine
+import replay_regression
+
+#: Bot name -> script, for every bot variant kept in the repo
+BOTS = {
+    'MyBot': 'MyBot.py',
+    'v3': 'MyBot_v3.py',
+    'v3-1_failed': 'MyBot_v3-1_failed.py',
+    'starter': 'MyBot_starter.py',
+    'nav_test': 'MyBot_starter_nav_test.py',
+}
+
+#: Bots that can also run inside the engine's process (the starter bots run their game loop at module level)
+IN_PROCESS_BOTS = sorted(replay_regression.TURN_FUNCTIONS)
+
+#: Map sizes the real engine picks from
+MAP_SIZES = [(240, 160), (264, 176), (288, 192), (312, 208), (336, 224), (360, 240), (384, 256)]
+
+
+def schedule(bots, games, players=2, seed=0):
+    """
+    Lay out the games of a tournament. Line-ups cycle through every ordered pick of bots, so each bot plays every
+    seat against every opponent equally often.
+
+    :param list[str] bots: Names of the bots taking part
+    :param int games: Number of games
+    :param int players: Bots per game (2 or 4)
+    :param int seed: Tournament seed
+    :return: One spec per game: game id, line-up, map size and map seed
+    :rtype: list[dict]
+    """
+    rng = random.Random(seed)
+    if len(bots) >= players:
+        lineups = list(itertools.permutations(bots, players))
+    else:
+        lineups = list(itertools.product(bots, repeat=players))
+    rng.shuffle(lineups)
+    specs = []
+    for game_id in range(games):
+        width, height = rng.choice(MAP_SIZES)
+        specs.append({
+            'game_id': game_id,
+            'bots': list(lineups[game_id % len(lineups)]),
+            'width': width,
+            'height': height,
+            'seed': rng.randrange(2 ** 31),
+        })
+    return specs
+
+
+def in_process_bot(name):
+    """
+    Wrap a bot's turn function (from replay_regression.TURN_FUNCTIONS) so the local engine can run it in a thread.
+    Each call loads a fresh copy of the bot's module, so bots in the same game don't share class-level state.
+
+    :param str name: The bot
+    :return: The bot's game loop, taking the transport to play over
+    """
+    make_turn = replay_regression.TURN_FUNCTIONS[name]
+
+    def bot(transport):
+        game = hlt.Game(name, transport=transport, log=False)
+        turn_function = make_turn(game.map)
+        turn = 0
+        while True:
+            game_map = game.update_map()
+            turn += 1
+            commands = turn_function(game_map, turn, time.time())
+            game.send_command_queue([command for command in commands or [] if command])
+    return bot
+
+
+def play_game(spec, max_turns=None, turn_timeout=local_engine.TURN_TIMEOUT, replay_dir=None, in_process=False):
+    """
+    Play one scheduled game in a scratch directory (the bots' logs are thrown away with it).
+
+    :param dict spec: A game from schedule(), optionally with 'env': extra environment variables for each seat
+    :param int max_turns: Turn limit override
+    :param float turn_timeout: Seconds each bot gets per turn
+    :param str replay_dir: Keep a replay of the game here
+    :param bool in_process: Run the bots in threads of this process (only bots in IN_PROCESS_BOTS, without 'env')
+    :return: The spec plus the engine's result
+    :rtype: dict
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    if in_process:
+        commands = [in_process_bot(name) for name in spec['bots']]
+    else:
+        commands = [[sys.executable, os.path.join(here, BOTS[name])] for name in spec['bots']]
+    replay_path = None
+    if replay_dir:
+        replay_path = os.path.join(replay_dir, "game_{}.hlt.gz".format(spec['game_id']))
+    with tempfile.TemporaryDirectory(prefix='halite_game_') as cwd:
+        engine = local_engine.LocalEngine(commands, spec['width'], spec['height'], spec['seed'],
+                                          max_turns=max_turns, turn_timeout=turn_timeout, cwd=cwd,
+                                          replay_path=replay_path, bot_envs=spec.get('env'))
+        result = engine.run()
+    for player, name in zip(result['players'], spec['bots']):
+        player['bot'] = name
+        player['latencies'] = [round(latency, 5) for latency in player['latencies']]
+    result.update(spec)
+    return result
+
+
+def _play_game_star(args):
+    return play_game(*args)
+
+
+def load_results(path):
+    """
+    Read the games already played. A truncated last line (from an interrupted run) is ignored.
+
+    :param str path: Results file
+    :return: Results by game id
+    :rtype: dict[int, dict]
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result['game_id']] = result
+    return results
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results):
+    """
+    :param iterable[dict] results: Game results
+    :return: Per bot: games, wins, win rate, mean rank, turn latency p50/p95/p99/max (seconds) and timeouts
+    :rtype: dict[str, dict]
+    """
+    stats = {}
+    for result in results:
+        for player in result['players']:
+            bot = stats.setdefault(player['bot'], {'games': 0, 'wins': 0, 'rank_total': 0, 'timeouts': 0,
+                                                   'latencies': []})
+            bot['games'] += 1
+            bot['wins'] += player['rank'] == 1
+            bot['rank_total'] += player['rank']
+            bot['timeouts'] += player['timed_out'] is not None
+            bot['latencies'].extend(player['latencies'])
+    summary = {}
+    for name, bot in stats.items():
+        ordered = sorted(bot['latencies'])
+        summary[name] = {
+            'games': bot['games'],
+            'wins': bot['wins'],
+            'win_rate': bot['wins'] / bot['games'],
+            'mean_rank': bot['rank_total'] / bot['games'],
+            'latency_p50': _percentile(ordered, 0.5),
+            'latency_p95': _percentile(ordered, 0.95),
+            'latency_p99': _percentile(ordered, 0.99),
+            'latency_max': ordered[-1] if ordered else 0.0,
+            'timeouts': bot['timeouts'],
+        }
+    return summary
+
+
+def print_summary(summary):
+    print("{:<12} {:>6} {:>6} {:>6} {:>8} {:>8} {:>8} {:>8}".format(
+        'bot', 'games', 'win%', 'rank', 'p50 ms', 'p95 ms', 'max ms', 'timeouts'))
+    for name, bot in sorted(summary.items(), key=lambda item: item[1]['win_rate'], reverse=True):
+        print("{:<12} {:>6} {:>6.1f} {:>6.2f} {:>8.1f} {:>8.1f} {:>8.1f} {:>8}".format(
+            name, bot['games'], 100 * bot['win_rate'], bot['mean_rank'], 1000 * bot['latency_p50'],
+            1000 * bot['latency_p95'], 1000 * bot['latency_max'], bot['timeouts']))
+
+
+def run_tournament(specs, results_path, processes=None, max_turns=None, turn_timeout=local_engine.TURN_TIMEOUT,
+                   replay_dir=None, in_process=False):
+    """
+    Play every scheduled game that isn't in the results file yet, appending results as games finish.
+
+    :param list[dict] specs: Games from schedule()
+    :param str results_path: Results file (JSON lines)
+    :param int processes: Games played at once (defaults to one per free core per bot in a game)
+    :param int max_turns: Turn limit override
+    :param float turn_timeout: Seconds each bot gets per turn
+    :param str replay_dir: Keep replays of the games here
+    :param bool in_process: Run each game's bots in threads of its worker instead of as bot processes
+    :return: Results of all scheduled games
+    :rtype: list[dict]
+    """
+    done = load_results(results_path)
+    pending = [spec for spec in specs if spec['game_id'] not in done]
+    if pending:
+        # every game runs its bots in parallel, so leave a core per bot or they start timing out; in-process bots take
+        # turns on their worker's core
+        players = 1 if in_process else len(pending[0]['bots'])
+        processes = processes or max(1, multiprocessing.cpu_count() // players)
+        print("Playing {} games ({} already done) on {} processes".format(len(pending), len(done), processes))
+        if replay_dir:
+            os.makedirs(replay_dir, exist_ok=True)
+        tasks = [(spec, max_turns, turn_timeout, replay_dir, in_process) for spec in pending]
+        with open(results_path, 'a') as f, multiprocessing.Pool(processes) as pool:
+            for count, result in enumerate(pool.imap_unordered(_play_game_star, tasks), 1):
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                done[result['game_id']] = result
+                winner = min(result['players'], key=lambda player: player['rank'])['bot']
+                print("[{}/{}] game {}: {} won after {} turns".format(
+                    count, len(pending), result['game_id'], winner, result['turns']))
+    return [done[spec['game_id']] for spec in specs if spec['game_id'] in done]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bots', nargs='+', default=sorted(BOTS), choices=sorted(BOTS))
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', type=int, default=2, choices=(2, 4))
+    parser.add_argument('--seed', type=int, default=0, help="tournament seed (maps and line-ups)")
+    parser.add_argument('--processes', type=int, default=None, help="games played at once")
+    parser.add_argument('--max-turns', type=int, default=None, help="override the map's turn limit")
+    parser.add_argument('--turn-timeout', type=float, default=local_engine.TURN_TIMEOUT)
+    parser.add_argument('--results', default='tournament_results.jsonl', help="results file, reused to resume")
+    parser.add_argument('--summary', default=None, help="also write the summary here as JSON")
+    parser.add_argument('--replays', default=None, help="keep a replay of every game in this directory")
+    parser.add_argument('--in-process', action='store_true',
+                        help="run the bots in threads of the game's worker, skipping bot processes and pipes ({})".format(
+                            ", ".join(IN_PROCESS_BOTS)))
+    args = parser.parse_args()
+    if args.in_process and set(args.bots) - set(IN_PROCESS_BOTS):
+        parser.error("--in-process only works with {}".format(", ".join(IN_PROCESS_BOTS)))
+
+    specs = schedule(args.bots, args.games, args.players, args.seed)
+    results = run_tournament(specs, args.results, args.processes, args.max_turns, args.turn_timeout,
+                             args.replays, args.in_process)
+    summary = summarize(results)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
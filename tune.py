@@ -0,0 +1,205 @@
+"""
+Tune MyBot's strategy constants with successive halving over seeded games on the local engine stand-in.
+
+Candidate parameter sets are sampled from a search space (the current defaults are always candidate 0). Every round,
+each surviving candidate plays the same seeded games against the opponent bots on a process pool; candidates are
+ranked by win rate, then timeouts, then p95 turn latency, and only the best 1/eta go on to a round with eta times as
+many games. The bot picks its parameters up from the BAUCOMBOT_CONFIG file it is started with.
+
+The search space is JSON mapping a parameter (see MyBot.TUNABLE_PARAMETERS) to a list of values to pick from or to
+{"min": ..., "max": ...} for a uniform range (whole numbers for integer parameters). Unlisted parameters keep their
+defaults.
+
+Example:
+    python3 tune.py --configs 27 --games 4 --eta 3 --max-turns 150 --output tuning.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import local_engine
+import tournament
+import MyBot
+
+DEFAULT_SPACE = {
+    'divide_prob': {'min': 0.3, 'max': 0.95},
+    'attack_prob': {'min': 0.3, 'max': 0.95},
+    'defend_radius': {'min': 10, 'max': 40},
+    'time_limit': [1.25, 1.5, 1.75],
+    'max_corrections': [30, 60, 90],
+    'angular_step': [1, 2, 3, 5],
+}
+
+
+def sample_configs(space, count, seed=0):
+    """
+    :param dict space: Search space
+    :param int count: Number of candidates, including the defaults
+    :param int seed: Sampling seed
+    :return: Parameter sets, the current defaults first
+    :rtype: list[dict]
+    """
+    rng = random.Random(seed)
+    defaults = MyBot.get_parameters()
+    configs = [defaults]
+    while len(configs) < count:
+        config = dict(defaults)
+        for key, choices in space.items():
+            if key not in defaults:
+                raise ValueError("Unknown bot parameter {}".format(key))
+            if isinstance(choices, dict):
+                if isinstance(defaults[key], int):
+                    config[key] = rng.randint(int(choices['min']), int(choices['max']))
+                else:
+                    config[key] = round(rng.uniform(choices['min'], choices['max']), 3)
+            else:
+                config[key] = rng.choice(choices)
+        configs.append(config)
+    return configs
+
+
+def _round_games(games, opponents, rng):
+    # every candidate plays the same games, so a round compares them on equal footing
+    lineup = []
+    for game in range(games):
+        width, height = rng.choice(tournament.MAP_SIZES)
+        lineup.append({'opponent': opponents[game % len(opponents)], 'seat': game % 2, 'width': width,
+                       'height': height, 'seed': rng.randrange(2 ** 31)})
+    return lineup
+
+
+def _rank_key(stats):
+    return (-stats['win_rate'], stats['timeouts'], stats['latency_p95'])
+
+
+def _summarize(record):
+    ordered = sorted(record['latencies'])
+    return {
+        'games': record['games'],
+        'win_rate': record['wins'] / record['games'] if record['games'] else 0.0,
+        'timeouts': record['timeouts'],
+        'latency_p50': tournament._percentile(ordered, 0.5),
+        'latency_p95': tournament._percentile(ordered, 0.95),
+    }
+
+
+def successive_halving(configs, opponents, games, eta=3, processes=None, max_turns=None,
+                       turn_timeout=local_engine.TURN_TIMEOUT, workdir=None, seed=0):
+    """
+    :param list[dict] configs: Candidate parameter sets
+    :param list[str] opponents: Bots (tournament.BOTS names) to play against
+    :param int games: Games per candidate in the first round
+    :param int eta: Keep 1/eta of the candidates per round, and play eta times as many games
+    :param int processes: Games played at once (defaults to one per two cores)
+    :param int max_turns: Turn limit override
+    :param float turn_timeout: Seconds each bot gets per turn
+    :param str workdir: Where the candidates' config files go (default a temporary directory)
+    :param int seed: Seed for the games
+    :return: Stats per candidate (cumulative over the rounds it played) and the survivors of each round
+    :rtype: (list[dict], list[list[int]])
+    """
+    rng = random.Random(seed)
+    workdir = workdir or tempfile.mkdtemp(prefix='halite_tune_')
+    paths = []
+    for i, config in enumerate(configs):
+        paths.append(os.path.join(workdir, "config_{}.json".format(i)))
+        with open(paths[-1], 'w') as f:
+            json.dump(config, f)
+    records = [{'games': 0, 'wins': 0, 'timeouts': 0, 'latencies': [], 'rounds': 0} for _ in configs]
+    alive = list(range(len(configs)))
+    survivors = [list(alive)]
+    processes = processes or max(1, multiprocessing.cpu_count() // 2)
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            lineup = _round_games(games, opponents, rng)
+            tasks = []
+            for i in alive:
+                for game, plan in enumerate(lineup):
+                    bots = ['MyBot', plan['opponent']]
+                    envs = [{'BAUCOMBOT_CONFIG': paths[i]}, None]
+                    if plan['seat']:
+                        bots.reverse()
+                        envs.reverse()
+                    spec = {'game_id': "{}-{}-{}".format(len(survivors), i, game), 'bots': bots, 'env': envs,
+                            'width': plan['width'], 'height': plan['height'], 'seed': plan['seed'],
+                            'config': i, 'seat': plan['seat']}
+                    tasks.append((spec, max_turns, turn_timeout))
+            print("Round {}: {} candidates x {} games".format(len(survivors), len(alive), games))
+            for result in pool.imap_unordered(tournament._play_game_star, tasks):
+                record = records[result['config']]
+                player = result['players'][result['seat']]
+                record['games'] += 1
+                record['wins'] += player['rank'] == 1
+                record['timeouts'] += player['timed_out'] is not None
+                record['latencies'].extend(player['latencies'])
+            for i in alive:
+                records[i]['rounds'] += 1
+            if len(alive) <= 1:
+                break
+            alive = sorted(alive, key=lambda i: _rank_key(_summarize(records[i])))[:max(1, len(alive) // eta)]
+            survivors.append(list(alive))
+            games *= eta
+    stats = []
+    for i, (config, record) in enumerate(zip(configs, records)):
+        summary = _summarize(record)
+        summary.update({'id': i, 'parameters': config, 'rounds': record['rounds']})
+        stats.append(summary)
+    return stats, survivors
+
+
+def pareto_front(stats):
+    """
+    :param list[dict] stats: Candidate stats from the final round
+    :return: Ids of the candidates no other candidate beats on both win rate and p95 latency
+    :rtype: list[int]
+    """
+    front = []
+    for a in stats:
+        dominated = any(b['win_rate'] >= a['win_rate'] and b['latency_p95'] <= a['latency_p95'] and
+                        (b['win_rate'] > a['win_rate'] or b['latency_p95'] < a['latency_p95']) for b in stats)
+        if not dominated:
+            front.append(a['id'])
+    return front
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--space', default=None, help="search space JSON (default DEFAULT_SPACE)")
+    parser.add_argument('--configs', type=int, default=27, help="candidates, including the defaults")
+    parser.add_argument('--games', type=int, default=4, help="games per candidate in the first round")
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--opponents', nargs='+', default=['v3', 'MyBot'], choices=sorted(tournament.BOTS))
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-turns', type=int, default=None)
+    parser.add_argument('--turn-timeout', type=float, default=local_engine.TURN_TIMEOUT)
+    parser.add_argument('--workdir', default=None, help="keep the candidates' config files here")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='tuning_results.json')
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    configs = sample_configs(space, args.configs, args.seed)
+    stats, survivors = successive_halving(configs, args.opponents, args.games, args.eta, args.processes,
+                                          args.max_turns, args.turn_timeout, args.workdir, args.seed)
+    # candidates that went further played more games, so they rank first
+    ranking = sorted(stats, key=lambda s: (-s['rounds'],) + _rank_key(s))
+    finalists = [s for s in stats if s['rounds'] == ranking[0]['rounds']]
+    print("{:>4} {:>6} {:>6} {:>6} {:>8} {:>8}  parameters".format('id', 'rounds', 'games', 'win%', 'p95 ms',
+                                                                    'timeouts'))
+    for s in ranking[:10]:
+        print("{:>4} {:>6} {:>6} {:>6.1f} {:>8.1f} {:>8}  {}".format(
+            s['id'], s['rounds'], s['games'], 100 * s['win_rate'], 1000 * s['latency_p95'], s['timeouts'],
+            json.dumps(s['parameters'], sort_keys=True)))
+    with open(args.output, 'w') as f:
+        json.dump({'space': space, 'seed': args.seed, 'eta': args.eta, 'opponents': args.opponents,
+                   'ranking': ranking, 'survivors': survivors, 'pareto_front': pareto_front(finalists)}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()